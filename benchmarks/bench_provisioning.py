@@ -0,0 +1,458 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""End-to-end provisioning benchmark against simulated hardware.
+
+The benchmark builds a fake sysfs tree with an at24 eeprom node and network devices,
+installs a fake gpiod module and stub executables for dtoverlay and the *-set-mac
+tools. It then runs the clear, provision and dump jobs for every device configuration
+and records the time spent in each phase with a hook of revpi_provisioning.timing.
+
+Run it from the repository root::
+
+    python3 benchmarks/bench_provisioning.py --output bench.json
+    python3 benchmarks/bench_provisioning.py --compare bench.json
+
+The results contain the commit they were measured on, so they can be compared across
+commits. With --compare the run fails if a phase got slower than the given threshold.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import revpi_provisioning.hat as hat  # noqa: E402
+import revpi_provisioning.imagecache as imagecache  # noqa: E402
+import revpi_provisioning.inventory as inventory  # noqa: E402
+import revpi_provisioning.network.utils as network_utils  # noqa: E402
+from revpi_provisioning import jobs, timing  # noqa: E402
+from revpi_provisioning.catalog import DEVICES_DIR  # noqa: E402
+from revpi_provisioning.eep import (  # noqa: E402
+    ATOM_CUSTOM_DATA,
+    ATOM_VENDOR_INFO,
+    PRODUCT_ID_MODULUS,
+    VendorInfo,
+    build_image,
+)
+
+EEPROM_SIZE = 4096
+FIRST_MAC_ADDRESS = "c8:3e:a7:00:00:01"
+
+# Bus directories in sysfs by network interface type
+INTERFACE_BUSES = {"lan95xx": "usb", "lan78xx": "usb", "lan743x": "pci"}
+
+DTOVERLAY_STUB = """#!/bin/sh
+# list or load overlays, the loaded overlays are stored in a state file
+state="{state}"
+if [ "$1" = "-l" ]; then
+    echo "Overlays (in load order):"
+    touch "$state"
+    index=0
+    while read -r name; do
+        echo "$index:  $name"
+        index=$((index + 1))
+    done < "$state"
+else
+    echo "$1" >> "$state"
+fi
+"""
+
+SET_MAC_STUB = """#!/bin/sh
+# simulate the eeprom write of the network interface
+sleep {latency}
+echo "$2" > "{root}/$1.mac"
+"""
+
+
+class PhaseRecorder(timing.PhaseHook):
+    """Sum up the duration of the phases of the current operation."""
+
+    def __init__(self) -> None:
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def before(self, name: str, attributes: dict) -> float:
+        """Return the start time of the phase."""
+        return time.perf_counter()
+
+    def after(self, name: str, attributes: dict, ok: bool, context: float) -> None:
+        """Add the duration of the phase."""
+        duration = time.perf_counter() - context
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def reset(self) -> dict:
+        """Return the recorded phases and start over."""
+        with self._lock:
+            (phases, self.phases) = (self.phases, {})
+        return phases
+
+
+recorder = PhaseRecorder()
+
+
+def fake_gpiod() -> types.ModuleType:
+    """Create a module which implements the used part of the libgpiod v2 API."""
+    gpiod = types.ModuleType("gpiod")
+    gpiod.__version__ = "2.2.0"
+
+    class LineRequest:
+        def set_value(self, line: int, value: object) -> None:
+            pass
+
+    class Chip:
+        def __init__(self, path: str) -> None:
+            self.path = path
+
+        def request_lines(self, consumer: str, config: dict) -> LineRequest:
+            return LineRequest()
+
+    gpiod.Chip = Chip
+    gpiod.LineSettings = lambda **kwargs: kwargs
+    gpiod.Line = types.SimpleNamespace(
+        Direction=types.SimpleNamespace(OUTPUT="output"),
+        Value=types.SimpleNamespace(ACTIVE=1, INACTIVE=0),
+    )
+
+    return gpiod
+
+
+def simulate_eeprom_latency(eeprom: str, write_latency: float, read_latency: float) -> None:
+    """Delay writes and reads of the fake eeprom node by the given seconds per byte.
+
+    The reads of the eeprom with os.pread (pre-read of the delta write, verification)
+    are delayed, the buffered read of the dump is not.
+    """
+    eeprom_fds = set()
+    (os_open, os_close, os_pwrite, os_pread) = (os.open, os.close, os.pwrite, os.pread)
+
+    def fake_open(path: str, *args: object, **kwargs: object) -> int:
+        fd = os_open(path, *args, **kwargs)
+        if os.path.realpath(path) == eeprom:
+            eeprom_fds.add(fd)
+        return fd
+
+    def fake_close(fd: int) -> None:
+        eeprom_fds.discard(fd)
+        os_close(fd)
+
+    def fake_pwrite(fd: int, data: bytes, offset: int) -> int:
+        if fd in eeprom_fds:
+            time.sleep(len(data) * write_latency)
+        return os_pwrite(fd, data, offset)
+
+    def fake_pread(fd: int, length: int, offset: int) -> bytes:
+        data = os_pread(fd, length, offset)
+        if fd in eeprom_fds:
+            time.sleep(len(data) * read_latency)
+        return data
+
+    os.open = fake_open
+    os.close = fake_close
+    os.pwrite = fake_pwrite
+    os.pread = fake_pread
+
+
+def write_executable(path: str, content: str) -> None:
+    """Write a stub executable."""
+    with open(path, "w") as fh:
+        fh.write(content)
+    os.chmod(path, 0o755)
+
+
+def device_products() -> list:
+    """Return the product numbers of all device configurations.
+
+    Configurations without revision are run as revision R00.
+    """
+    products = set()
+
+    for config_file in glob.glob(os.path.join(DEVICES_DIR, "*.yaml")):
+        name = os.path.basename(config_file)[: -len(".yaml")]
+        products.add(name if re.search(r"R\d{2}$", name) else f"{name}R00")
+
+    return sorted(products)
+
+
+class FakeSystem:
+    """Fake sysfs tree, gpiod module and stub executables in a temporary directory."""
+
+    def __init__(self, root: str, args: argparse.Namespace) -> None:
+        self.root = root
+
+        i2c_device = os.path.join(root, "bus", "i2c", "devices", "1-0050")
+        os.makedirs(i2c_device)
+        self.eeprom = os.path.join(i2c_device, "eeprom")
+        with open(self.eeprom, "wb") as fh:
+            fh.write(b"\xff" * EEPROM_SIZE)
+
+        self.bin = os.path.join(root, "bin")
+        os.makedirs(self.bin)
+        self.overlay_state = os.path.join(root, "overlays")
+        write_executable(
+            os.path.join(self.bin, "dtoverlay"), DTOVERLAY_STUB.format(state=self.overlay_state)
+        )
+        self.set_mac = os.path.join(self.bin, "set-mac")
+        write_executable(self.set_mac, SET_MAC_STUB.format(latency=args.tool_latency, root=root))
+
+        self.image = os.path.join(root, "hat.eep")
+        self.image_size = args.image_size
+
+        dev = os.path.join(root, "dev")
+        os.makedirs(dev)
+        open(os.path.join(dev, "gpiochip0"), "w").close()
+        inventory.DEV_ROOT = dev
+
+        os.environ["PATH"] = self.bin + os.pathsep + os.environ["PATH"]
+        sys.modules["gpiod"] = fake_gpiod()
+        hat.DEFAULT_EEPROM_PATHS = [self.eeprom]
+        # always use the dtoverlay stub, independent of the configfs of the host
+        hat.find_overlay_manager = lambda *args, **kwargs: hat.DtoverlayOverlayManager()
+        network_utils.SYSFS_BUS = os.path.join(root, "bus")
+        imagecache.DEFAULT_IMAGE_CACHE = os.path.join(root, "image-cache")
+        simulate_eeprom_latency(
+            os.path.realpath(self.eeprom), args.write_latency, args.read_latency
+        )
+
+    def add_network_interfaces(self, configuration: dict) -> None:
+        """Create the net devices of the network interfaces of a configuration."""
+        for index, interface in enumerate(configuration.get("network_interfaces", [])):
+            bus = INTERFACE_BUSES.get(interface["type"])
+            if bus is None:
+                continue
+
+            net = os.path.join(self.root, "bus", bus, "devices", interface["path"], "net")
+            os.makedirs(os.path.join(net, f"eth{index}"), exist_ok=True)
+
+    def write_image(self, product: str) -> None:
+        """Write a HAT eeprom image of image_size bytes for a product."""
+        (product_id, product_revision) = jobs.extract_product(product)
+        vendor_info = VendorInfo(
+            bytes(16),
+            int(product_id) % PRODUCT_ID_MODULUS,
+            int(product_revision),
+            "KUNBUS GmbH",
+            f"RevPi {product}",
+        ).pack()
+
+        # fill the image up to its size with custom data
+        padding = self.image_size - len(build_image([(ATOM_VENDOR_INFO, vendor_info)]))
+        custom_data = bytes(index * 7 % 256 for index in range(max(padding - 10, 0)))
+
+        with open(self.image, "wb") as fh:
+            fh.write(
+                build_image([(ATOM_VENDOR_INFO, vendor_info), (ATOM_CUSTOM_DATA, custom_data)])
+            )
+
+    def reset(self) -> None:
+        """Unload overlays, like after a reboot of the device."""
+        if os.path.exists(self.overlay_state):
+            os.unlink(self.overlay_state)
+
+
+def run_operations(system: FakeSystem, product: str, parallel: bool) -> dict:
+    """Run clear, provision and dump like a station script does.
+
+    Every operation uses a new session, like a new process of the CLI commands.
+    """
+    timings = {}
+    system.reset()
+    system.write_image(product)
+
+    def new_session() -> jobs.Session:
+        session = jobs.Session()
+        revpi = session.revpi(product)
+
+        for interface in revpi.network_interfaces:
+            if getattr(interface, "eeprom_tool", None):
+                interface.eeprom_tool = system.set_mac
+
+        return session
+
+    operations = (
+        ("clear_hat", lambda session: jobs.clear_hat(session, product)),
+        (
+            "provision",
+            lambda session: jobs.provision(
+                session,
+                product,
+                FIRST_MAC_ADDRESS,
+                system.image,
+                parallel=parallel,
+            ),
+        ),
+        ("dump_hat", lambda session: jobs.dump_hat(session, product, system.root + "/dump.eep")),
+    )
+
+    for name, operation in operations:
+        start = time.perf_counter()
+        operation(new_session())
+        total = time.perf_counter() - start
+
+        timings[name] = {"total": total, "phases": recorder.reset()}
+
+    return timings
+
+
+def median_timings(runs: list) -> dict:
+    """Reduce the timings of several runs to their median."""
+    result = {}
+
+    for operation in runs[0]:
+        phases = {phase for run in runs for phase in run[operation]["phases"]}
+        result[operation] = {
+            "total": statistics.median(run[operation]["total"] for run in runs),
+            "phases": {
+                phase: statistics.median(run[operation]["phases"].get(phase, 0.0) for run in runs)
+                for phase in sorted(phases)
+            },
+        }
+
+    return result
+
+
+def git_commit() -> str:
+    """Return the commit of the working tree or None outside of git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Return the phases which got slower than threshold (relative) compared to baseline."""
+    regressions = []
+
+    for product, operations in current["results"].items():
+        for operation, timings in operations.items():
+            base = baseline["results"].get(product, {}).get(operation)
+            if base is None:
+                continue
+
+            values = [("total", base["total"], timings["total"])]
+            values += [
+                (phase, base["phases"][phase], duration)
+                for phase, duration in timings["phases"].items()
+                if phase in base["phases"]
+            ]
+
+            for phase, before, after in values:
+                # ignore phases which are too short to be measured reliably
+                if before > 0.001 and after > before * (1 + threshold):
+                    regressions.append(
+                        f"{product} {operation} {phase}: {before * 1000:.1f} ms -> "
+                        + f"{after * 1000:.1f} ms (+{(after / before - 1) * 100:.0f} %)"
+                    )
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse CLI args."""
+    parser = argparse.ArgumentParser(description="Benchmark provisioning on simulated hardware")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with earlier results")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative slowdown which is a regression"
+    )
+    parser.add_argument("--repetitions", type=int, default=3, help="runs per product")
+    parser.add_argument("--products", nargs="*", help="products to run (default: all)")
+    parser.add_argument(
+        "--write-latency", type=float, default=0.00001, help="eeprom write time per byte [s]"
+    )
+    parser.add_argument(
+        "--read-latency", type=float, default=0.00002, help="eeprom read time per byte [s]"
+    )
+    parser.add_argument(
+        "--tool-latency", type=float, default=0.05, help="runtime of the *-set-mac tools [s]"
+    )
+    parser.add_argument("--image-size", type=int, default=1024, help="HAT image size [bytes]")
+    parser.add_argument(
+        "--parallel", action="store_true", help="write mac addresses in parallel mode"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark.
+
+    Returns
+    -------
+    int
+        1 if a regression was found, else 0
+    """
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="revpi-eol-bench-") as root:
+        system = FakeSystem(root, args)
+
+        results = {}
+        for product in args.products or device_products():
+            system.add_network_interfaces(jobs.Session().configuration(product))
+
+            with timing.hooks(recorder):
+                runs = [
+                    run_operations(system, product, args.parallel) for _ in range(args.repetitions)
+                ]
+            results[product] = median_timings(runs)
+
+            totals = ", ".join(
+                f"{operation} {timings['total'] * 1000:.1f} ms"
+                for operation, timings in results[product].items()
+            )
+            print(f"{product}: {totals}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "repetitions": args.repetitions,
+            "write_latency": args.write_latency,
+            "read_latency": args.read_latency,
+            "tool_latency": args.tool_latency,
+            "image_size": args.image_size,
+            "parallel": args.parallel,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, "r") as fh:
+            baseline = json.load(fh)
+
+        if baseline["settings"] != report["settings"]:
+            print("Warning: baseline was measured with different settings", file=sys.stderr)
+
+        regressions = compare(baseline, report, args.threshold)
+        print(f"Compared with {baseline.get('commit') or 'baseline'}: ", end="")
+        print(f"{len(regressions)} regression(s)")
+        for regression in regressions:
+            print(f"  {regression}")
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
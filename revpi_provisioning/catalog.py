@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Precompiled catalog of all device configurations.
+
+The catalog contains the parsed and validated configurations of all yaml files in the
+devices directory. It is rebuilt with::
+
+    python3 -m revpi_provisioning.catalog
+
+Each entry stores the SHA-256 checksum of its yaml file. If a yaml file has been changed,
+added or removed after the catalog was built, the catalog entry is not used. A yaml file
+is only hashed on the first lookup of its entry, afterwards its modification time and size
+are compared. The list of yaml files is read again if the directory changes.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pathlib
+import sys
+from typing import Optional
+
+DEVICES_DIR = os.path.join(pathlib.Path(__file__).parent.resolve(), "devices")
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+
+_catalogs = {}
+# yaml files and verified entries of the devices directories (see _directory_state)
+_directories = {}
+
+
+def _sha256_file(path: str) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def _stamp(path: str) -> Optional[tuple]:
+    """Return modification time and size of a file or directory, None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _directory_state(devices_dir: str, catalog: dict) -> Optional[dict]:
+    """Return the stamps of the verified entries if the catalog has the yaml files of the directory.
+
+    The yaml files are listed again if the modification time of the directory changed.
+
+    Returns
+    -------
+    Optional[dict]
+        stamps of the yaml files whose catalog entry has been verified by name, None if a
+        yaml file was added or removed after the catalog was built
+    """
+    stamp = _stamp(devices_dir)
+    state = _directories.get(devices_dir)
+
+    if state is None or state[0] != stamp:
+        try:
+            names = {
+                entry[: -len(".yaml")]
+                for entry in os.listdir(devices_dir)
+                if entry.endswith(".yaml")
+            }
+        except OSError:
+            names = None
+
+        state = (stamp, {} if names == set(catalog["devices"]) else None)
+        _directories[devices_dir] = state
+
+    return state[1]
+
+
+def build_catalog(devices_dir: str = DEVICES_DIR) -> dict:
+    """Parse and validate all device configurations of a directory.
+
+    Parameters
+    ----------
+    devices_dir : str, optional
+        directory with the yaml device configurations, by default DEVICES_DIR
+
+    Returns
+    -------
+    dict
+        catalog with all device configurations
+
+    Raises
+    ------
+    EOLConfigException
+        a device configuration is invalid
+    """
+    from revpi_provisioning.config import load_config
+
+    devices = {}
+    checksum = hashlib.sha256()
+
+    for config_file in sorted(glob.glob(os.path.join(devices_dir, "*.yaml"))):
+        name = os.path.basename(config_file)[: -len(".yaml")]
+        sha256 = _sha256_file(config_file)
+
+        devices[name] = {
+            "sha256": sha256,
+            "config": load_config(config_file, absolute_path=True),
+        }
+        checksum.update(f"{name}:{sha256}\n".encode("utf-8"))
+
+    return {"version": CATALOG_VERSION, "sha256": checksum.hexdigest(), "devices": devices}
+
+
+def write_catalog(catalog: dict, devices_dir: str = DEVICES_DIR) -> None:
+    """Write catalog to the devices directory.
+
+    Parameters
+    ----------
+    catalog : dict
+        catalog (see build_catalog)
+    devices_dir : str, optional
+        directory with the yaml device configurations, by default DEVICES_DIR
+    """
+    with open(os.path.join(devices_dir, CATALOG_NAME), "w") as fh:
+        json.dump(catalog, fh, sort_keys=True, separators=(",", ":"))
+        fh.write("\n")
+
+
+def read_catalog(devices_dir: str = DEVICES_DIR) -> Optional[dict]:
+    """Read catalog of the devices directory.
+
+    Parameters
+    ----------
+    devices_dir : str, optional
+        directory with the yaml device configurations, by default DEVICES_DIR
+
+    Returns
+    -------
+    Optional[dict]
+        catalog or None if there is no usable catalog
+    """
+    if devices_dir not in _catalogs:
+        try:
+            with open(os.path.join(devices_dir, CATALOG_NAME), "r") as fh:
+                catalog = json.load(fh)
+        except (OSError, ValueError):
+            catalog = None
+
+        if catalog is not None and catalog.get("version") != CATALOG_VERSION:
+            catalog = None
+
+        _catalogs[devices_dir] = catalog
+
+    return _catalogs[devices_dir]
+
+
+def lookup_config(name: str, devices_dir: str = DEVICES_DIR) -> Optional[dict]:
+    """Look up the device configuration of a product in the catalog.
+
+    The configuration is resolved like by load_config: the file of the product
+    number with revision (PRNNNNNNRNN) and the one without revision (PRNNNNNN) are
+    considered and the last existing one is used.
+
+    Parameters
+    ----------
+    name : str
+        product number in format PRxxxxxxRxx
+    devices_dir : str, optional
+        directory with the yaml device configurations, by default DEVICES_DIR
+
+    Returns
+    -------
+    Optional[dict]
+        device configuration or None if the catalog has no up to date entry
+    """
+    catalog = read_catalog(devices_dir)
+    if catalog is None:
+        return None
+
+    stamps = _directory_state(devices_dir, catalog)
+    if stamps is None:
+        # yaml file was added or removed after the catalog was built
+        return None
+
+    devices = catalog["devices"]
+    candidate = name[:-3] if name[:-3] in devices else name
+    if candidate not in devices:
+        return None
+
+    path = os.path.join(devices_dir, f"{candidate}.yaml")
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+
+    if stamps.get(candidate) != stamp:
+        if _sha256_file(path) != devices[candidate]["sha256"]:
+            # yaml file was changed after the catalog was built
+            return None
+        stamps[candidate] = stamp
+
+    return devices[candidate]["config"]
+
+
+def main() -> int:
+    """Build the catalog or check whether it is up to date.
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    from revpi_provisioning.config import EOLConfigException
+
+    parser = argparse.ArgumentParser(description="Build the device configuration catalog")
+    parser.add_argument(
+        "--check", action="store_true", help="only check whether the catalog is up to date"
+    )
+    parser.add_argument("--devices-dir", default=DEVICES_DIR, help="device configuration dir")
+    args = parser.parse_args()
+
+    try:
+        catalog = build_catalog(args.devices_dir)
+    except EOLConfigException as ce:
+        print(f"Could not build catalog: {ce}", file=sys.stderr)
+        return 1
+
+    if args.check:
+        if read_catalog(args.devices_dir) != catalog:
+            print("Device configuration catalog is out of date", file=sys.stderr)
+            return 1
+
+        return 0
+
+    write_catalog(catalog, args.devices_dir)
+    print(f"Wrote catalog with {len(catalog['devices'])} device configurations")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
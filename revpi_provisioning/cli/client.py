@@ -0,0 +1,167 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Client CLI command which runs jobs in the provisioning daemon."""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+from revpi_provisioning.cli import clear_hat, dump_hat, pipeline, provisioner, validator
+from revpi_provisioning.cli.utils import device_options, error, output_report, report_options
+from revpi_provisioning.daemon import DEFAULT_SOCKET
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse CLI args.
+
+    The arguments of the jobs are the same as the ones of the standalone commands.
+
+    Returns
+    -------
+    argparse.Namespace
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="Run jobs in the RevPi provisioning daemon")
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help=f"daemon socket (default: {DEFAULT_SOCKET})"
+    )
+
+    subparsers = parser.add_subparsers(dest="job", required=True)
+    provisioner.add_arguments(subparsers.add_parser("provision", help="provision RevPi hardware"))
+    clear_hat.add_arguments(subparsers.add_parser("clear-hat", help="clear RevPi HAT EEPROM"))
+    dump_hat.add_arguments(subparsers.add_parser("dump-hat", help="dump RevPi HAT EEPROM"))
+    validator.add_arguments(
+        subparsers.add_parser("validate-config", help="validate device configuration file")
+    )
+    pipeline.add_arguments(
+        subparsers.add_parser("pipeline", help="run several operations on the same device")
+    )
+
+    return parser.parse_args()
+
+
+def device_job_arguments(args: argparse.Namespace) -> dict:
+    """Build the device options of the provision and pipeline jobs from the CLI args.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI args (see add_device_arguments)
+
+    Returns
+    -------
+    dict
+        job arguments with absolute paths
+    """
+    options = device_options(args)
+    for option in ("mac_ledger", "checkpoint"):
+        options[option] = options[option] and os.path.abspath(options[option])
+
+    return options
+
+
+def job_arguments(args: argparse.Namespace) -> dict:
+    """Build the job arguments from the CLI args.
+
+    Paths are made absolute, as the daemon does not share the working directory.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI args
+
+    Returns
+    -------
+    dict
+        job arguments
+    """
+    if args.job == "provision":
+        return {
+            "product": args.product_number,
+            "mac_address": args.mac_address,
+            "eep_image": args.eep_image and os.path.abspath(args.eep_image),
+            **device_job_arguments(args),
+            **provisioner.template_options(args),
+            "template": args.template and os.path.abspath(args.template),
+        }
+    elif args.job == "clear-hat":
+        return {"product": args.product_number}
+    elif args.job == "dump-hat":
+        return {"product": args.product_number, "output_file": os.path.abspath(args.output_file)}
+    elif args.job == "pipeline":
+        return {
+            "product": args.product_number,
+            # all operation arguments except mac addresses are file paths
+            "operations": [
+                (name, argument if name == "mac" or argument is None else os.path.abspath(argument))
+                for (name, argument) in args.operations
+            ],
+            **device_job_arguments(args),
+        }
+
+    return {
+        "configs": [os.path.abspath(config) for config in args.configs],
+        "workers": args.jobs,
+        "cache": args.cache and os.path.abspath(args.cache),
+        "no_cache": args.no_cache,
+    }
+
+
+def main() -> int:
+    """Run the actual program logic.
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    args = parse_args()
+    # the validator prints its result message in any case
+    verbose = getattr(args, "verbose", True)
+
+    options = report_options(args)
+    # the profiling hooks run in the daemon
+    profile = options.pop("profile")
+    request = {
+        "job": args.job,
+        "args": job_arguments(args),
+        "timings": bool(options["timings"] or options["metrics"]),
+        "profile": [
+            f"{name}:{os.path.abspath(output)}" if output else name
+            for (name, _, output) in (spec.partition(":") for spec in profile)
+        ],
+    }
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(args.socket)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+
+            with sock.makefile("rb") as stream:
+                for line in stream:
+                    message = json.loads(line)
+
+                    if "progress" in message:
+                        if verbose:
+                            print(message["progress"], end="", flush=True)
+                        continue
+
+                    if "timings" in message:
+                        output_report(message["timings"], args.job, **options)
+
+                    if message["rc"]:
+                        error(message["error"], message["rc"])
+
+                    return 0
+    except OSError as e:
+        error(f"Could not connect to provisioning daemon at '{args.socket}': {e}", 1)
+
+    error("Provisioning daemon closed the connection without result", 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
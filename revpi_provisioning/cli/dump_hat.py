@@ -8,28 +8,18 @@ import argparse
 import sys
 
 import revpi_provisioning.cli.utils
-from revpi_provisioning.cli.utils import error, verboseprint
-from revpi_provisioning.config import EOLConfigException, load_config
-from revpi_provisioning.hat import (
-    DEFAULT_GPIO_CHIP,
-    DEFAULT_OVERLAY,
-    HatEEPROM,
-    HatEEPROMWriteException,
-)
-from revpi_provisioning.revpi import RevPi
-from revpi_provisioning.utils import extract_product
+from revpi_provisioning.cli.utils import add_report_arguments, report_options, run_job, verboseprint
+from revpi_provisioning.jobs import Session, dump_hat
 
 
-def parse_args() -> tuple:
-    """Parse CLI args.
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args of the command to parser.
 
-    Returns
-    -------
-    tuple
-        CLI args
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
     """
-    parser = argparse.ArgumentParser(description="Clear RevPi HAT EEPROM")
-
     parser.add_argument(
         "product_number",
         metavar="product-number",
@@ -41,9 +31,22 @@ def parse_args() -> tuple:
         help="output file where the HAT eeprom contents are written to",
     )
     parser.add_argument("-v", "--verbose", action="store_true", default=False, required=False)
+    add_report_arguments(parser)
+
+
+def parse_args() -> tuple:
+    """Parse CLI args.
+
+    Returns
+    -------
+    tuple
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="Clear RevPi HAT EEPROM")
+    add_arguments(parser)
     args = parser.parse_args()
 
-    return args.product_number, args.output_file, args.verbose
+    return args.product_number, args.output_file, args.verbose, report_options(args)
 
 
 def main() -> int:
@@ -54,35 +57,15 @@ def main() -> int:
     int
         return code of the program
     """
-    product, output_file, verbose = parse_args()
+    product, output_file, verbose, options = parse_args()
     revpi_provisioning.cli.utils.verbose = verbose
 
-    try:
-        verboseprint("Loading device configuration ... ", end="")
-        configuration = load_config(product)
-        verboseprint("OK")
-
-        revpi = RevPi(*extract_product(product))
-
-        # add HAT EEPROM if specified in config file
-        if "hat_eeprom" in configuration:
-            revpi.hat_eeprom = HatEEPROM(
-                configuration["hat_eeprom"]["wp_gpio"],
-                configuration["hat_eeprom"].get("wp_gpio_chipname", DEFAULT_GPIO_CHIP),
-                overlay=configuration["hat_eeprom"].get("overlay", DEFAULT_OVERLAY),
-            )
-
-        if revpi.hat_eeprom:
-            verboseprint("Dump HAT EEPROM ... ", end="")
-            revpi.dump_hat_eeprom(output_file)
-            verboseprint("OK")
-
-    except EOLConfigException as ce:
-        error(f"Could not load configuration: {ce}", 1)
-    except HatEEPROMWriteException as he:
-        error(f"Could not dump HAT EEPROM: {he}", 3)
-
-    return 0
+    return run_job(
+        lambda: dump_hat(Session(), product, output_file, progress=verboseprint),
+        "dump-hat",
+        product,
+        **options,
+    )
 
 
 if __name__ == "__main__":
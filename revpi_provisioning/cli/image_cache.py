@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Inspect and prune the local HAT eeprom image cache CLI command."""
+
+import argparse
+import sys
+import time
+
+from revpi_provisioning.cli.utils import error
+from revpi_provisioning.imagecache import DEFAULT_IMAGE_CACHE, DEFAULT_IMAGE_CACHE_SIZE, ImageCache
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse CLI args.
+
+    Returns
+    -------
+    argparse.Namespace
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="Inspect and prune the local image cache")
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        default=DEFAULT_IMAGE_CACHE,
+        help=f"cache directory (default: {DEFAULT_IMAGE_CACHE})",
+    )
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list cached images, most recently used first")
+    prune = subparsers.add_parser("prune", help="evict least recently used images")
+    prune.add_argument(
+        "--max-size",
+        metavar="BYTES",
+        type=int,
+        default=DEFAULT_IMAGE_CACHE_SIZE,
+        help=f"maximum total size after pruning (default: {DEFAULT_IMAGE_CACHE_SIZE})",
+    )
+    subparsers.add_parser("verify", help="remove images whose content does not match their hash")
+    subparsers.add_parser("clear", help="remove all images")
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the actual program logic.
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    args = parse_args()
+    cache = ImageCache(args.cache_dir)
+
+    try:
+        if args.command == "list":
+            entries = cache.entries()
+            for entry in entries:
+                last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"]))
+                print(f"{entry['sha256']} {entry['size']:8d} {last_used}")
+                for source in entry["sources"]:
+                    print(f"  {source}")
+            print(f"{len(entries)} images, {sum(entry['size'] for entry in entries)} bytes")
+        elif args.command == "verify":
+            for digest in cache.verify():
+                print(f"removed damaged image {digest}")
+        else:
+            max_size = 0 if args.command == "clear" else args.max_size
+            for digest in cache.prune(max_size):
+                print(f"removed {digest}")
+    except OSError as e:
+        error(f"Could not access image cache '{args.cache_dir}': {e}", 1)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Run several provisioning operations in one CLI command."""
+
+import argparse
+import sys
+
+import revpi_provisioning.cli.utils
+from revpi_provisioning.cli.utils import (
+    add_device_arguments,
+    add_report_arguments,
+    device_options,
+    report_options,
+    run_job,
+    verboseprint,
+)
+from revpi_provisioning.jobs import PIPELINE_OPERATIONS, Session, run_pipeline
+
+
+def parse_operation(value: str) -> tuple:
+    """Parse operation in format NAME or NAME=ARGUMENT.
+
+    Parameters
+    ----------
+    value : str
+        operation from the command line
+
+    Returns
+    -------
+    tuple
+        operation name, argument (None if the operation takes no argument)
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        unknown operation or invalid argument
+    """
+    (name, separator, argument) = value.partition("=")
+
+    if name not in PIPELINE_OPERATIONS:
+        raise argparse.ArgumentTypeError(f"unknown operation '{name}'")
+    if PIPELINE_OPERATIONS[name] and not argument:
+        raise argparse.ArgumentTypeError(f"operation '{name}' requires an argument ({name}=...)")
+    if not PIPELINE_OPERATIONS[name] and separator:
+        raise argparse.ArgumentTypeError(f"operation '{name}' takes no argument")
+
+    return name, argument or None
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args of the command to parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
+    """
+    parser.add_argument(
+        "product_number",
+        metavar="product-number",
+        help="product number of target device in format PRxxxxxxRxx",
+    )
+    parser.add_argument(
+        "operations",
+        metavar="operation",
+        nargs="+",
+        type=parse_operation,
+        help="operations which are run in the given order: clear, write=EEP_IMAGE, "
+        + "verify=EEP_IMAGE, dump=OUTPUT_FILE, mac=FIRST_MAC_ADDRESS",
+    )
+    add_device_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", default=False, required=False)
+    add_report_arguments(parser)
+
+
+def parse_args() -> tuple:
+    """Parse CLI args.
+
+    Returns
+    -------
+    tuple
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="Run several provisioning operations")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    return (
+        args.product_number,
+        args.operations,
+        device_options(args),
+        args.verbose,
+        report_options(args),
+    )
+
+
+def main() -> int:
+    """Run the actual program logic.
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    (
+        product,
+        operations,
+        device,
+        verbose,
+        options,
+    ) = parse_args()
+    revpi_provisioning.cli.utils.verbose = verbose
+
+    return run_job(
+        lambda: run_pipeline(
+            Session(),
+            product,
+            operations,
+            progress=verboseprint,
+            **device,
+        ),
+        "pipeline",
+        product,
+        **options,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,34 +8,25 @@ import argparse
 import sys
 
 import revpi_provisioning.cli.utils
-from revpi_provisioning.cli.utils import error, verboseprint
-from revpi_provisioning.config import EOLConfigException, load_config
-from revpi_provisioning.hat import (
-    DEFAULT_GPIO_CHIP,
-    DEFAULT_OVERLAY,
-    HatEEPROM,
-    HatEEPROMWriteException,
+from revpi_provisioning.cli.utils import (
+    add_device_arguments,
+    add_report_arguments,
+    device_options,
+    report_options,
+    run_job,
+    verboseprint,
 )
-from revpi_provisioning.network import (
-    InvalidNetworkInterfaceTypeString,
-    NetworkEEPROMException,
-    find_interface_class,
-)
-from revpi_provisioning.network.utils import NetworkInterfaceNotFoundException
-from revpi_provisioning.revpi import RevPi
-from revpi_provisioning.utils import extract_product
+from revpi_provisioning.jobs import Session, provision
 
 
-def parse_args() -> tuple:
-    """Parse CLI args.
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args of the command to parser.
 
-    Returns
-    -------
-    tuple
-        CLI args
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
     """
-    parser = argparse.ArgumentParser(description="Provision RevPi hardware")
-
     parser.add_argument(
         "product_number",
         metavar="product-number",
@@ -44,88 +35,105 @@ def parse_args() -> tuple:
     parser.add_argument(
         "mac_address", metavar="mac-address", help="first MAC address of target device"
     )
+    image = parser.add_mutually_exclusive_group(required=True)
+    image.add_argument(
+        "eep_image", metavar="eep-image", nargs="?", help="path to eep-image file to be written"
+    )
+    image.add_argument(
+        "--template",
+        metavar="FILE",
+        default=None,
+        help="build the HAT eeprom image from a template eep-image and the mac address, "
+        + "serial number and custom data of the device instead of writing eep-image",
+    )
     parser.add_argument(
-        "eep_image", metavar="eep-image", help="path to eep-image file to be written"
+        "--serial", default=None, help="serial number which is added to the image (--template)"
     )
+    parser.add_argument(
+        "--custom-data",
+        metavar="DATA",
+        action="append",
+        default=[],
+        help="custom data which is added to the image (--template), can be given multiple times",
+    )
+    add_device_arguments(parser)
     parser.add_argument("-v", "--verbose", action="store_true", default=False, required=False)
+    add_report_arguments(parser)
 
-    args = parser.parse_args()
-
-    return args.product_number, args.mac_address, args.eep_image, args.verbose
 
+def template_options(args: argparse.Namespace) -> dict:
+    """Return the options of the image template of the provision job.
 
-def main() -> int:
-    """Run the actual program logic.
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI args (see add_arguments)
 
     Returns
     -------
-    int
-        return code of the program
+    dict
+        keyword arguments for provision
     """
-    product, mac, image_path, verbose = parse_args()
-    revpi_provisioning.cli.utils.verbose = verbose
-
-    verboseprint(f"Starting device provisioning for product '{product}'")
-
-    try:
-        verboseprint("Loading device configuration ... ", end="")
-        configuration = load_config(product)
-        verboseprint("OK")
-
-        revpi = RevPi(*extract_product(product))
+    return {"template": args.template, "serial": args.serial, "custom_data": args.custom_data}
 
-        # add HAT EEPROM if specified in config file
-        if "hat_eeprom" in configuration:
-            verboseprint(
-                f"Found HAT EEPROM definition in config file. Will write image '{image_path}'"
-            )
-            revpi.hat_eeprom = HatEEPROM(
-                configuration["hat_eeprom"]["wp_gpio"],
-                configuration["hat_eeprom"].get("wp_gpio_chipname", DEFAULT_GPIO_CHIP),
-                overlay=configuration["hat_eeprom"].get("overlay", DEFAULT_OVERLAY),
-            )
 
-        verboseprint(f"Registering network interfaces. Base mac address will be '{mac}'")
-
-        for index, interface_config in enumerate(configuration.get("network_interfaces", [])):
-            interface_path = interface_config["path"]
-            interface_type = interface_config["type"]
-
-            # determine current interface class by type lookup
-            interface_class = find_interface_class(interface_type)
-
-            line = f"  Ethernet {index}: type={interface_type} "
-            if interface_path:
-                line += f"path={interface_path} "
-            line += "... "
+def parse_args() -> tuple:
+    """Parse CLI args.
 
-            verboseprint(line, end="")
+    Returns
+    -------
+    tuple
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="Provision RevPi hardware")
+    add_arguments(parser)
 
-            interface = interface_class(interface_path, interface_config.get("eeprom", False))
+    args = parser.parse_args()
 
-            revpi.network_interfaces.append(interface)
+    return (
+        args.product_number,
+        args.mac_address,
+        args.eep_image,
+        device_options(args),
+        template_options(args),
+        args.verbose,
+        report_options(args),
+    )
 
-            verboseprint("OK")
 
-        if revpi.hat_eeprom:
-            verboseprint("Writing HAT EEPROM ... ", end="")
-            revpi.write_hat_eeprom(image_path)
-            verboseprint("OK")
+def main() -> int:
+    """Run the actual program logic.
 
-        verboseprint("Writing mac addresses ... ", end="")
-        mac_addresses = revpi.write_mac_addresses(mac)
-        verboseprint("OK")
-        verboseprint(f"Successfully wrote {len(mac_addresses)} mac addresses")
-    except EOLConfigException as ce:
-        error(f"Could not load configuration: {ce}", 1)
-    except NetworkInterfaceNotFoundException as nie:
-        error(f"Could not find network interface: {nie}", 2)
-    except HatEEPROMWriteException as he:
-        error(f"Could not write image to HAT EEPROM: {he}", 3)
-    except (NetworkEEPROMException, InvalidNetworkInterfaceTypeString) as ne:
-        error(f"Could not write mac address: {ne}", 4)
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    (
+        product,
+        mac,
+        image_path,
+        device,
+        template,
+        verbose,
+        options,
+    ) = parse_args()
+    revpi_provisioning.cli.utils.verbose = verbose
 
-    return 0
+    return run_job(
+        lambda: provision(
+            Session(),
+            product,
+            mac,
+            image_path,
+            progress=verboseprint,
+            **device,
+            **template,
+        ),
+        "provision",
+        product,
+        **options,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Provisioning daemon CLI command."""
+
+import argparse
+import signal
+import sys
+
+import revpi_provisioning.cli.utils
+from revpi_provisioning.cli.utils import error, verboseprint
+from revpi_provisioning.config import EOLConfigException
+from revpi_provisioning.daemon import DEFAULT_SOCKET, ProvisioningServer
+
+
+def parse_args() -> tuple:
+    """Parse CLI args.
+
+    Returns
+    -------
+    tuple
+        CLI args
+    """
+    parser = argparse.ArgumentParser(description="RevPi provisioning daemon")
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help=f"socket to listen on (default: {DEFAULT_SOCKET})"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", default=False, required=False)
+    args = parser.parse_args()
+
+    return args.socket, args.verbose
+
+
+def main() -> int:
+    """Run the actual program logic.
+
+    Returns
+    -------
+    int
+        return code of the program
+    """
+    socket_path, verbose = parse_args()
+    revpi_provisioning.cli.utils.verbose = verbose
+
+    try:
+        server = ProvisioningServer(socket_path)
+    except OSError as e:
+        error(f"Could not listen on socket '{socket_path}': {e}", 1)
+
+    try:
+        verboseprint("Loading device configurations ... ", end="")
+        count = server.session.preload()
+        verboseprint(f"OK ({count} configurations)")
+    except EOLConfigException as ce:
+        server.server_close()
+        error(f"Could not load configuration: {ce}", 1)
+
+    # shut down cleanly on SIGTERM (e.g. systemctl stop)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    verboseprint(f"Waiting for jobs on '{socket_path}'")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,15 @@
 
 """CLI command utilities."""
 
+import argparse
 import sys
+from typing import Callable
 
+from revpi_provisioning.profiling import PROFILE_ENV, PROFILING_HOOKS, ProfilingException, profiling
+from revpi_provisioning.timing import TimingRecorder, recording, write_report
+
+# Formats of the timing report
+TIMING_FORMATS = ["json"]
 
 global verbose
 verbose = False
@@ -22,3 +29,226 @@ def verboseprint(*args: str, **kwargs: dict) -> None:
     """Print only if verbose mode is enabled."""
     if verbose:
         print(*args, **kwargs)
+
+
+def add_device_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args for the network interfaces, the mac ledger and the HAT eeprom to parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
+    """
+    # imports the hardware modules, which commands without device access do not need
+    from revpi_provisioning.network import DEFAULT_EEPROM_BACKEND, EEPROM_BACKENDS
+    from revpi_provisioning.network.utils import DEFAULT_ENUMERATION_TIMEOUT
+
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        default=False,
+        help="write mac addresses of interfaces on different buses concurrently",
+    )
+    parser.add_argument(
+        "--enumeration-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=None,
+        help="maximum time to wait for network interfaces to be enumerated "
+        + f"(default: {DEFAULT_ENUMERATION_TIMEOUT:.0f} s)",
+    )
+    parser.add_argument(
+        "--eeprom-backend",
+        choices=EEPROM_BACKENDS,
+        default=DEFAULT_EEPROM_BACKEND,
+        help="write mac addresses with the *-set-mac tools or in-process with the ethtool ioctl, "
+        + "which falls back to the tools if the driver does not support it "
+        + f"(default: {DEFAULT_EEPROM_BACKEND})",
+    )
+    parser.add_argument(
+        "--mac-ledger",
+        metavar="DIR",
+        default=None,
+        help="directory of the mac address ledger: refuse mac addresses which have been "
+        + "assigned before and add the written ones",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="FILE",
+        default=None,
+        help="record the verified offset of an interrupted HAT eeprom write in FILE, a retry "
+        + "of the same image continues from there",
+    )
+
+
+def device_options(args: argparse.Namespace) -> dict:
+    """Return the device options of the provision and pipeline jobs.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI args (see add_device_arguments)
+
+    Returns
+    -------
+    dict
+        keyword arguments for provision and run_pipeline
+    """
+    return {
+        "parallel": args.parallel,
+        "enumeration_timeout": args.enumeration_timeout,
+        "eeprom_backend": args.eeprom_backend,
+        "mac_ledger": args.mac_ledger,
+        "checkpoint": args.checkpoint or None,
+    }
+
+
+def add_report_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args for the timing report and the metrics file to parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
+    """
+    parser.add_argument(
+        "--timings",
+        choices=TIMING_FORMATS,
+        default=None,
+        help="report start, end and duration of each provisioning phase",
+    )
+    parser.add_argument(
+        "--timings-output",
+        metavar="FILE",
+        default="-",
+        help="file the timing report is written to (default: STDOUT)",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        default=None,
+        help="metrics file for the textfile collector of node_exporter which is updated after "
+        + "the run",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="HOOK[:FILE]",
+        action="append",
+        default=[],
+        help="call profiling hook around each provisioning phase and write its result to FILE "
+        + f"(default: STDERR), HOOK is one of {', '.join(PROFILING_HOOKS)} "
+        + f"(also enabled by {PROFILE_ENV})",
+    )
+
+
+def report_options(args: argparse.Namespace) -> dict:
+    """Return the options for the timing report and the metrics file of run_job.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        CLI args (see add_report_arguments)
+
+    Returns
+    -------
+    dict
+        keyword arguments for run_job
+    """
+    return {
+        "timings": args.timings,
+        "timings_output": args.timings_output,
+        "metrics": args.metrics,
+        "profile": args.profile,
+    }
+
+
+def output_report(
+    report: dict,
+    command: str,
+    timings: str = None,
+    timings_output: str = "-",
+    metrics: str = None,
+) -> None:
+    """Write the timing report of a job and add it to the metrics file.
+
+    Parameters
+    ----------
+    report : dict
+        timing report (see TimingRecorder.report)
+    command : str
+        name of the command which is used in the metrics
+    timings : str, optional
+        format of the timing report (see TIMING_FORMATS), no report if None
+    timings_output : str, optional
+        file the timing report is written to or "-" for STDOUT, by default "-"
+    metrics : str, optional
+        metrics file which is updated with the report, by default None
+    """
+    if timings:
+        write_report(report, timings_output)
+
+    if metrics:
+        from revpi_provisioning.metrics import MetricsException, update_metrics_file
+
+        try:
+            update_metrics_file(metrics, command, report)
+        except MetricsException as me:
+            # the metrics must not change the result of the job
+            print(f"Warning: {me}", file=sys.stderr)
+
+
+def run_job(
+    job: Callable,
+    command: str,
+    product: str = None,
+    timings: str = None,
+    timings_output: str = "-",
+    metrics: str = None,
+    profile: list = (),
+) -> int:
+    """Run job and exit with its return code if it fails.
+
+    Parameters
+    ----------
+    job : Callable
+        job without arguments
+    command : str
+        name of the command which is used in the metrics
+    product : str, optional
+        product number which is added to the timing report
+    timings : str, optional
+        format of the timing report (see TIMING_FORMATS), no report if None
+    timings_output : str, optional
+        file the timing report is written to or "-" for STDOUT, by default "-"
+    metrics : str, optional
+        metrics file which is updated with the result of the job, by default None
+    profile : list, optional
+        profiling hooks in the form HOOK[:FILE] (see revpi_provisioning.profiling)
+
+    Returns
+    -------
+    int
+        return code of the job (0), a failed job exits the program
+    """
+    # imports the hardware modules, which commands without jobs do not need
+    from revpi_provisioning.jobs import JobException
+
+    recorder = TimingRecorder() if timings or metrics else None
+    (rc, message) = (0, None)
+
+    try:
+        with profiling(profile), recording(recorder):
+            try:
+                job()
+            except JobException as je:
+                (rc, message) = (je.rc, str(je))
+    except ProfilingException as pe:
+        error(str(pe), 1)
+
+    if recorder is not None:
+        output_report(recorder.report(product, rc), command, timings, timings_output, metrics)
+
+    if rc:
+        error(message, rc)
+
+    return 0
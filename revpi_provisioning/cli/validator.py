@@ -7,8 +7,42 @@
 import argparse
 import sys
 
-from revpi_provisioning.cli.utils import error
-from revpi_provisioning.config import EOLConfigException, load_config
+from revpi_provisioning.cli.utils import add_report_arguments, report_options, run_job
+from revpi_provisioning.jobs import validate_configs
+from revpi_provisioning.validation import DEFAULT_VALIDATION_CACHE
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add CLI args of the command to parser.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        parser to add the arguments to
+    """
+    parser.add_argument(
+        "configs",
+        metavar="device-configuration-file",
+        nargs="+",
+        help="device configuration file, directory with yaml files or glob pattern",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=None,
+        help="number of worker processes (default: one per cpu)",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="FILE",
+        help=f"cache of the validation results (default: {DEFAULT_VALIDATION_CACHE})",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="validate all files, ignore the cache"
+    )
+    add_report_arguments(parser)
 
 
 def main() -> None:
@@ -19,21 +53,21 @@ def main() -> None:
     int
         return code of the program
     """
-    parser = argparse.ArgumentParser(description="Validate device configuration file")
-    parser.add_argument("config", metavar="device-configuration-file")
+    parser = argparse.ArgumentParser(description="Validate device configuration files")
+    add_arguments(parser)
 
     args = parser.parse_args()
 
-    device_config_file = args.config
-
-    try:
-        load_config(device_config_file, absolute_path=True)
-    except EOLConfigException as ce:
-        error(f"Failed to validate device configuration file: {ce}", 1)
-
-    print(f"Device configuration file '{device_config_file}' has been validated successfully")
-
-    return 0
+    return run_job(
+        lambda: validate_configs(
+            args.configs,
+            workers=args.jobs,
+            cache_file=None if args.no_cache else args.cache or DEFAULT_VALIDATION_CACHE,
+            progress=print,
+        ),
+        "validate-config",
+        **report_options(args),
+    )
 
 
 if __name__ == "__main__":
@@ -4,12 +4,11 @@
 
 """Configuration file handling."""
 
+import functools
 import os
 import pathlib
 
-import yaml
-from schema import And, Optional, Schema, SchemaError
-
+from revpi_provisioning.catalog import lookup_config
 from revpi_provisioning.network import NETWORK_INTERFACE_TYPES
 
 
@@ -19,35 +18,54 @@ class EOLConfigException(Exception):
     pass
 
 
-config_schema = Schema(
-    {
-        Optional("hat_eeprom"): {
-            "wp_gpio": int,
-            Optional("wp_gpiochip"): str,
-            Optional("overlay"): And(
-                str,
-                lambda ovl: ovl in ["revpi-hat-eeprom", "revpi-hat-eeprom-pi5"],
-                error="Invalid overlay name for HAT eeprom",
-            ),
-        },
-        "network_interfaces": [
-            {
-                "type": And(
+@functools.lru_cache(maxsize=None)
+def _build_config_schema() -> "Schema":  # noqa: F821
+    """Build the schema of the device configuration.
+
+    schema is only imported if a yaml configuration file has to be validated.
+    """
+    from schema import And, Optional, Schema
+
+    return Schema(
+        {
+            Optional("hat_eeprom"): {
+                "wp_gpio": int,
+                Optional("wp_gpiochip"): str,
+                Optional("overlay"): And(
                     str,
-                    lambda t: t in NETWORK_INTERFACE_TYPES.keys(),
-                    error="Invalid network interface type",
+                    lambda ovl: ovl in ["revpi-hat-eeprom", "revpi-hat-eeprom-pi5"],
+                    error="Invalid overlay name for HAT eeprom",
                 ),
-                "path": str,
-                "eeprom": bool,
-            }
-        ],
-    }
-)
+            },
+            "network_interfaces": [
+                {
+                    "type": And(
+                        str,
+                        lambda t: t in NETWORK_INTERFACE_TYPES.keys(),
+                        error="Invalid network interface type",
+                    ),
+                    "path": str,
+                    "eeprom": bool,
+                }
+            ],
+        }
+    )
+
+
+def __getattr__(name: str) -> object:
+    """Build config_schema on first access."""
+    if name == "config_schema":
+        return _build_config_schema()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_config(name: str, absolute_path: bool = False) -> dict:
     """Load yaml configuration file from given path.
 
+    Device configurations shipped with the package are taken from the precompiled
+    catalog, if it is up to date (see revpi_provisioning.catalog).
+
     Parameters
     ----------
     name : str
@@ -68,9 +86,16 @@ def load_config(name: str, absolute_path: bool = False) -> dict:
     if absolute_path:
         device_config_file = name
     else:
+        configuration = lookup_config(name)
+        if configuration is not None:
+            return configuration
+
         basepath = pathlib.Path(__file__).parent.resolve()
         device_config_file = f"{basepath}/devices/{name}.yaml"
 
+    import yaml
+    from schema import SchemaError
+
     configuration = {}
     # Try PRNNNNNNRNN.yaml and fallback to PRNNNNNN.yaml
     for config_file in (device_config_file, f"{device_config_file[:-8]}.yaml"):
@@ -87,7 +112,7 @@ def load_config(name: str, absolute_path: bool = False) -> dict:
         raise EOLConfigException(f"Device configuration file '{device_config_file}' does not exist")
 
     try:
-        config_schema.validate(configuration)
+        _build_config_schema().validate(configuration)
     except SchemaError as se:
         raise EOLConfigException(f"Schema error in device configuration file: {se}") from se
 
@@ -0,0 +1,200 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Provisioning daemon which runs jobs received over a unix domain socket.
+
+The protocol is line based JSON. A client sends one job per line::
+
+    {"job": "provision", "args": {"product": "PR100359R00", ...}}
+
+and receives any number of progress messages followed by the result of the job::
+
+    {"progress": "Writing HAT EEPROM ... "}
+    {"rc": 0, "error": null}
+
+If the request contains ``"timings": true``, the result contains the timing report of
+the job (see revpi_provisioning.timing) in ``"timings"``. ``"profile"`` is a list of
+profiling hooks which are called around the phases of the job (see
+revpi_provisioning.profiling).
+"""
+
+import json
+import os
+import socketserver
+import threading
+import traceback
+from typing import Callable
+
+from revpi_provisioning.jobs import (
+    JobException,
+    Session,
+    clear_hat,
+    dump_hat,
+    provision,
+    run_pipeline,
+    validate_config,
+    validate_configs,
+)
+from revpi_provisioning.profiling import ProfilingException, profiling
+from revpi_provisioning.timing import TimingRecorder, recording
+from revpi_provisioning.validation import DEFAULT_VALIDATION_CACHE
+
+DEFAULT_SOCKET = "/run/revpi-eol-provisioner.sock"
+
+JOBS = {
+    "provision": lambda session, args, progress: provision(
+        session,
+        args["product"],
+        args["mac_address"],
+        args.get("eep_image"),
+        progress,
+        parallel=args.get("parallel", False),
+        enumeration_timeout=args.get("enumeration_timeout"),
+        eeprom_backend=args.get("eeprom_backend"),
+        mac_ledger=args.get("mac_ledger"),
+        checkpoint=args.get("checkpoint"),
+        template=args.get("template"),
+        serial=args.get("serial"),
+        custom_data=args.get("custom_data"),
+    ),
+    "clear-hat": lambda session, args, progress: clear_hat(session, args["product"], progress),
+    "dump-hat": lambda session, args, progress: dump_hat(
+        session, args["product"], args["output_file"], progress
+    ),
+    "validate-config": lambda session, args, progress: (
+        validate_configs(
+            args["configs"],
+            workers=args.get("workers"),
+            cache_file=None
+            if args.get("no_cache")
+            else args.get("cache") or DEFAULT_VALIDATION_CACHE,
+            progress=progress,
+        )
+        if "configs" in args
+        else validate_config(args["config"], progress)
+    ),
+    "pipeline": lambda session, args, progress: run_pipeline(
+        session,
+        args["product"],
+        [tuple(operation) for operation in args["operations"]],
+        progress,
+        parallel=args.get("parallel", False),
+        enumeration_timeout=args.get("enumeration_timeout"),
+        eeprom_backend=args.get("eeprom_backend"),
+        mac_ledger=args.get("mac_ledger"),
+        checkpoint=args.get("checkpoint"),
+    ),
+}
+
+
+class ProvisioningRequestHandler(socketserver.StreamRequestHandler):
+    """Handle the jobs of one client connection."""
+
+    def _send(self, message: dict) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _progress(self, *args: str, sep: str = " ", end: str = "\n", **kwargs: dict) -> None:
+        self._send({"progress": sep.join(str(arg) for arg in args) + end})
+
+    def handle(self) -> None:
+        """Run all jobs sent over the connection."""
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                job = JOBS[request["job"]]
+            except (ValueError, KeyError, TypeError) as e:
+                self._send({"rc": 1, "error": f"Invalid job request: {e}"})
+                continue
+
+            self._send(
+                self.server.run_job(
+                    job,
+                    request.get("args", {}),
+                    self._progress,
+                    timings=bool(request.get("timings", False)),
+                    profile=request.get("profile", []),
+                )
+            )
+
+
+class ProvisioningServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix domain socket server which runs provisioning jobs one after another.
+
+    All jobs share one session, so device configurations, the write protection gpio
+    and the overlay state of the HAT eeprom are kept between jobs.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, session: Session = None) -> None:
+        if os.path.exists(socket_path):
+            # remove stale socket of a previous instance
+            os.unlink(socket_path)
+
+        super().__init__(socket_path, ProvisioningRequestHandler)
+
+        self.socket_path = socket_path
+        self.session = session if session is not None else Session()
+        # jobs access the same hardware, so only one may run at a time
+        self._job_lock = threading.Lock()
+
+    def run_job(
+        self,
+        job: Callable,
+        args: dict,
+        progress: Callable,
+        timings: bool = False,
+        profile: list = (),
+    ) -> dict:
+        """Run job and return its result message.
+
+        Parameters
+        ----------
+        job : Callable
+            job function (see JOBS)
+        args : dict
+            arguments of the job
+        progress : Callable
+            callback for progress messages
+        timings : bool, optional
+            add the timing report of the job to the result, by default False
+        profile : list, optional
+            profiling hooks in the form HOOK[:FILE] (see revpi_provisioning.profiling),
+            the hooks of REVPI_EOL_PROFILE of the daemon are added
+
+        Returns
+        -------
+        dict
+            result message with return code, error and optionally the timing report
+        """
+        recorder = TimingRecorder() if timings else None
+        result = {"rc": 0, "error": None}
+
+        try:
+            with self._job_lock, profiling(profile), recording(recorder):
+                try:
+                    job(self.session, args, progress)
+                except JobException as je:
+                    result = {"rc": je.rc, "error": str(je)}
+                except KeyError as ke:
+                    result = {"rc": 1, "error": f"Missing job argument: {ke}"}
+                except Exception as e:
+                    # e.g. malformed arguments, the daemon keeps serving the connection
+                    traceback.print_exc()
+                    result = {"rc": 1, "error": f"Job failed: {type(e).__name__}: {e}"}
+        except ProfilingException as pe:
+            result = {"rc": 1, "error": str(pe)}
+
+        if recorder is not None:
+            result["timings"] = recorder.report(args.get("product"), result["rc"])
+
+        return result
+
+    def server_close(self) -> None:
+        """Close the server and remove the socket file."""
+        super().server_close()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,336 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Parser for images in the Raspberry Pi HAT eeprom format (.eep).
+
+Layout of an image (all values little endian)::
+
+    header:  signature "R-Pi", version (u8), reserved (u8), number of atoms (u16),
+             length of the image (u32)
+    atom:    type (u16), count (u16), length of data and crc (u32), data, crc16 (u16)
+
+The crc16 (CRC-16/ARC) of an atom covers its header and its data. The parser works on
+a memoryview of the image, the atom data is not copied.
+"""
+
+import struct
+from typing import Optional, Union
+
+HEADER = struct.Struct("<4sBBHI")
+ATOM_HEADER = struct.Struct("<HHI")
+CRC = struct.Struct("<H")
+# vendor info atom without strings: uuid, product id, product version, string lengths
+VENDOR_INFO = struct.Struct("<16sHHBB")
+
+SIGNATURE = b"R-Pi"
+FORMAT_VERSION = 1
+
+ATOM_VENDOR_INFO = 0x0001
+ATOM_GPIO_MAP = 0x0002
+ATOM_DT_BLOB = 0x0003
+ATOM_CUSTOM_DATA = 0x0004
+ATOM_GPIO_MAP_BANK1 = 0x0005
+ATOM_TYPES = {
+    ATOM_VENDOR_INFO: "vendor info",
+    ATOM_GPIO_MAP: "gpio map",
+    ATOM_DT_BLOB: "device tree blob",
+    ATOM_CUSTOM_DATA: "custom data",
+    ATOM_GPIO_MAP_BANK1: "gpio map bank 1",
+}
+
+# The product id of the vendor info atom holds the last 5 digits of the product number
+PRODUCT_ID_MODULUS = 100000
+
+
+def _build_crc16_table() -> tuple:
+    table = []
+
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+
+    return tuple(table)
+
+
+_CRC16_TABLE = _build_crc16_table()
+
+
+def crc16(data: Union[bytes, memoryview], crc: int = 0) -> int:
+    """Calculate CRC-16/ARC (polynomial 0x8005, reflected) like eepmake.
+
+    Parameters
+    ----------
+    data : Union[bytes, memoryview]
+        data to calculate the crc of
+    crc : int, optional
+        crc of preceding data, by default 0
+
+    Returns
+    -------
+    int
+        crc16
+    """
+    table = _CRC16_TABLE
+
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+
+    return crc
+
+
+class EEPImageException(Exception):
+    """Exception which is raised if an image is not a valid HAT eeprom image."""
+
+    pass
+
+
+class Atom:
+    """Atom of an image, the data refers to the image buffer."""
+
+    __slots__ = ("type", "count", "offset", "data")
+
+    def __init__(self, atom_type: int, count: int, offset: int, data: memoryview) -> None:
+        self.type = atom_type
+        self.count = count
+        # offset of the atom header in the image
+        self.offset = offset
+        self.data = data
+
+
+class VendorInfo:
+    """Content of the vendor info atom."""
+
+    def __init__(
+        self, uuid: bytes, product_id: int, product_version: int, vendor: str, product: str
+    ) -> None:
+        self.uuid = uuid
+        self.product_id = product_id
+        self.product_version = product_version
+        self.vendor = vendor
+        self.product = product
+
+    @classmethod
+    def unpack(cls, data: memoryview) -> "VendorInfo":
+        """Unpack vendor info atom data.
+
+        Parameters
+        ----------
+        data : memoryview
+            data of the vendor info atom
+
+        Returns
+        -------
+        VendorInfo
+            vendor info
+
+        Raises
+        ------
+        EEPImageException
+            the data is too short for the strings
+        """
+        if len(data) < VENDOR_INFO.size:
+            raise EEPImageException("Vendor info atom is truncated")
+
+        (uuid, product_id, product_version, vendor_length, product_length) = (
+            VENDOR_INFO.unpack_from(data)
+        )
+        end = VENDOR_INFO.size + vendor_length + product_length
+        if len(data) < end:
+            raise EEPImageException("Vendor info atom is truncated")
+
+        vendor = bytes(data[VENDOR_INFO.size : VENDOR_INFO.size + vendor_length])
+        product = bytes(data[VENDOR_INFO.size + vendor_length : end])
+
+        return cls(
+            uuid,
+            product_id,
+            product_version,
+            vendor.decode("ascii", "replace"),
+            product.decode("ascii", "replace"),
+        )
+
+    def pack(self) -> bytes:
+        """Pack vendor info to atom data.
+
+        Returns
+        -------
+        bytes
+            data of the vendor info atom
+        """
+        vendor = self.vendor.encode("ascii")
+        product = self.product.encode("ascii")
+
+        return (
+            VENDOR_INFO.pack(
+                self.uuid, self.product_id, self.product_version, len(vendor), len(product)
+            )
+            + vendor
+            + product
+        )
+
+
+class EEPImage:
+    """Parsed HAT eeprom image."""
+
+    def __init__(self, buffer: memoryview, version: int, length: int, atoms: list) -> None:
+        self.buffer = buffer
+        self.version = version
+        # length of the image according to the header
+        self.length = length
+        self.atoms = atoms
+
+    def atom(self, atom_type: int) -> Optional[Atom]:
+        """Return the first atom of a type.
+
+        Parameters
+        ----------
+        atom_type : int
+            atom type (see ATOM_TYPES)
+
+        Returns
+        -------
+        Atom, optional
+            atom, None if the image does not contain an atom of the type
+        """
+        for atom in self.atoms:
+            if atom.type == atom_type:
+                return atom
+
+        return None
+
+    @property
+    def vendor_info(self) -> Optional[VendorInfo]:
+        """Content of the vendor info atom, None if the image does not contain one."""
+        atom = self.atom(ATOM_VENDOR_INFO)
+
+        return VendorInfo.unpack(atom.data) if atom is not None else None
+
+    def check_product(self, product_id: str) -> None:
+        """Check that the image belongs to a product.
+
+        Parameters
+        ----------
+        product_id : str
+            product id (product number without revision, e.g. 100383)
+
+        Raises
+        ------
+        EEPImageException
+            the image has no vendor info atom or it belongs to another product
+        """
+        vendor_info = self.vendor_info
+        if vendor_info is None:
+            raise EEPImageException("Image has no vendor info atom")
+
+        if vendor_info.product_id != int(product_id) % PRODUCT_ID_MODULUS:
+            raise EEPImageException(
+                f"Image is for product id {vendor_info.product_id} ('{vendor_info.product}'), "
+                + f"not for product {product_id}"
+            )
+
+
+def parse_image(image: Union[bytes, bytearray, memoryview]) -> EEPImage:
+    """Parse and validate a HAT eeprom image.
+
+    Parameters
+    ----------
+    image : Union[bytes, bytearray, memoryview]
+        image content, bytes after the length in the header are ignored
+
+    Returns
+    -------
+    EEPImage
+        parsed image
+
+    Raises
+    ------
+    EEPImageException
+        the image is truncated or corrupted
+    """
+    buffer = memoryview(image)
+
+    if len(buffer) < HEADER.size:
+        raise EEPImageException(f"Image is truncated: {len(buffer)} bytes")
+
+    (signature, version, _, atom_count, length) = HEADER.unpack_from(buffer)
+    if signature != SIGNATURE:
+        raise EEPImageException(f"Invalid signature: {signature!r}")
+    if version != FORMAT_VERSION:
+        raise EEPImageException(f"Unsupported format version: {version}")
+    if length < HEADER.size:
+        raise EEPImageException(f"Invalid image length in header: {length}")
+    if length > len(buffer):
+        raise EEPImageException(f"Image is truncated: {len(buffer)} of {length} bytes")
+
+    atoms = []
+    offset = HEADER.size
+    for index in range(atom_count):
+        if offset + ATOM_HEADER.size > length:
+            raise EEPImageException(f"Atom {index} at offset 0x{offset:04x} is truncated")
+
+        (atom_type, count, data_length) = ATOM_HEADER.unpack_from(buffer, offset)
+        end = offset + ATOM_HEADER.size + data_length
+        if data_length < CRC.size or end > length:
+            raise EEPImageException(f"Atom {index} at offset 0x{offset:04x} is truncated")
+        if count != index:
+            raise EEPImageException(f"Atom {index} at offset 0x{offset:04x} has count {count}")
+
+        (expected_crc,) = CRC.unpack_from(buffer, end - CRC.size)
+        actual_crc = crc16(buffer[offset : end - CRC.size])
+        if actual_crc != expected_crc:
+            raise EEPImageException(
+                f"CRC mismatch of atom {index} at offset 0x{offset:04x} "
+                + f"(0x{actual_crc:04x} != 0x{expected_crc:04x})"
+            )
+
+        atoms.append(
+            Atom(atom_type, count, offset, buffer[offset + ATOM_HEADER.size : end - CRC.size])
+        )
+        offset = end
+
+    return EEPImage(buffer, version, length, atoms)
+
+
+def pack_atom(atom_type: int, count: int, data: bytes) -> bytes:
+    """Pack an atom with its crc.
+
+    Parameters
+    ----------
+    atom_type : int
+        atom type (see ATOM_TYPES)
+    count : int
+        index of the atom in the image
+    data : bytes
+        atom data
+
+    Returns
+    -------
+    bytes
+        atom
+    """
+    atom = ATOM_HEADER.pack(atom_type, count, len(data) + CRC.size) + data
+
+    return atom + CRC.pack(crc16(atom))
+
+
+def build_image(atoms: list) -> bytes:
+    """Build an image from atoms.
+
+    Parameters
+    ----------
+    atoms : list
+        (atom type, data) tuples
+
+    Returns
+    -------
+    bytes
+        image
+    """
+    packed = b"".join(
+        pack_atom(atom_type, count, data) for count, (atom_type, data) in enumerate(atoms)
+    )
+
+    return HEADER.pack(SIGNATURE, FORMAT_VERSION, 0, len(atoms), HEADER.size + len(packed)) + packed
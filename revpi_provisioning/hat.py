@@ -4,18 +4,40 @@
 
 """HAT eeprom related stuff."""
 
+import contextlib
 import hashlib
+import io
+import json
 import os
 import subprocess
+import tempfile
+import threading
 import time
-import glob
-from typing import Optional, Union
+from typing import BinaryIO, Callable, Optional, Union
 
-import gpiod
+import revpi_provisioning.inventory
+from revpi_provisioning.eep import EEPImageException, parse_image
+from revpi_provisioning.inventory import EEPROMS, EEPROMNode, HardwareInventory
+from revpi_provisioning.timing import phase
+from revpi_provisioning.tools import run_tool
 
 DEFAULT_GPIO_CHIP = "gpiochip0"
 DEFAULT_OVERLAY = "revpi-hat-eeprom"
+DEFAULT_CONFIGFS_OVERLAYS = "/sys/kernel/config/device-tree/overlays"
+DEFAULT_OVERLAY_DIRS = ["/boot/firmware/overlays", "/boot/overlays"]
 DEFAULT_EEPROM_PATHS = ["/sys/bus/i2c/devices/?-0050/eeprom", "/sys/bus/i2c/devices/??-0050/eeprom"]
+# Page sizes of the at24 family by eeprom size, used if the device tree does not specify one
+AT24_PAGE_SIZES = {128: 8, 256: 16, 512: 16, 1024: 16, 2048: 16, 4096: 32, 8192: 32, 16384: 64}
+DEFAULT_PAGE_SIZE = 32
+# Maximum time in seconds to wait for the eeprom node after loading the overlay
+EEPROM_SETTLE_TIMEOUT = 5.0
+# Bounds of the poll interval in seconds while waiting for the eeprom node
+EEPROM_POLL_INTERVAL_MIN = 0.005
+EEPROM_POLL_INTERVAL_MAX = 0.1
+# Number of differing bytes which are listed if the verification fails
+MAX_REPORTED_DIFFERENCES = 8
+# Number of pages which are written and read back as one block
+WRITE_BLOCK_PAGES = 8
 
 
 class HatEEPROMWriteException(Exception):
@@ -25,6 +47,215 @@ class HatEEPROMWriteException(Exception):
         super().__init__(f"RevPi HAT EEPROM: {message}")
 
 
+class OverlayManager:
+    """Base class for listing and loading device tree overlays at runtime."""
+
+    def loaded_overlays(self) -> list:
+        """Return the names of all loaded overlays.
+
+        Returns
+        -------
+        list
+            names of loaded overlays in load order
+        """
+        raise NotImplementedError()
+
+    def load(self, name: str) -> None:
+        """Load overlay by name.
+
+        Parameters
+        ----------
+        name : str
+            name of the overlay (without .dtbo suffix)
+        """
+        raise NotImplementedError()
+
+
+class ConfigfsOverlayManager(OverlayManager):
+    """Overlay manager which uses the device tree overlay interface in configfs directly.
+
+    Overlays are named like the ones of the dtoverlay tool (`<index>_<name>`), so both
+    can be used alongside each other.
+    """
+
+    def __init__(
+        self, root: str = DEFAULT_CONFIGFS_OVERLAYS, overlay_dirs: list = DEFAULT_OVERLAY_DIRS
+    ) -> None:
+        self.root = root
+        self.overlay_dirs = overlay_dirs
+
+    def _entries(self) -> list:
+        """Return (index, name, directory) of all overlay entries sorted by index."""
+        entries = []
+
+        try:
+            directories = os.listdir(self.root)
+        except OSError as e:
+            raise HatEEPROMWriteException(f"Failed to list loaded overlays: {e}") from e
+
+        for directory in directories:
+            (index, _, name) = directory.partition("_")
+            if not index.isdigit() or not name:
+                continue
+
+            entries.append((int(index), name, directory))
+
+        return sorted(entries)
+
+    def loaded_overlays(self) -> list:
+        """Return the names of all applied overlays.
+
+        Returns
+        -------
+        list
+            names of loaded overlays in load order
+        """
+        return [
+            name
+            for (_, name, directory) in self._entries()
+            if self._status(directory) in ("applied", None)
+        ]
+
+    def _status(self, directory: str) -> Optional[str]:
+        """Return the status of an overlay entry or None if it has no status."""
+        try:
+            with open(os.path.join(self.root, directory, "status"), "r") as fh:
+                return fh.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _find_dtbo(self, name: str) -> str:
+        for overlay_dir in self.overlay_dirs:
+            dtbo = os.path.join(overlay_dir, f"{name}.dtbo")
+            if os.path.exists(dtbo):
+                return dtbo
+
+        raise HatEEPROMWriteException(
+            f"Failed to load overlay '{name}': {name}.dtbo not found in "
+            + ", ".join(self.overlay_dirs)
+        )
+
+    def load(self, name: str) -> None:
+        """Load overlay by name.
+
+        Parameters
+        ----------
+        name : str
+            name of the overlay (without .dtbo suffix)
+
+        Raises
+        ------
+        HatEEPROMWriteException
+            Unable to load the overlay
+        """
+        dtbo = self._find_dtbo(name)
+        entries = self._entries()
+        index = entries[-1][0] + 1 if entries else 0
+        directory = f"{index}_{name}"
+
+        try:
+            with open(dtbo, "rb") as fh:
+                data = fh.read()
+
+            os.mkdir(os.path.join(self.root, directory))
+            with open(os.path.join(self.root, directory, "dtbo"), "wb") as fh:
+                fh.write(data)
+        except OSError as e:
+            raise HatEEPROMWriteException(f"Failed to load overlay '{name}': {e}") from e
+
+        status = self._status(directory)
+        if status not in ("applied", None):
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.join(self.root, directory))
+            raise HatEEPROMWriteException(f"Failed to load overlay '{name}': status {status}")
+
+
+class DtoverlayOverlayManager(OverlayManager):
+    """Overlay manager which calls the dtoverlay tool."""
+
+    def loaded_overlays(self) -> list:
+        """Return the names of all loaded overlays.
+
+        Returns
+        -------
+        list
+            names of loaded overlays in load order
+        """
+        overlays = []
+
+        try:
+            lines = run_tool(["dtoverlay", "-l"]).decode("utf-8").split("\n")
+
+            # skip first line (headline)
+            for line in lines[1:]:
+                if ":" not in line:
+                    continue
+
+                (_, name) = line.replace(" ", "").split(":", 1)
+                overlays.append(name)
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            raise HatEEPROMWriteException(f"Failed to list loaded overlays: {e}") from e
+
+        return overlays
+
+    def load(self, name: str) -> None:
+        """Load overlay by name.
+
+        Parameters
+        ----------
+        name : str
+            name of the overlay (without .dtbo suffix)
+
+        Raises
+        ------
+        HatEEPROMWriteException
+            Unable to load the overlay
+        """
+        try:
+            run_tool(["dtoverlay", name])
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            raise HatEEPROMWriteException(f"Failed to load overlay '{name}': {e}") from e
+
+
+def find_overlay_manager(
+    configfs_root: str = DEFAULT_CONFIGFS_OVERLAYS,
+    overlay: Optional[str] = None,
+    overlay_dirs: Optional[list] = None,
+) -> OverlayManager:
+    """Get the overlay manager for the running system.
+
+    The configfs interface is used if it is available and the overlay is found in its
+    search path, otherwise the dtoverlay tool, which knows the overlay directory of
+    the firmware.
+
+    Parameters
+    ----------
+    configfs_root : str, optional
+        overlay directory in configfs, by default DEFAULT_CONFIGFS_OVERLAYS
+    overlay : str, optional
+        name of the overlay which is going to be loaded, not checked if None
+    overlay_dirs : list, optional
+        search path of the configfs interface, by default DEFAULT_OVERLAY_DIRS
+
+    Returns
+    -------
+    OverlayManager
+        overlay manager instance
+    """
+    if os.path.isdir(configfs_root):
+        manager = ConfigfsOverlayManager(configfs_root, overlay_dirs or DEFAULT_OVERLAY_DIRS)
+        if overlay is None:
+            return manager
+
+        try:
+            manager._find_dtbo(overlay)
+            return manager
+        except HatEEPROMWriteException:
+            pass
+
+    return DtoverlayOverlayManager()
+
+
 class HatEEPROM:
     """HAT eeprom representation class."""
 
@@ -34,45 +265,82 @@ class HatEEPROM:
         gpio_chip: str = DEFAULT_GPIO_CHIP,
         base_eeprom: Optional[str] = None,
         overlay: str = DEFAULT_OVERLAY,
+        delta_write: bool = True,
+        overlay_manager: Optional[OverlayManager] = None,
+        inventory: Optional[HardwareInventory] = None,
+        checkpoint: Optional[str] = None,
     ) -> None:
         self.write_protect_gpio = write_protect_gpio
         self.gpio_chip = gpio_chip
+        self.delta_write = delta_write
         self._base_eeprom = base_eeprom
         self._overlay = overlay
+        self._overlay_manager = overlay_manager
+        self._overlay_loaded = False
+        self.inventory = inventory if inventory is not None else HardwareInventory()
+        # file which records the verified part of an interrupted image write, None to disable
+        self.checkpoint = checkpoint
+
+        # time in seconds it took the eeprom node to appear after loading the overlay
+        self.settle_time: Optional[float] = None
 
         self.__write_protect_gpio_line = None
         self._chip = None
-        self._gpiod_version = self._detect_gpiod_version()
+        # gpiod is imported on first use of the write protection gpio
+        self._gpiod_version = None
 
     def _detect_gpiod_version(self) -> int:
         """Detect libgpiod version (1 or 2)."""
+        import gpiod
+
         version = getattr(gpiod, "__version__", "1.0")
         return 2 if version.startswith("2") else 1
 
     @property
-    def base_eeprom(self) -> str:
-        """Base path of the HAT eeprom in sysfs."""
+    def eeprom_node(self) -> EEPROMNode:
+        """EEPROM node of the HAT eeprom in sysfs (see HardwareInventory)."""
         if self._base_eeprom is not None:
             paths = [self._base_eeprom]
         else:
             paths = DEFAULT_EEPROM_PATHS
 
-        for path in paths:
-            eeprom_path = glob.glob(path)
-            if eeprom_path:
-                # take first match
-                break
-
-        if not eeprom_path:
+        nodes = self.inventory.eeproms(paths)
+        if not nodes:
             raise HatEEPROMWriteException("Unable to determine HAT eeprom i2c path")
 
-        return eeprom_path[0]
+        # take first match
+        return nodes[0]
+
+    @property
+    def base_eeprom(self) -> str:
+        """Base path of the HAT eeprom in sysfs."""
+        return self.eeprom_node.path
+
+    @property
+    def page_size(self) -> int:
+        """Page size of the HAT eeprom in bytes.
+
+        The page size is taken from the device tree node of the eeprom. If it is not
+        specified there, the page size of the at24 type with the same size is used.
+        """
+        node = self.eeprom_node
+        if node.page_size:
+            return node.page_size
+
+        return AT24_PAGE_SIZES.get(node.size, DEFAULT_PAGE_SIZE)
 
     def _init_gpio(self) -> None:
+        import gpiod
+
+        self._gpiod_version = self._detect_gpiod_version()
+
         try:
             if self._gpiod_version == 2:
                 # libgpiod v2.x API
-                chip_path = f"/dev/{self.gpio_chip}"
+                if self.gpio_chip not in self.inventory.gpio_chips:
+                    raise HatEEPROMWriteException(f"GPIO chip '{self.gpio_chip}' not found")
+
+                chip_path = os.path.join(revpi_provisioning.inventory.DEV_ROOT, self.gpio_chip)
                 self._chip = gpiod.Chip(chip_path)
 
                 self.__write_protect_gpio_line = self._chip.request_lines(
@@ -120,8 +388,91 @@ class HatEEPROM:
 
         return data
 
-    def _write_image(self, eeprom_image: Union[str, bytes], length: int = None) -> None:
-        """Write image to HAT eeprom.
+    def _read_eeprom(self, fd: int, length: int, offset: int = 0) -> bytes:
+        """Read from eeprom file descriptor until length bytes are read.
+
+        Reads from sysfs are limited in size, so a single read might return less data.
+        """
+        data = bytearray()
+
+        while len(data) < length:
+            chunk = os.pread(fd, length - len(data), offset + len(data))
+            if not chunk:
+                break
+            data += chunk
+
+        return bytes(data)
+
+    def _read_checkpoint(self, eeprom_path: str, data: bytes, digest: Optional[str]) -> int:
+        """Return the offset of an interrupted write of the same image, else 0."""
+        if self.checkpoint is None:
+            return 0
+
+        try:
+            with open(self.checkpoint) as fh:
+                checkpoint = json.load(fh)
+        except (OSError, ValueError):
+            return 0
+
+        if checkpoint.get("eeprom") != eeprom_path:
+            return 0
+        if checkpoint.get("sha256") != (digest or hashlib.sha256(data).hexdigest()):
+            return 0
+
+        return checkpoint.get("offset", 0)
+
+    def _write_checkpoint(
+        self, eeprom_path: str, data: bytes, digest: Optional[str], offset: int
+    ) -> None:
+        """Record the verified offset of an interrupted write.
+
+        The checkpoint is only an optimization, errors are ignored.
+        """
+        if self.checkpoint is None or not offset:
+            return
+
+        try:
+            directory = os.path.dirname(self.checkpoint) or "."
+            os.makedirs(directory, exist_ok=True)
+            (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix=".checkpoint.")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(
+                    {
+                        "eeprom": eeprom_path,
+                        "sha256": digest or hashlib.sha256(data).hexdigest(),
+                        "offset": offset,
+                    },
+                    fh,
+                )
+            os.replace(tmp_path, self.checkpoint)
+        except OSError:
+            pass
+
+    def _remove_checkpoint(self) -> None:
+        if self.checkpoint is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(self.checkpoint)
+
+    def _write_image(
+        self,
+        eeprom_image: Union[str, bytes],
+        length: int = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        digest: Optional[str] = None,
+    ) -> int:
+        """Write image to HAT eeprom and verify it.
+
+        The image is written in blocks of WRITE_BLOCK_PAGES pages. In delta write mode
+        the current eeprom contents are read first and pages which already hold the
+        right data are skipped. Only the written pages are read back and verified, so
+        the eeprom holds the image once all blocks are done.
+
+        If a checkpoint file is set and the write fails or is cancelled, the verified
+        offset is recorded. A retry of the same image on the same eeprom path continues
+        with the block at that offset, the blocks before it are neither read nor
+        written. The device may have been replaced in the meantime, so the last page
+        before the offset is read first and the write starts over if it differs.
 
         Parameters
         ----------
@@ -129,60 +480,214 @@ class HatEEPROM:
             Image file or image content as bytes
         length : int, optional
             Number of bytes to read from image file
+        progress : Callable[[int, int], None], optional
+            called with the verified offset and the image length after each block
+        cancelled : threading.Event, optional
+            the write stops before the next block once this is set
+        digest : str, optional
+            sha256 of the image (hex) for the checkpoint, calculated if needed and None
+
+        Returns
+        -------
+        int
+            Number of pages which were skipped, because their content was already up to date
 
         Raises
         ------
         HatEEPROMWriteException
             Unable to write HAT eeprom image
         """
+        verified = 0
+
         try:
-            eeprom_length = os.path.getsize(self.base_eeprom)
+            node = self.eeprom_node
+            (eeprom_path, eeprom_length) = (node.path, node.size)
 
-            data = self._read_image_file(eeprom_image, length)
+            data = memoryview(self._read_image_file(eeprom_image, length))
 
             if len(data) > eeprom_length:
                 raise Exception("Image file is too big for EEPROM")
 
-            with open(self.base_eeprom, "wb") as file_eeprom:
-                file_eeprom.write(data)
+            page_size = self.page_size
+            block_size = page_size * WRITE_BLOCK_PAGES
+
+            checkpoint = self._read_checkpoint(eeprom_path, data, digest)
+            resume = min(checkpoint - checkpoint % block_size, len(data) - len(data) % block_size)
+            skipped_pages = 0
+
+            fd = os.open(eeprom_path, os.O_RDWR)
+            try:
+                if resume and self._read_eeprom(fd, page_size, resume - page_size) != bytes(
+                    data[resume - page_size : resume]
+                ):
+                    # another device or the content was changed since the checkpoint
+                    resume = 0
+                verified = resume
+
+                if progress is not None:
+                    progress(resume, len(data))
+
+                for block in range(resume, len(data), block_size):
+                    if cancelled is not None and cancelled.is_set():
+                        raise Exception(f"Write cancelled at offset {block}")
+
+                    block_data = data[block : block + block_size]
+                    with phase("hat_write_block", offset=block, length=len(block_data)):
+                        skipped_pages += self._write_block(
+                            fd, block, block_data, page_size, self.delta_write
+                        )
+
+                    verified = block + len(block_data)
+                    if progress is not None:
+                        progress(verified, len(data))
+            finally:
+                os.close(fd)
         except Exception as exc:
+            if verified:
+                self._write_checkpoint(eeprom_path, data, digest, verified)
             raise HatEEPROMWriteException(f"Failed to write image to EEPROM: {exc}") from exc
 
-    def _loaded_overlays(self) -> list:
-        overlays = []
+        if checkpoint:
+            self._remove_checkpoint()
 
-        try:
-            process = subprocess.run(["dtoverlay", "-l"], check=True, capture_output=True)
-            lines = process.stdout.decode("utf-8").split("\n")
+        return skipped_pages
 
-            # skip first line (headline)
-            for line in lines[1:]:
-                if ":" not in line:
-                    continue
+    def _write_block(
+        self, fd: int, offset: int, data: memoryview, page_size: int, compare: bool
+    ) -> int:
+        """Write the differing pages of a block and verify them.
 
-                (_, name) = line.replace(" ", "").split(":")
-                overlays.append(name)
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            raise HatEEPROMWriteException(f"Failed to list loaded overlays: {e}") from e
+        Parameters
+        ----------
+        fd : int
+            file descriptor of the eeprom
+        offset : int
+            offset of the block in the eeprom
+        data : memoryview
+            content of the block
+        page_size : int
+            page size of the eeprom
+        compare : bool
+            read the block first and skip the pages which are up to date
 
-        return overlays
+        Returns
+        -------
+        int
+            number of skipped pages
+
+        Raises
+        ------
+        Exception
+            the written pages do not read back correctly
+        """
+        current = self._read_eeprom(fd, len(data), offset) if compare else b""
+        skipped_pages = 0
+        # ranges of consecutive written pages (start, end) relative to the block
+        written = []
+
+        for page_offset in range(0, len(data), page_size):
+            page = data[page_offset : page_offset + page_size]
+
+            if current[page_offset : page_offset + page_size] == page:
+                skipped_pages += 1
+                continue
+
+            count = 0
+            while count < len(page):
+                count += os.pwrite(fd, page[count:], offset + page_offset + count)
+
+            if written and written[-1][1] == page_offset:
+                written[-1] = (written[-1][0], page_offset + len(page))
+            else:
+                written.append((page_offset, page_offset + len(page)))
+
+        if not written:
+            return skipped_pages
+
+        with phase("hat_verify", offset=offset, length=sum(end - start for start, end in written)):
+            for start, end in written:
+                expected = bytes(data[start:end])
+                actual = self._read_eeprom(fd, end - start, offset + start)
+                if actual != expected:
+                    raise Exception(
+                        "Failed to verify block: "
+                        + self._describe_mismatch(offset + start, actual, expected)
+                    )
 
-    def _load_dtoverlay(self, wait_afterwards: int = 0.5) -> None:
-        if self._overlay in self._loaded_overlays():
-            # overlay already loaded, no need to do it again
+        return skipped_pages
+
+    @property
+    def overlay_manager(self) -> OverlayManager:
+        """Overlay manager which is used to load the HAT eeprom overlay."""
+        if self._overlay_manager is None:
+            self._overlay_manager = find_overlay_manager(overlay=self._overlay)
+
+        return self._overlay_manager
+
+    def _load_dtoverlay(self, timeout: float = EEPROM_SETTLE_TIMEOUT) -> None:
+        self.settle_time = None
+
+        if self._overlay_loaded:
+            # overlay was loaded by this instance before
             return
 
-        try:
-            subprocess.check_call(["dtoverlay", self._overlay])
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            raise HatEEPROMWriteException(f"Failed to load overlay '{self._overlay}': {e}") from e
+        if self._overlay not in self.overlay_manager.loaded_overlays():
+            with phase("overlay_load", overlay=self._overlay):
+                self.overlay_manager.load(self._overlay)
+                # the overlay adds the eeprom node
+                self.inventory.invalidate(EEPROMS)
+                self.settle_time = self._wait_for_eeprom(timeout)
+
+        self._overlay_loaded = True
+
+    def _wait_for_eeprom(self, timeout: float = EEPROM_SETTLE_TIMEOUT) -> float:
+        """Wait until the eeprom node is present and readable.
 
-        time.sleep(wait_afterwards)
+        The eeprom paths are polled with an increasing interval.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            maximum time to wait in seconds, by default EEPROM_SETTLE_TIMEOUT
+
+        Returns
+        -------
+        float
+            time in seconds until the eeprom node was ready
+
+        Raises
+        ------
+        HatEEPROMWriteException
+            The eeprom node did not appear within the timeout
+        """
+        start = time.monotonic()
+        interval = EEPROM_POLL_INTERVAL_MIN
+
+        while True:
+            try:
+                if os.access(self.base_eeprom, os.R_OK):
+                    return time.monotonic() - start
+            except HatEEPROMWriteException:
+                # node does not exist yet, scan again on next poll
+                self.inventory.invalidate(EEPROMS)
+
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout:
+                raise HatEEPROMWriteException(
+                    f"HAT eeprom did not appear within {timeout:.1f} s "
+                    + f"after loading overlay '{self._overlay}'"
+                )
+
+            time.sleep(min(interval, timeout - elapsed))
+            interval = min(interval * 2, EEPROM_POLL_INTERVAL_MAX)
 
     def _write_protect(self, state: bool) -> None:
         if self.__write_protect_gpio_line is None:
             # initialize gpio as output if not done yet
-            self._init_gpio()
+            with phase("gpio_init"):
+                self._init_gpio()
+
+        import gpiod
 
         try:
             if self._gpiod_version == 2:
@@ -195,55 +700,216 @@ class HatEEPROM:
         except OSError as e:
             raise HatEEPROMWriteException(f"Failed to set write protection gpio: {e}") from e
 
-    def _sha256_checksum(self, data: bytes) -> str:
-        try:
-            sha256_checksum = hashlib.sha256(data).hexdigest()
-        except Exception as exc:
-            raise HatEEPROMWriteException(
-                f"Failed to get SHA256 checksum of HAT eeprom: {exc}"
-            ) from exc
+    def _open_image(self, eeprom_image: Union[str, bytes]) -> BinaryIO:
+        """Open image file or wrap image content as file object.
 
-        return sha256_checksum
+        Parameters
+        ----------
+        eeprom_image : Union[str, bytes]
+            Image file or image content as bytes
 
-    def _verify_image(self, eeprom_image: Union[str, bytes]) -> None:
+        Returns
+        -------
+        BinaryIO
+            file object to read the image from
+        """
+        if isinstance(eeprom_image, str):
+            return open(eeprom_image, "rb")
+
+        return io.BytesIO(eeprom_image)
+
+    def _verify_image(self, eeprom_image: Union[str, bytes], length: int = None) -> None:
         """Verify HAT eeprom against image file or contents.
 
+        The image and the eeprom are compared page by page. Only the range covered by
+        the image is read back and the verification stops at the first mismatch.
+
         Parameters
         ----------
         eeprom_image : Union[str, bytes]
             Image file or image content as bytes
+        length : int, optional
+            Number of bytes to verify
 
         Raises
         ------
         HatEEPROMWriteException
             Unable to verify image contents
         """
-        data_image = self._read_image_file(eeprom_image)
-        data_eep = self._read_image_file(self.base_eeprom)
+        try:
+            page_size = self.page_size
+            remaining = length
+
+            with self._open_image(eeprom_image) as fh_image:
+                fd = os.open(self.base_eeprom, os.O_RDONLY)
+                try:
+                    offset = 0
+                    while remaining is None or remaining > 0:
+                        data_image = fh_image.read(
+                            page_size if remaining is None else min(page_size, remaining)
+                        )
+                        if not data_image:
+                            break
+
+                        data_eep = self._read_eeprom(fd, len(data_image), offset)
+                        if data_eep != data_image:
+                            raise HatEEPROMWriteException(
+                                "Failed to verify image: "
+                                + self._describe_mismatch(offset, data_eep, data_image)
+                            )
+
+                        offset += len(data_image)
+                        if remaining is not None:
+                            remaining -= len(data_image)
+                finally:
+                    os.close(fd)
+        except OSError as exc:
+            raise HatEEPROMWriteException(f"Failed to verify image: {exc}") from exc
+
+    def _describe_mismatch(self, offset: int, data_eep: bytes, data_image: bytes) -> str:
+        """Describe the differing bytes of a page.
+
+        Parameters
+        ----------
+        offset : int
+            offset of the page in the eeprom
+        data_eep : bytes
+            page content read from the eeprom
+        data_image : bytes
+            expected page content from the image
+
+        Returns
+        -------
+        str
+            description of the mismatch
+        """
+        if len(data_eep) < len(data_image):
+            return f"eeprom ends at offset 0x{offset + len(data_eep):04x}"
 
-        sha256_eeprom_image = self._sha256_checksum(data_image)
-        sha256_eeprom = self._sha256_checksum(data_eep[: len(data_image)])
+        differences = [
+            f"0x{offset + index:04x}: 0x{eep:02x} != 0x{image:02x}"
+            for index, (eep, image) in enumerate(zip(data_eep, data_image, strict=True))
+            if eep != image
+        ]
 
-        if sha256_eeprom != sha256_eeprom_image:
+        description = f"content mismatch in page at offset 0x{offset:04x} (eeprom != image): "
+        description += ", ".join(differences[:MAX_REPORTED_DIFFERENCES])
+        if len(differences) > MAX_REPORTED_DIFFERENCES:
+            description += f" and {len(differences) - MAX_REPORTED_DIFFERENCES} more"
+
+        return description
+
+    def _check_image(self, data: bytes, product_id: Optional[str] = None) -> None:
+        """Check that the image is a valid HAT eeprom image which fits into the eeprom.
+
+        Parameters
+        ----------
+        data : bytes
+            image content
+        product_id : str, optional
+            product id the image has to belong to, not checked if None
+
+        Raises
+        ------
+        HatEEPROMWriteException
+            the image is invalid, belongs to another product or is too big
+        """
+        try:
+            image = parse_image(data)
+            if product_id is not None:
+                image.check_product(product_id)
+        except EEPImageException as exc:
+            raise HatEEPROMWriteException(f"Invalid image: {exc}") from exc
+
+        eeprom_length = self.eeprom_node.size
+        if len(data) > eeprom_length:
             raise HatEEPROMWriteException(
-                "Failed to verify image: sha256 checksum mismatch: "
-                + f"{sha256_eeprom} (eeprom) != {sha256_eeprom_image} (image)"
+                f"Image is too big for EEPROM: {len(data)} > {eeprom_length} bytes"
             )
 
-    def write(self, eeprom_image: str) -> None:
-        """Write HAT eeprom contents."""
-        self._write_protect(False)
+    def write(
+        self,
+        eeprom_image: Union[str, bytes],
+        product_id: Optional[str] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        digest: Optional[str] = None,
+    ) -> int:
+        """Write HAT eeprom contents.
+
+        The image is validated before the write protection is disabled. The write
+        protection is enabled again in any case, also if the write is cancelled. Each
+        written page is read back and verified (see _write_image).
+
+        Parameters
+        ----------
+        eeprom_image : Union[str, bytes]
+            Image file or image content as bytes
+        product_id : str, optional
+            product id the image has to belong to (see EEPImage.check_product), not
+            checked if None
+        progress : Callable[[int, int], None], optional
+            called with the written and verified bytes and the image length
+        cancelled : threading.Event, optional
+            the write stops before the next block once this is set (the checkpoint
+            is written, if one is set)
+        digest : str, optional
+            sha256 of the image (hex), e.g. from the ImageCache, for the checkpoint
+
+        Returns
+        -------
+        int
+            Number of pages which were skipped, because their content was already up to date
+        """
+        try:
+            data = self._read_image_file(eeprom_image)
+        except OSError as exc:
+            raise HatEEPROMWriteException(f"Failed to read image: {exc}") from exc
+
         self._load_dtoverlay()
-        self._write_image(eeprom_image)
-        self._verify_image(eeprom_image)
-        self._write_protect(True)
+        self._check_image(data, product_id)
+
+        self._write_protect(False)
+        try:
+            with phase("hat_write"):
+                skipped_pages = self._write_image(
+                    data, progress=progress, cancelled=cancelled, digest=digest
+                )
+        finally:
+            # also if the write failed or the provisioning step was cancelled
+            self._write_protect(True)
+
+        return skipped_pages
 
-    def clear_content(self) -> None:
-        """Clear HAT eeprom contents."""
+    def clear_content(self) -> int:
+        """Clear HAT eeprom contents.
+
+        Returns
+        -------
+        int
+            Number of pages which were skipped, because they were already cleared
+        """
+        self._load_dtoverlay()
         self._write_protect(False)
+        try:
+            with phase("hat_clear"):
+                skipped_pages = self._write_image(b"\xff" * self.eeprom_node.size)
+        finally:
+            self._write_protect(True)
+
+        return skipped_pages
+
+    def verify(self, eeprom_image: Union[str, bytes]) -> None:
+        """Verify HAT eeprom contents against image.
+
+        Parameters
+        ----------
+        eeprom_image : Union[str, bytes]
+            Image file or image content as bytes
+        """
         self._load_dtoverlay()
-        self._write_image(b"\xff" * os.path.getsize(self.base_eeprom))
-        self._write_protect(True)
+        with phase("hat_verify"):
+            self._verify_image(eeprom_image)
 
     def dump(self, output_file: str) -> None:
         """Dump eeprom contents to file.
@@ -256,9 +922,10 @@ class HatEEPROM:
         self._load_dtoverlay()
 
         try:
-            with open(self.base_eeprom, "rb") as fh, open(output_file, "wb") as fh_output:
-                data = fh.read()
-                fh_output.write(data)
+            with phase("hat_dump"):
+                with open(self.base_eeprom, "rb") as fh, open(output_file, "wb") as fh_output:
+                    data = fh.read()
+                    fh_output.write(data)
         except Exception as exc:
             raise HatEEPROMWriteException(
                 f"Could not dump EEPROM contents / write to output file: {exc}"
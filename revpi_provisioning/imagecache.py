@@ -0,0 +1,284 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Local cache of HAT eeprom images and templates.
+
+The images are often stored on a network share and are the same for hundreds of
+devices. The cache keeps a copy of each image in a local directory (on tmpfs by
+default), named by the sha256 of its content. The index of the cache maps the path,
+size and modification time of a source file to the content hash, so an unchanged image
+is neither read from the share nor hashed again. The total size of the copies is
+bounded, the least recently used ones are evicted first.
+
+The index is locked with flock, so the cache can be used by several processes.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Iterator, Optional
+
+DEFAULT_IMAGE_CACHE = "/run/revpi-eol-provisioner/images"
+DEFAULT_IMAGE_CACHE_SIZE = 64 * 1024 * 1024
+IMAGE_CACHE_INDEX = "index.json"
+
+
+class ImageCache:
+    """Copies of image files by content hash with LRU eviction."""
+
+    def __init__(self, directory: Optional[str] = None, max_size: Optional[int] = None) -> None:
+        """Create ImageCache instance.
+
+        Parameters
+        ----------
+        directory : str, optional
+            cache directory, by default DEFAULT_IMAGE_CACHE
+        max_size : int, optional
+            maximum total size of the cached images in bytes, by default
+            DEFAULT_IMAGE_CACHE_SIZE
+        """
+        self.directory = directory or DEFAULT_IMAGE_CACHE
+        self.max_size = DEFAULT_IMAGE_CACHE_SIZE if max_size is None else max_size
+        # (content, sha256) by (path, size, modification time) of the images of this process
+        self._memory = {}
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, f"{IMAGE_CACHE_INDEX}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.eep")
+
+    def _read_index(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, IMAGE_CACHE_INDEX)) as fh:
+                index = json.load(fh)
+        except (OSError, ValueError):
+            index = {}
+
+        index.setdefault("sources", {})
+        index.setdefault("objects", {})
+
+        return index
+
+    def _write_file(self, name: str, content: bytes) -> None:
+        (fd, tmp_path) = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(content)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_index(self, index: dict) -> None:
+        self._write_file(IMAGE_CACHE_INDEX, json.dumps(index, indent=2, sort_keys=True).encode())
+
+    def _evict(self, index: dict, max_size: int, keep: Optional[str] = None) -> list:
+        """Remove least recently used images until the total size is below max_size.
+
+        Returns
+        -------
+        list
+            content hashes of the removed images
+        """
+        objects = index["objects"]
+        total = sum(entry["size"] for entry in objects.values())
+        removed = []
+
+        for digest in sorted(objects, key=lambda digest: objects[digest]["last_used"]):
+            if total <= max_size:
+                break
+            if digest == keep:
+                continue
+
+            total -= objects.pop(digest)["size"]
+            removed.append(digest)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self._object_path(digest))
+
+        index["sources"] = {
+            source: entry
+            for source, entry in index["sources"].items()
+            if entry["sha256"] in objects
+        }
+
+        return removed
+
+    def _load_cached(self, source: str, stat: os.stat_result) -> tuple:
+        with self._locked():
+            index = self._read_index()
+
+            entry = index["sources"].get(source)
+            content = None
+            if (
+                entry is not None
+                and entry["size"] == stat.st_size
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["sha256"] in index["objects"]
+            ):
+                digest = entry["sha256"]
+                with contextlib.suppress(FileNotFoundError):
+                    with open(self._object_path(digest), "rb") as fh:
+                        content = fh.read()
+                # the content address is trusted, only the size is checked (see verify)
+                if content is not None and len(content) != index["objects"][digest]["size"]:
+                    content = None
+
+            if content is None:
+                with open(source, "rb") as fh:
+                    content = fh.read()
+                digest = hashlib.sha256(content).hexdigest()
+
+                self._write_file(f"{digest}.eep", content)
+                index["sources"][source] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha256": digest,
+                }
+                index["objects"][digest] = {"size": len(content)}
+
+            index["objects"][digest]["last_used"] = time.time()
+            self._evict(index, self.max_size, keep=digest)
+            self._write_index(index)
+
+        return content, digest
+
+    def load(self, path: str) -> tuple:
+        """Return content and sha256 of an image file.
+
+        If the cache directory cannot be used, the image is read from its source.
+
+        Parameters
+        ----------
+        path : str
+            path to the image
+
+        Returns
+        -------
+        tuple
+            content (bytes), sha256 (hex digest)
+
+        Raises
+        ------
+        OSError
+            the image cannot be read
+        """
+        source = os.path.realpath(path)
+        stat = os.stat(source)
+
+        key = (source, stat.st_size, stat.st_mtime_ns)
+        if key not in self._memory:
+            try:
+                self._memory[key] = self._load_cached(source, stat)
+            except OSError:
+                with open(source, "rb") as fh:
+                    content = fh.read()
+                self._memory[key] = (content, hashlib.sha256(content).hexdigest())
+
+        return self._memory[key]
+
+    def read(self, path: str) -> bytes:
+        """Return the content of an image file (see load).
+
+        Parameters
+        ----------
+        path : str
+            path to the image
+
+        Returns
+        -------
+        bytes
+            content of the image
+        """
+        return self.load(path)[0]
+
+    def entries(self) -> list:
+        """Return the cached images, most recently used first.
+
+        Returns
+        -------
+        list
+            dicts with sha256, size, last_used (unix time) and sources (paths)
+        """
+        with self._locked():
+            index = self._read_index()
+
+        entries = [
+            {
+                "sha256": digest,
+                "size": entry["size"],
+                "last_used": entry["last_used"],
+                "sources": sorted(
+                    source
+                    for source, source_entry in index["sources"].items()
+                    if source_entry["sha256"] == digest
+                ),
+            }
+            for digest, entry in index["objects"].items()
+        ]
+
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def prune(self, max_size: Optional[int] = None) -> list:
+        """Evict least recently used images and remove files which are not in the index.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            maximum total size in bytes after pruning, by default the size of the cache
+
+        Returns
+        -------
+        list
+            content hashes of the removed images
+        """
+        with self._locked():
+            index = self._read_index()
+            removed = self._evict(index, self.max_size if max_size is None else max_size)
+            self._write_index(index)
+
+            for name in os.listdir(self.directory):
+                if name.endswith(".eep") and name[: -len(".eep")] not in index["objects"]:
+                    os.unlink(os.path.join(self.directory, name))
+
+        return removed
+
+    def verify(self) -> list:
+        """Hash all cached images again and remove the damaged ones.
+
+        Returns
+        -------
+        list
+            content hashes of the removed images
+        """
+        with self._locked():
+            index = self._read_index()
+            damaged = []
+
+            for digest in list(index["objects"]):
+                try:
+                    with open(self._object_path(digest), "rb") as fh:
+                        content = fh.read()
+                except FileNotFoundError:
+                    content = None
+
+                if content is None or hashlib.sha256(content).hexdigest() != digest:
+                    del index["objects"][digest]
+                    damaged.append(digest)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(self._object_path(digest))
+
+            self._evict(index, self.max_size)
+            self._write_index(index)
+
+        return damaged
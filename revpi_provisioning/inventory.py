@@ -0,0 +1,229 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Snapshot of the hardware of the device as seen in sysfs and /dev.
+
+The HAT eeprom and the network interfaces of a RevPi share one HardwareInventory.
+Each kind of hardware (eeprom nodes, net devices of a bus, gpio chips) is scanned
+once on first use. The snapshot has to be invalidated explicitly if the hardware
+changes, e.g. after loading an overlay or rebinding a driver.
+"""
+
+import glob
+import os
+import threading
+import time
+from typing import Optional
+
+import revpi_provisioning.network.utils as network_utils
+from revpi_provisioning.network.utils import (
+    ENUMERATION_POLL_INTERVAL_MAX,
+    ENUMERATION_POLL_INTERVAL_MIN,
+    NetworkInterfaceNotFoundException,
+    UeventMonitor,
+)
+
+DEV_ROOT = "/dev"
+
+# Kinds of hardware which can be invalidated separately
+EEPROMS = "eeproms"
+NET_DEVICES = "net_devices"
+GPIO_CHIPS = "gpio_chips"
+
+
+class EEPROMNode:
+    """EEPROM node of the at24 driver in sysfs."""
+
+    def __init__(self, path: str, size: int, page_size: Optional[int]) -> None:
+        self.path = path
+        self.size = size
+        # page size of the device tree node, None if not specified
+        self.page_size = page_size
+
+
+class HardwareInventory:
+    """Hardware of the device which is scanned once and reused."""
+
+    def __init__(self) -> None:
+        # eeprom nodes by path patterns
+        self._eeproms = {}
+        # interface names by (bus, device path) per bus
+        self._net_devices = {}
+        self._gpio_chips = None
+        # network interfaces of different buses are looked up concurrently
+        self._lock = threading.Lock()
+
+    def invalidate(self, kind: Optional[str] = None) -> None:
+        """Discard the snapshot, so it is scanned again on next use.
+
+        Parameters
+        ----------
+        kind : str, optional
+            kind of hardware (EEPROMS, NET_DEVICES or GPIO_CHIPS), all if None
+        """
+        with self._lock:
+            if kind in (None, EEPROMS):
+                self._eeproms = {}
+            if kind in (None, NET_DEVICES):
+                self._net_devices = {}
+            if kind in (None, GPIO_CHIPS):
+                self._gpio_chips = None
+
+    @staticmethod
+    def _read_page_size(eeprom_path: str) -> Optional[int]:
+        pagesize_path = os.path.join(os.path.dirname(eeprom_path), "of_node", "pagesize")
+
+        try:
+            with open(pagesize_path, "rb") as fh:
+                # device tree properties are stored as big endian cells
+                return int.from_bytes(fh.read(4), "big")
+        except OSError:
+            return None
+
+    def eeproms(self, patterns: list) -> list:
+        """Return the eeprom nodes which match the first matching path pattern.
+
+        Parameters
+        ----------
+        patterns : list
+            glob patterns of eeprom nodes, the first pattern with matches is used
+
+        Returns
+        -------
+        list
+            EEPROMNode instances, empty if no pattern matches
+        """
+        key = tuple(patterns)
+
+        with self._lock:
+            if key not in self._eeproms:
+                nodes = []
+                for pattern in patterns:
+                    paths = sorted(glob.glob(pattern))
+                    if paths:
+                        nodes = [
+                            EEPROMNode(path, os.path.getsize(path), self._read_page_size(path))
+                            for path in paths
+                        ]
+                        break
+
+                self._eeproms[key] = nodes
+
+            return self._eeproms[key]
+
+    def net_devices(self, bus: str) -> dict:
+        """Return the network interface names of a bus by device path.
+
+        Parameters
+        ----------
+        bus : str
+            bus in sysfs (e.g. usb or pci)
+
+        Returns
+        -------
+        dict
+            sorted interface names by device path
+        """
+        with self._lock:
+            if bus not in self._net_devices:
+                devices_dir = f"{network_utils.SYSFS_BUS}/{bus}/devices/"
+                devices = {}
+
+                for path in sorted(glob.glob(f"{devices_dir}*/net/*")):
+                    (device_path, _, name) = path[len(devices_dir) :].rpartition("/net/")
+                    devices.setdefault(device_path, []).append(name)
+
+                self._net_devices[bus] = devices
+
+            return self._net_devices[bus]
+
+    def ethernet_device_name(self, bus: str, device_path: str) -> str:
+        """Find network interface name (eg. eth0 ...) by bus and device path.
+
+        Parameters
+        ----------
+        bus : str
+            bus in sysfs
+        device_path : str
+            device path in sysfs
+
+        Returns
+        -------
+        str
+            interface name
+
+        Raises
+        ------
+        NetworkInterfaceNotFoundException
+            indicates that the network interface cannot be found
+        """
+        names = self.net_devices(bus).get(device_path)
+
+        if not names:
+            raise NetworkInterfaceNotFoundException(device_path)
+
+        return names[0]
+
+    def wait_for_ethernet_device(self, bus: str, device_path: str, timeout: float) -> tuple:
+        """Wait until a network interface is enumerated and return its name.
+
+        The net devices are scanned again whenever the kernel reports an added network
+        interface, or with an increasing poll interval if uevents are not available.
+
+        Parameters
+        ----------
+        bus : str
+            bus in sysfs
+        device_path : str
+            device path in sysfs
+        timeout : float
+            maximum time to wait in seconds
+
+        Returns
+        -------
+        tuple
+            interface name, time in seconds it took the interface to appear
+
+        Raises
+        ------
+        NetworkInterfaceNotFoundException
+            the network interface did not appear within the timeout
+        """
+        start = time.monotonic()
+
+        try:
+            return self.ethernet_device_name(bus, device_path), 0.0
+        except NetworkInterfaceNotFoundException:
+            if timeout <= 0:
+                raise
+
+        interval = ENUMERATION_POLL_INTERVAL_MIN
+        with UeventMonitor() as monitor:
+            while True:
+                # scan again, the interface might have appeared before the monitor was opened
+                self.invalidate(NET_DEVICES)
+                try:
+                    return self.ethernet_device_name(bus, device_path), time.monotonic() - start
+                except NetworkInterfaceNotFoundException:
+                    pass
+
+                elapsed = time.monotonic() - start
+                if elapsed >= timeout:
+                    raise NetworkInterfaceNotFoundException(
+                        f"{device_path} (not enumerated within {timeout:.1f} s)"
+                    )
+
+                monitor.wait(min(interval, timeout - elapsed))
+                interval = min(interval * 2, ENUMERATION_POLL_INTERVAL_MAX)
+
+    @property
+    def gpio_chips(self) -> list:
+        """Names of the gpio chips (eg. gpiochip0)."""
+        with self._lock:
+            if self._gpio_chips is None:
+                self._gpio_chips = sorted(
+                    os.path.basename(path) for path in glob.glob(f"{DEV_ROOT}/gpiochip*")
+                )
+
+            return self._gpio_chips
@@ -0,0 +1,783 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Provisioning jobs shared by the CLI commands and the provisioning daemon."""
+
+import glob
+import os
+import pathlib
+from typing import Callable, Optional
+
+from revpi_provisioning.config import EOLConfigException, load_config
+from revpi_provisioning.eep import EEPImageException
+from revpi_provisioning.hat import HatEEPROMWriteException
+from revpi_provisioning.imagecache import ImageCache
+from revpi_provisioning.ledger import MacLedger, MacLedgerException
+from revpi_provisioning.network import (
+    DEFAULT_EEPROM_BACKEND,
+    InvalidNetworkInterfaceTypeString,
+    NetworkEEPROMAggregateException,
+    NetworkEEPROMException,
+)
+from revpi_provisioning.network.utils import (
+    DEFAULT_ENUMERATION_TIMEOUT,
+    NetworkInterfaceNotFoundException,
+)
+from revpi_provisioning.revpi import RevPi
+from revpi_provisioning.scheduler import ProvisioningException
+from revpi_provisioning.template import TemplateCache
+from revpi_provisioning.timing import phase
+from revpi_provisioning.utils import InvalidMacAddressFormat, MacRange, extract_product
+
+
+class JobException(Exception):
+    """Exception which is raised if a job fails.
+
+    The return code follows the exit codes of the CLI commands.
+    """
+
+    def __init__(self, message: str, rc: int) -> None:
+        """Create JobException instance.
+
+        Parameters
+        ----------
+        message : str
+            error message
+        rc : int
+            return code of the failed job
+        """
+        self.rc = rc
+
+        super().__init__(message)
+
+
+def no_progress(*args: str, **kwargs: dict) -> None:
+    """Discard progress messages."""
+    pass
+
+
+class Session:
+    """Device configurations and RevPi instances which are reused between jobs.
+
+    Reusing the RevPi instance keeps the write protection gpio requested and remembers
+    the overlay state of the HAT eeprom. HAT eeprom images and compiled templates are
+    read through a local cache (see ImageCache).
+    """
+
+    def __init__(self) -> None:
+        self._configurations = {}
+        # preloaded configurations by the name of their file
+        self._preloaded = {}
+        self._revpis = {}
+        self.images = ImageCache()
+        self.templates = TemplateCache(self.images)
+
+    def configuration(self, product: str) -> dict:
+        """Return device configuration of product.
+
+        Parameters
+        ----------
+        product : str
+            product number in format PRxxxxxxRxx
+
+        Returns
+        -------
+        dict
+            device configuration
+        """
+        if product not in self._configurations:
+            # a preloaded file without revision is used for all revisions (see load_config)
+            preloaded = self._preloaded.get(product, self._preloaded.get(product[:-3]))
+            if preloaded is not None:
+                self._configurations[product] = preloaded
+            else:
+                with phase("config_load"):
+                    self._configurations[product] = load_config(product)
+
+        return self._configurations[product]
+
+    def revpi(self, product: str) -> RevPi:
+        """Return RevPi instance of product.
+
+        The hardware inventory of a reused instance is scanned again.
+
+        Parameters
+        ----------
+        product : str
+            product number in format PRxxxxxxRxx
+
+        Returns
+        -------
+        RevPi
+            RevPi instance
+        """
+        if product not in self._revpis:
+            configuration = self.configuration(product)
+            with phase("device_init"):
+                self._revpis[product] = RevPi.from_config(*extract_product(product), configuration)
+        else:
+            # hardware may have changed since the last job
+            self._revpis[product].inventory.invalidate()
+
+        return self._revpis[product]
+
+    def preload(self) -> int:
+        """Load and validate all device configurations shipped with the package.
+
+        The configurations are resolved like by load_config, so a file without revision
+        in its name (PRxxxxxx.yaml) is used for all revisions of the product.
+
+        Returns
+        -------
+        int
+            number of loaded device configurations
+        """
+        basepath = pathlib.Path(__file__).parent.resolve()
+
+        for config_file in glob.glob(f"{basepath}/devices/*.yaml"):
+            name = os.path.basename(config_file)[: -len(".yaml")]
+            self._preloaded[name] = load_config(name)
+
+        return len(self._preloaded)
+
+
+def _print_settle_time(revpi: RevPi, product: str, progress: Callable) -> None:
+    if revpi.hat_eeprom.settle_time is not None:
+        progress(
+            f"HAT EEPROM of '{product}' was ready "
+            + f"{revpi.hat_eeprom.settle_time * 1000:.0f} ms after loading the overlay"
+        )
+
+
+def _prepare_network_interfaces(
+    revpi: RevPi, enumeration_timeout: Optional[float], eeprom_backend: Optional[str]
+) -> None:
+    for interface in revpi.network_interfaces:
+        interface.enumeration_timeout = (
+            DEFAULT_ENUMERATION_TIMEOUT if enumeration_timeout is None else enumeration_timeout
+        )
+        interface.enumeration_time = None
+        interface.eeprom_backend = eeprom_backend or DEFAULT_EEPROM_BACKEND
+
+
+def _prepare_hat_eeprom(revpi: RevPi, checkpoint: Optional[str]) -> None:
+    if revpi.hat_eeprom:
+        revpi.hat_eeprom.checkpoint = checkpoint
+
+
+def _write_progress(progress: Callable) -> Callable:
+    """Return callback which renders the progress of a HAT eeprom write in 25 % steps."""
+    reported = -1
+
+    def report(offset: int, length: int) -> None:
+        nonlocal reported
+
+        if reported < 0 and offset:
+            progress(f"resuming at byte {offset} ... ", end="")
+
+        step = offset * 4 // length if length else 4
+        if step > reported:
+            if step > 0:
+                progress(f"{step * 25}% ", end="")
+            reported = step
+
+    return report
+
+
+def _print_enumeration_times(revpi: RevPi, progress: Callable) -> None:
+    for interface in revpi.network_interfaces:
+        if interface.enumeration_time is not None:
+            progress(
+                f"Network interface '{interface.path}' was enumerated after "
+                + f"{interface.enumeration_time * 1000:.0f} ms"
+            )
+
+
+def _check_mac_addresses(
+    ledger: Optional[MacLedger], revpi: RevPi, mac: str, progress: Callable
+) -> Optional[MacRange]:
+    """Check that the mac addresses of a device have not been assigned before.
+
+    Returns
+    -------
+    MacRange, optional
+        mac addresses of the device, None if the ledger is disabled
+    """
+    if ledger is None:
+        return None
+
+    progress("Checking mac addresses in ledger ... ", end="")
+    try:
+        mac_range = MacRange(mac, len(revpi.network_interfaces))
+    except InvalidMacAddressFormat as fe:
+        raise JobException(f"Could not write mac address: Invalid mac address {fe}", 4) from fe
+
+    try:
+        ledger.check(mac_range)
+    except MacLedgerException as le:
+        raise JobException(f"Mac address ledger check failed: {le}", 5) from le
+    progress("OK")
+
+    return mac_range
+
+
+def _mark_mac_addresses(
+    ledger: Optional[MacLedger], mac_range: Optional[MacRange], progress: Callable
+) -> None:
+    """Add the written mac addresses of a device to the ledger."""
+    if ledger is None:
+        return
+
+    try:
+        ledger.mark(mac_range)
+    except MacLedgerException as le:
+        raise JobException(f"Could not update mac address ledger: {le}", 5) from le
+    progress(f"Added {len(mac_range)} mac addresses to ledger")
+
+
+def _mark_written_mac_addresses(
+    ledger: Optional[MacLedger], revpi: RevPi, progress: Callable
+) -> Optional[tuple]:
+    """Add the mac addresses which have been written before writing failed to the ledger.
+
+    Returns
+    -------
+    tuple, optional
+        exit code and error message if the ledger cannot be updated, None otherwise
+    """
+    if ledger is None:
+        return None
+
+    written = [
+        interface.written_mac_address
+        for interface in revpi.network_interfaces
+        if interface.written_mac_address is not None
+    ]
+
+    try:
+        for mac_address in written:
+            ledger.mark(MacRange(mac_address, 1))
+    except MacLedgerException as le:
+        return 5, f"Could not update mac address ledger: {le}"
+
+    if written:
+        progress(f"Added {len(written)} written mac addresses to ledger")
+
+    return None
+
+
+def _read_image(session: Session, image_path: str) -> tuple:
+    """Read a HAT eeprom image through the image cache of the session.
+
+    Returns
+    -------
+    tuple
+        content (bytes), sha256 (hex digest)
+    """
+    try:
+        return session.images.load(image_path)
+    except OSError as exc:
+        raise JobException(f"Could not read HAT EEPROM image: {exc}", 3) from exc
+
+
+def _build_image(
+    session: Session, template: str, serial: Optional[str], mac: str, custom_data: list
+) -> bytearray:
+    """Build the HAT eeprom image of a device from a template."""
+    try:
+        with phase("image_build"):
+            return session.templates.load(template).build(serial, mac, custom_data)
+    except (OSError, EEPImageException, InvalidMacAddressFormat, UnicodeEncodeError) as exc:
+        raise JobException(f"Could not build HAT EEPROM image: {exc}", 3) from exc
+
+
+def provision(
+    session: Session,
+    product: str,
+    mac: str,
+    image_path: Optional[str],
+    progress: Callable = no_progress,
+    parallel: bool = False,
+    enumeration_timeout: Optional[float] = None,
+    eeprom_backend: Optional[str] = None,
+    mac_ledger: Optional[str] = None,
+    checkpoint: Optional[str] = None,
+    template: Optional[str] = None,
+    serial: Optional[str] = None,
+    custom_data: Optional[list] = None,
+) -> list:
+    """Write HAT eeprom and mac addresses of a device.
+
+    Parameters
+    ----------
+    session : Session
+        session which holds configurations and devices
+    product : str
+        product number in format PRxxxxxxRxx
+    mac : str
+        first mac address of the device
+    image_path : str, optional
+        path to the HAT eeprom image, None if the image is built from a template
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+    parallel : bool, optional
+        write mac addresses of interfaces on different buses concurrently, by default False
+    enumeration_timeout : float, optional
+        maximum time in seconds to wait for network interfaces to be enumerated,
+        by default DEFAULT_ENUMERATION_TIMEOUT
+    eeprom_backend : str, optional
+        how mac addresses are written (see EEPROM_BACKENDS), by default DEFAULT_EEPROM_BACKEND
+    mac_ledger : str, optional
+        directory of the mac address ledger (see MacLedger), which is checked before
+        anything is written and updated afterwards, disabled by default
+    checkpoint : str, optional
+        checkpoint file of interrupted HAT eeprom writes (see HatEEPROM._write_image),
+        by default None (disabled)
+    template : str, optional
+        path to a HAT eeprom image template (see revpi_provisioning.template), which is
+        used instead of image_path
+    serial : str, optional
+        serial number which is added to the image built from the template
+    custom_data : list, optional
+        custom data which is added to the image built from the template
+
+    Returns
+    -------
+    list
+        assigned mac addresses
+
+    Raises
+    ------
+    JobException
+        provisioning failed
+    """
+    progress(f"Starting device provisioning for product '{product}'")
+    ledger = MacLedger(mac_ledger) if mac_ledger else None
+
+    try:
+        progress("Loading device configuration ... ", end="")
+        configuration = session.configuration(product)
+        progress("OK")
+
+        revpi = session.revpi(product)
+        _prepare_network_interfaces(revpi, enumeration_timeout, eeprom_backend)
+        _prepare_hat_eeprom(revpi, checkpoint)
+
+        (eeprom_image, digest) = (image_path, None)
+        if revpi.hat_eeprom and template is not None:
+            progress(
+                "Found HAT EEPROM definition in config file. Will build image from template "
+                + f"'{template}'"
+            )
+            eeprom_image = _build_image(session, template, serial, mac, custom_data or [])
+        elif revpi.hat_eeprom:
+            progress(f"Found HAT EEPROM definition in config file. Will write image '{image_path}'")
+            (eeprom_image, digest) = _read_image(session, image_path)
+
+        progress(f"Registering network interfaces. Base mac address will be '{mac}'")
+
+        for index, interface_config in enumerate(configuration.get("network_interfaces", [])):
+            line = f"  Ethernet {index}: type={interface_config['type']} "
+            if interface_config["path"]:
+                line += f"path={interface_config['path']} "
+            line += "... OK"
+
+            progress(line)
+
+        mac_range = _check_mac_addresses(ledger, revpi, mac, progress)
+
+        if revpi.hat_eeprom:
+            progress("Writing HAT EEPROM and mac addresses ... ", end="")
+        else:
+            progress("Writing mac addresses ... ", end="")
+        results = revpi.provision(
+            eeprom_image,
+            mac,
+            parallel=parallel,
+            write_progress=_write_progress(progress),
+            image_digest=digest,
+        )
+        progress("OK")
+
+        if revpi.hat_eeprom:
+            progress(f"HAT EEPROM: {results['hat_eeprom']} unchanged pages skipped")
+            _print_settle_time(revpi, product, progress)
+
+        mac_addresses = results["mac_addresses"]
+        _print_enumeration_times(revpi, progress)
+        progress(f"Successfully wrote {len(mac_addresses)} mac addresses")
+        _mark_mac_addresses(ledger, mac_range, progress)
+    except EOLConfigException as ce:
+        raise JobException(f"Could not load configuration: {ce}", 1) from ce
+    except InvalidNetworkInterfaceTypeString as ne:
+        raise JobException(f"Could not write mac address: {ne}", 4) from ne
+    except ProvisioningException as pe:
+        # report the errors of all steps, the exit code is the one of the first step
+        failures = [_describe_step_error(step, exc) for (step, exc) in pe.errors.items()]
+
+        # the mac addresses which have been written are assigned, even if a step failed
+        if "mac_addresses" not in pe.errors:
+            try:
+                _mark_mac_addresses(ledger, mac_range, progress)
+            except JobException as je:
+                failures.append((je.rc, str(je)))
+        else:
+            ledger_failure = _mark_written_mac_addresses(ledger, revpi, progress)
+            if ledger_failure is not None:
+                failures.append(ledger_failure)
+
+        raise JobException("\n".join(message for (_, message) in failures), failures[0][0]) from pe
+
+    return mac_addresses
+
+
+def _describe_step_error(step: str, exc: Exception) -> tuple:
+    """Map the exception of a provisioning step to exit code and error message.
+
+    Exceptions which are not known provisioning errors get the exit code of the step.
+
+    Parameters
+    ----------
+    step : str
+        name of the step ("hat_eeprom" or "mac_addresses")
+    exc : Exception
+        exception raised by the step
+
+    Returns
+    -------
+    tuple
+        exit code, error message
+    """
+    if isinstance(exc, NetworkEEPROMAggregateException):
+        # only report a missing interface if no interface failed otherwise
+        if all(isinstance(error, NetworkInterfaceNotFoundException) for (_, error) in exc.errors):
+            return 2, f"Could not find network interface: {exc}"
+        return 4, f"Could not write mac address: {exc}"
+    elif isinstance(exc, NetworkInterfaceNotFoundException):
+        return 2, f"Could not find network interface: {exc}"
+    elif isinstance(exc, HatEEPROMWriteException):
+        return 3, f"Could not write image to HAT EEPROM: {exc}"
+    elif isinstance(exc, NetworkEEPROMException):
+        return 4, f"Could not write mac address: {exc}"
+
+    if step == "hat_eeprom":
+        return 3, f"Could not write image to HAT EEPROM: {exc}"
+    return 4, f"Could not write mac address: {exc}"
+
+
+def clear_hat(session: Session, product: str, progress: Callable = no_progress) -> None:
+    """Clear HAT eeprom of a device.
+
+    Parameters
+    ----------
+    session : Session
+        session which holds configurations and devices
+    product : str
+        product number in format PRxxxxxxRxx
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+
+    Raises
+    ------
+    JobException
+        clearing the HAT eeprom failed
+    """
+    try:
+        progress("Loading device configuration ... ", end="")
+        session.configuration(product)
+        progress("OK")
+
+        revpi = session.revpi(product)
+
+        if revpi.hat_eeprom:
+            progress("Clear HAT EEPROM ... ", end="")
+            skipped_pages = revpi.clear_hat_eeprom()
+            progress(f"OK ({skipped_pages} unchanged pages skipped)")
+            _print_settle_time(revpi, product, progress)
+    except EOLConfigException as ce:
+        raise JobException(f"Could not load configuration: {ce}", 1) from ce
+    except HatEEPROMWriteException as he:
+        raise JobException(f"Could not clear HAT EEPROM: {he}", 3) from he
+
+
+def dump_hat(
+    session: Session, product: str, output_file: str, progress: Callable = no_progress
+) -> None:
+    """Dump HAT eeprom contents of a device to a file.
+
+    Parameters
+    ----------
+    session : Session
+        session which holds configurations and devices
+    product : str
+        product number in format PRxxxxxxRxx
+    output_file : str
+        file where the HAT eeprom contents are written to
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+
+    Raises
+    ------
+    JobException
+        dumping the HAT eeprom failed
+    """
+    try:
+        progress("Loading device configuration ... ", end="")
+        session.configuration(product)
+        progress("OK")
+
+        revpi = session.revpi(product)
+
+        if revpi.hat_eeprom:
+            progress("Dump HAT EEPROM ... ", end="")
+            revpi.dump_hat_eeprom(output_file)
+            progress("OK")
+            _print_settle_time(revpi, product, progress)
+    except EOLConfigException as ce:
+        raise JobException(f"Could not load configuration: {ce}", 1) from ce
+    except HatEEPROMWriteException as he:
+        raise JobException(f"Could not dump HAT EEPROM: {he}", 3) from he
+
+
+def validate_config(device_config_file: str, progress: Callable = no_progress) -> None:
+    """Validate a device configuration file.
+
+    Parameters
+    ----------
+    device_config_file : str
+        path to the device configuration file
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+
+    Raises
+    ------
+    JobException
+        the device configuration file is invalid
+    """
+    try:
+        with phase("config_load"):
+            load_config(device_config_file, absolute_path=True)
+    except EOLConfigException as ce:
+        raise JobException(f"Failed to validate device configuration file: {ce}", 1) from ce
+
+    progress(f"Device configuration file '{device_config_file}' has been validated successfully")
+
+
+def validate_configs(
+    patterns: list,
+    workers: Optional[int] = None,
+    cache_file: Optional[str] = None,
+    progress: Callable = no_progress,
+) -> list:
+    """Validate many device configuration files in parallel (see validate_files).
+
+    Parameters
+    ----------
+    patterns : list
+        device configuration files, directories or glob patterns
+    workers : int, optional
+        number of worker processes, by default one per cpu
+    cache_file : str, optional
+        file with the cached results, no cache if None
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+
+    Returns
+    -------
+    list
+        ValidationResult of each file
+
+    Raises
+    ------
+    JobException
+        at least one device configuration file is invalid, the errors of all files are
+        reported
+    """
+    from revpi_provisioning.validation import validate_files
+
+    with phase("config_validate"):
+        results = validate_files(patterns, workers, cache_file)
+
+    invalid = [result for result in results if not result.valid]
+    cached = sum(result.cached for result in results)
+    summary = (
+        f"Validated {len(results)} device configuration files: "
+        + f"{len(results) - len(invalid)} valid, {len(invalid)} invalid ({cached} cached)"
+    )
+
+    if invalid:
+        raise JobException(
+            "\n".join(f"{result.path}: {result.error}" for result in invalid) + "\n" + summary,
+            1,
+        )
+
+    progress(summary)
+
+    return results
+
+
+# Operations of a pipeline and whether they take an argument
+PIPELINE_OPERATIONS = {
+    "clear": False,
+    "write": True,
+    "verify": True,
+    "dump": True,
+    "mac": True,
+}
+
+# Error messages of the HAT eeprom operations
+_HAT_OPERATION_ERRORS = {
+    "clear": "Could not clear HAT EEPROM",
+    "write": "Could not write image to HAT EEPROM",
+    "verify": "Could not verify HAT EEPROM",
+    "dump": "Could not dump HAT EEPROM",
+}
+
+
+def _run_operation(
+    session: Session,
+    revpi: RevPi,
+    product: str,
+    operation: str,
+    argument: str,
+    progress: Callable,
+    parallel: bool,
+) -> None:
+    """Run a single pipeline operation (see run_pipeline)."""
+    try:
+        if operation == "mac":
+            progress("Writing mac addresses ... ", end="")
+            mac_addresses = revpi.write_mac_addresses(argument, parallel=parallel)
+            progress("OK")
+            _print_enumeration_times(revpi, progress)
+            progress(f"Successfully wrote {len(mac_addresses)} mac addresses")
+            return
+
+        if not revpi.hat_eeprom:
+            return
+
+        if operation == "clear":
+            progress("Clear HAT EEPROM ... ", end="")
+            skipped_pages = revpi.clear_hat_eeprom()
+            progress(f"OK ({skipped_pages} unchanged pages skipped)")
+        elif operation == "write":
+            progress(f"Writing HAT EEPROM with image '{argument}' ... ", end="")
+            (image, digest) = _read_image(session, argument)
+            skipped_pages = revpi.write_hat_eeprom(image, _write_progress(progress), digest=digest)
+            progress(f"OK ({skipped_pages} unchanged pages skipped)")
+        elif operation == "verify":
+            progress(f"Verifying HAT EEPROM against image '{argument}' ... ", end="")
+            revpi.verify_hat_eeprom(_read_image(session, argument)[0])
+            progress("OK")
+        elif operation == "dump":
+            progress(f"Dump HAT EEPROM to '{argument}' ... ", end="")
+            revpi.dump_hat_eeprom(argument)
+            progress("OK")
+
+        _print_settle_time(revpi, product, progress)
+    except HatEEPROMWriteException as he:
+        raise JobException(f"{_HAT_OPERATION_ERRORS[operation]}: {he}", 3) from he
+    except (NetworkInterfaceNotFoundException, NetworkEEPROMException) as ne:
+        (rc, message) = _describe_step_error("mac_addresses", ne)
+        raise JobException(message, rc) from ne
+
+
+def run_pipeline(
+    session: Session,
+    product: str,
+    operations: list,
+    progress: Callable = no_progress,
+    parallel: bool = False,
+    enumeration_timeout: Optional[float] = None,
+    eeprom_backend: Optional[str] = None,
+    mac_ledger: Optional[str] = None,
+    checkpoint: Optional[str] = None,
+) -> None:
+    """Run several operations one after another on the same device.
+
+    All operations share the device configuration, the HAT eeprom (write protection
+    gpio, overlay state) and the network interfaces. The pipeline stops at the first
+    failed operation.
+
+    Parameters
+    ----------
+    session : Session
+        session which holds configurations and devices
+    product : str
+        product number in format PRxxxxxxRxx
+    operations : list
+        (operation, argument) tuples, see PIPELINE_OPERATIONS
+    progress : Callable, optional
+        callback with the signature of print for progress messages
+    parallel : bool, optional
+        write mac addresses of interfaces on different buses concurrently, by default False
+    enumeration_timeout : float, optional
+        maximum time in seconds to wait for network interfaces to be enumerated,
+        by default DEFAULT_ENUMERATION_TIMEOUT
+    eeprom_backend : str, optional
+        how mac addresses are written (see EEPROM_BACKENDS), by default DEFAULT_EEPROM_BACKEND
+    mac_ledger : str, optional
+        directory of the mac address ledger (see MacLedger), which is checked before
+        anything is written and updated afterwards, disabled by default
+    checkpoint : str, optional
+        checkpoint file of interrupted HAT eeprom writes (see HatEEPROM._write_image),
+        by default None (disabled)
+
+    Raises
+    ------
+    JobException
+        an operation failed
+    """
+    for operation, argument in operations:
+        if operation not in PIPELINE_OPERATIONS:
+            raise JobException(f"Unknown pipeline operation '{operation}'", 1)
+        if PIPELINE_OPERATIONS[operation] != (argument is not None):
+            raise JobException(f"Invalid argument for pipeline operation '{operation}'", 1)
+
+    try:
+        progress("Loading device configuration ... ", end="")
+        session.configuration(product)
+        progress("OK")
+
+        revpi = session.revpi(product)
+        _prepare_network_interfaces(revpi, enumeration_timeout, eeprom_backend)
+        _prepare_hat_eeprom(revpi, checkpoint)
+    except EOLConfigException as ce:
+        raise JobException(f"Could not load configuration: {ce}", 1) from ce
+    except InvalidNetworkInterfaceTypeString as ne:
+        raise JobException(f"Could not write mac address: {ne}", 4) from ne
+
+    # check the mac addresses of all mac operations before anything is written
+    ledger = MacLedger(mac_ledger) if mac_ledger else None
+    mac_ranges = {}
+    for index, (operation, argument) in enumerate(operations):
+        if operation != "mac":
+            continue
+
+        mac_range = _check_mac_addresses(ledger, revpi, argument, progress)
+        if mac_range is None:
+            continue
+
+        if any(mac_range.overlaps(other) for other in mac_ranges.values()):
+            raise JobException(
+                "Mac address ledger check failed: mac operations assign overlapping addresses", 5
+            )
+        mac_ranges[index] = mac_range
+
+    for index, (operation, argument) in enumerate(operations):
+        try:
+            _run_operation(session, revpi, product, operation, argument, progress, parallel)
+        except JobException as je:
+            # the mac addresses which have been written are assigned, even if the operation failed
+            ledger_failure = (
+                _mark_written_mac_addresses(ledger, revpi, progress)
+                if index in mac_ranges
+                else None
+            )
+            if ledger_failure is not None:
+                raise JobException(f"{je}\n{ledger_failure[1]}", je.rc) from je
+            raise
+
+        if index in mac_ranges:
+            _mark_mac_addresses(ledger, mac_ranges[index], progress)
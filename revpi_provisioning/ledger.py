@@ -0,0 +1,197 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Ledger of the assigned mac addresses to detect duplicates.
+
+The ledger is a directory with one bitmap file per OUI ("c83ea7.bitmap"). Each bit
+stands for one address of the 24 bit NIC space, so a bitmap has a fixed size of 2 MiB
+(created sparse). The bitmaps are memory mapped and locked with flock: shared while a
+block of addresses is checked, exclusive while it is marked. The directory can be shared
+by several stations on a file system which supports flock.
+"""
+
+import fcntl
+import mmap
+import os
+
+from revpi_provisioning.utils import MacAddress, MacRange
+
+# Number of bits of the NIC part of a mac address
+NIC_BITS = 24
+# Size of a bitmap file in bytes
+BITMAP_SIZE = (1 << NIC_BITS) // 8
+
+
+class MacLedgerException(Exception):
+    """Exception which is raised if the ledger cannot be accessed."""
+
+    pass
+
+
+class MacAddressConflictException(MacLedgerException):
+    """Exception which is raised if mac addresses have been assigned before."""
+
+    def __init__(self, addresses: list) -> None:
+        """Create MacAddressConflictException instance.
+
+        Parameters
+        ----------
+        addresses : list
+            MacAddress instances which are already in the ledger
+        """
+        self.addresses = addresses
+
+        super().__init__(
+            "Mac addresses have already been assigned: "
+            + ", ".join(address.format_colon for address in addresses)
+        )
+
+
+def _split_by_oui(mac_range: MacRange) -> list:
+    """Split a range of mac addresses into (oui, first nic, last nic + 1) tuples."""
+    segments = []
+    start = int(mac_range.first)
+    end = start + len(mac_range)
+
+    while start < end:
+        oui = start >> NIC_BITS
+        segment_end = min(end, (oui + 1) << NIC_BITS)
+        segments.append((oui, start - (oui << NIC_BITS), segment_end - (oui << NIC_BITS)))
+        start = segment_end
+
+    return segments
+
+
+def _used(bitmap: mmap.mmap, oui: int, first_nic: int, end_nic: int) -> list:
+    used = []
+
+    for nic in range(first_nic, end_nic):
+        byte = nic >> 3
+        # bytes behind the end of a truncated bitmap are unused
+        if byte < len(bitmap) and bitmap[byte] & (1 << (nic & 7)):
+            used.append(MacAddress((oui << NIC_BITS) | nic))
+
+    return used
+
+
+class MacLedger:
+    """Mac address bitmaps of all OUIs in a directory."""
+
+    def __init__(self, directory: str) -> None:
+        """Create MacLedger instance.
+
+        Parameters
+        ----------
+        directory : str
+            directory of the bitmap files, created on first mark
+        """
+        self.directory = directory
+
+    def _path(self, oui: int) -> str:
+        return os.path.join(self.directory, f"{oui:06x}.bitmap")
+
+    def used(self, mac_range: MacRange) -> list:
+        """Return the addresses of a range which are already in the ledger.
+
+        Parameters
+        ----------
+        mac_range : MacRange
+            addresses to look up
+
+        Returns
+        -------
+        list
+            MacAddress instances which are already in the ledger
+
+        Raises
+        ------
+        MacLedgerException
+            a bitmap cannot be read
+        """
+        used = []
+
+        for oui, first_nic, end_nic in _split_by_oui(mac_range):
+            try:
+                fd = os.open(self._path(oui), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                raise MacLedgerException(f"Could not open mac ledger: {e}") from e
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                if os.fstat(fd).st_size:
+                    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as bitmap:
+                        used.extend(_used(bitmap, oui, first_nic, end_nic))
+            except OSError as e:
+                raise MacLedgerException(f"Could not read mac ledger: {e}") from e
+            finally:
+                os.close(fd)
+
+        return used
+
+    def check(self, mac_range: MacRange) -> None:
+        """Check that no address of a range is in the ledger.
+
+        Parameters
+        ----------
+        mac_range : MacRange
+            addresses which are about to be assigned
+
+        Raises
+        ------
+        MacAddressConflictException
+            addresses of the range are already in the ledger
+        MacLedgerException
+            a bitmap cannot be read
+        """
+        used = self.used(mac_range)
+
+        if used:
+            raise MacAddressConflictException(used)
+
+    def mark(self, mac_range: MacRange) -> None:
+        """Add all addresses of a range to the ledger.
+
+        All addresses are marked, even if some of them have been marked by another
+        station in the meantime.
+
+        Parameters
+        ----------
+        mac_range : MacRange
+            addresses which have been assigned
+
+        Raises
+        ------
+        MacAddressConflictException
+            addresses of the range had already been in the ledger
+        MacLedgerException
+            a bitmap cannot be written
+        """
+        used = []
+
+        for oui, first_nic, end_nic in _split_by_oui(mac_range):
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                fd = os.open(self._path(oui), os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                raise MacLedgerException(f"Could not open mac ledger: {e}") from e
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size < BITMAP_SIZE:
+                    os.ftruncate(fd, BITMAP_SIZE)
+
+                with mmap.mmap(fd, BITMAP_SIZE) as bitmap:
+                    used.extend(_used(bitmap, oui, first_nic, end_nic))
+                    for nic in range(first_nic, end_nic):
+                        bitmap[nic >> 3] |= 1 << (nic & 7)
+                    bitmap.flush()
+            except OSError as e:
+                raise MacLedgerException(f"Could not write mac ledger: {e}") from e
+            finally:
+                os.close(fd)
+
+        if used:
+            raise MacAddressConflictException(used)
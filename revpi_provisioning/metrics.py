@@ -0,0 +1,319 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Export provisioning metrics for the textfile collector of node_exporter.
+
+After each job the metrics file is read, the timing report of the job (see
+revpi_provisioning.timing) is added to the histograms and counters, and the file is
+replaced atomically. The file itself holds the complete state, so no history of
+previous runs is needed.
+"""
+
+import fcntl
+import os
+import re
+import tempfile
+import time
+
+from revpi_provisioning.network import NETWORK_INTERFACE_TYPES
+
+# Upper bounds of the duration histogram buckets in seconds
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Phases which are exported as step durations (mac writes are exported per interface type)
+STEP_PHASES = ("config_load", "overlay_load", "hat_write", "hat_verify", "hat_clear", "hat_dump")
+
+# Metric families: name, type, help
+METRICS = (
+    (
+        "revpi_eol_run_duration_seconds",
+        "histogram",
+        "Duration of provisioning runs by command",
+    ),
+    (
+        "revpi_eol_step_duration_seconds",
+        "histogram",
+        "Duration of successful provisioning steps",
+    ),
+    (
+        "revpi_eol_mac_write_duration_seconds",
+        "histogram",
+        "Duration of successful mac address writes by network interface type",
+    ),
+    ("revpi_eol_runs_total", "counter", "Number of provisioning runs by command"),
+    (
+        "revpi_eol_failures_total",
+        "counter",
+        "Number of failed provisioning runs by command, product and exit code",
+    ),
+    (
+        "revpi_eol_last_run_timestamp_seconds",
+        "gauge",
+        "Unix time of the last provisioning run",
+    ),
+)
+
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+_SAMPLE_REGEX = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$")
+_LABEL_REGEX = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+# Interface types by name of their implementing class
+_INTERFACE_TYPES = {
+    class_name: interface_type
+    for interface_type, (_, class_name) in NETWORK_INTERFACE_TYPES.items()
+}
+
+
+class MetricsException(Exception):
+    """Exception which is raised if the metrics file can not be updated."""
+
+    pass
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metrics:
+    """Samples of the provisioning metrics."""
+
+    def __init__(self) -> None:
+        # sample values by (sample name, sorted label tuples)
+        self.samples = {}
+
+    def parse(self, content: str) -> None:
+        """Add the samples of the provisioning metrics from a metrics file.
+
+        Comments, unknown metrics and malformed lines are ignored.
+
+        Parameters
+        ----------
+        content : str
+            content of a metrics file in text exposition format
+        """
+        families = {name for (name, _, _) in METRICS}
+
+        for line in content.splitlines():
+            match = _SAMPLE_REGEX.match(line.strip())
+            if not match:
+                continue
+
+            (name, labels, value) = match.groups()
+            if self._family(name) not in families:
+                continue
+
+            try:
+                self.samples[(name, self._labels(labels or ""))] = float(value)
+            except ValueError:
+                continue
+
+    @staticmethod
+    def _family(sample_name: str) -> str:
+        for suffix in HISTOGRAM_SUFFIXES:
+            if sample_name.endswith(suffix):
+                return sample_name[: -len(suffix)]
+
+        return sample_name
+
+    @staticmethod
+    def _labels(labels: str) -> tuple:
+        return tuple(
+            sorted((name, _unescape(value)) for (name, value) in _LABEL_REGEX.findall(labels))
+        )
+
+    def inc(self, name: str, labels: dict, amount: float = 1) -> None:
+        """Increment counter sample.
+
+        Parameters
+        ----------
+        name : str
+            sample name
+        labels : dict
+            labels of the sample
+        amount : float, optional
+            amount to add, by default 1
+        """
+        key = (name, tuple(sorted(labels.items())))
+        self.samples[key] = self.samples.get(key, 0) + amount
+
+    def set(self, name: str, labels: dict, value: float) -> None:
+        """Set gauge sample.
+
+        Parameters
+        ----------
+        name : str
+            sample name
+        labels : dict
+            labels of the sample
+        value : float
+            new value
+        """
+        self.samples[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, labels: dict, value: float) -> None:
+        """Add an observation to a histogram.
+
+        Parameters
+        ----------
+        name : str
+            histogram name
+        labels : dict
+            labels of the histogram
+        value : float
+            observed value
+        """
+        for bound in DURATION_BUCKETS + (float("inf"),):
+            # buckets are cumulative, all of them are written even if they are not hit
+            self.inc(f"{name}_bucket", {**labels, "le": _format_value(bound)}, int(value <= bound))
+
+        self.inc(f"{name}_sum", labels, value)
+        self.inc(f"{name}_count", labels)
+
+    def add_report(self, command: str, report: dict) -> None:
+        """Add the timing report of a job.
+
+        Parameters
+        ----------
+        command : str
+            name of the command which ran the job
+        report : dict
+            timing report (see TimingRecorder.report)
+        """
+        self.observe("revpi_eol_run_duration_seconds", {"command": command}, report["duration"])
+        self.inc("revpi_eol_runs_total", {"command": command})
+        self.set("revpi_eol_last_run_timestamp_seconds", {}, time.time())
+
+        if report["rc"]:
+            self.inc(
+                "revpi_eol_failures_total",
+                {"command": command, "product": report["product"] or "", "rc": str(report["rc"])},
+            )
+
+        # a step may consist of several phases (e.g. hat_verify per block), they are summed up
+        steps = {}
+        for entry in report["phases"]:
+            if not entry["ok"]:
+                continue
+
+            if entry["name"] in STEP_PHASES:
+                steps[entry["name"]] = steps.get(entry["name"], 0.0) + entry["duration"]
+            elif entry["name"] == "mac_write":
+                interface_type = _INTERFACE_TYPES.get(
+                    entry.get("interface_type"), entry.get("interface_type") or "unknown"
+                )
+                self.observe(
+                    "revpi_eol_mac_write_duration_seconds",
+                    {"interface_type": interface_type},
+                    entry["duration"],
+                )
+
+        for step, duration in steps.items():
+            self.observe("revpi_eol_step_duration_seconds", {"step": step}, duration)
+
+    @staticmethod
+    def _sort_key(key: tuple) -> tuple:
+        (name, labels) = key
+        # order buckets by their numeric bound
+        return (
+            name,
+            tuple((label, value) for (label, value) in labels if label != "le"),
+            float(dict(labels).get("le", 0)),
+        )
+
+    def render(self) -> str:
+        """Render the samples in text exposition format.
+
+        Returns
+        -------
+        str
+            content of the metrics file
+        """
+        lines = []
+
+        for family, metric_type, description in METRICS:
+            keys = sorted(
+                (key for key in self.samples if self._family(key[0]) == family),
+                key=self._sort_key,
+            )
+            if not keys:
+                continue
+
+            lines.append(f"# HELP {family} {description}")
+            lines.append(f"# TYPE {family} {metric_type}")
+            for name, labels in keys:
+                # the bucket bound is written as last label by convention
+                ordered = sorted(labels, key=lambda item: item[0] == "le")
+                label_string = ",".join(f'{label}="{_escape(value)}"' for label, value in ordered)
+                if label_string:
+                    label_string = "{" + label_string + "}"
+
+                lines.append(f"{name}{label_string} {_format_value(self.samples[(name, labels)])}")
+
+        return "\n".join(lines) + "\n"
+
+
+def update_metrics_file(path: str, command: str, report: dict) -> None:
+    """Add the timing report of a job to a metrics file.
+
+    The file is locked during the update (via a ".lock" file next to it) and replaced
+    atomically, so the collector never reads a partially written file.
+
+    Parameters
+    ----------
+    path : str
+        metrics file, e.g. in the textfile collector directory of node_exporter
+    command : str
+        name of the command which ran the job
+    report : dict
+        timing report (see TimingRecorder.report)
+
+    Raises
+    ------
+    MetricsException
+        the metrics file could not be updated
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+
+    try:
+        with open(f"{path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            metrics = Metrics()
+            if os.path.exists(path):
+                with open(path, "r") as fh:
+                    metrics.parse(fh.read())
+
+            metrics.add_report(command, report)
+
+            (fd, tmp_path) = tempfile.mkstemp(
+                dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    fh.write(metrics.render())
+                    fh.flush()
+                    os.fsync(fh.fileno())
+
+                # the collector must be able to read the file
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    except OSError as e:
+        raise MetricsException(f"Could not update metrics file '{path}': {e}") from e
@@ -4,8 +4,13 @@
 
 """Network related stuff."""
 
+import errno
 import importlib
 
+import revpi_provisioning.inventory
+from revpi_provisioning.network.utils import DEFAULT_ENUMERATION_TIMEOUT
+from revpi_provisioning.timing import phase
+
 NETWORK_INTERFACE_TYPES = {
     "lan95xx": ("usb", "LAN95XXNetworkInterface"),
     "lan78xx": ("usb", "LAN78XXNetworkInterface"),
@@ -15,6 +20,10 @@ NETWORK_INTERFACE_TYPES = {
     "rp1": ("board", "RP1NetworkInterface"),
 }
 
+# Ways to write the mac address to the eeprom: external *-set-mac tools or ethtool ioctl
+EEPROM_BACKENDS = ["tool", "ethtool"]
+DEFAULT_EEPROM_BACKEND = "tool"
+
 
 class NetworkEEPROMException(Exception):
     """Exception which is raised if there are issues regarding the network eeprom."""
@@ -22,6 +31,26 @@ class NetworkEEPROMException(Exception):
     pass
 
 
+class NetworkEEPROMAggregateException(NetworkEEPROMException):
+    """Exception which collects the errors of several network interfaces."""
+
+    def __init__(self, errors: list) -> None:
+        """Create NetworkEEPROMAggregateException instance.
+
+        Parameters
+        ----------
+        errors : list
+            list of (interface, exception) tuples in interface order
+        """
+        self.errors = errors
+
+        message = f"Failed to write EEPROM of {len(errors)} network interface(s)"
+        for interface, exc in errors:
+            message += f"\n  {interface.path or type(interface).__name__}: {exc}"
+
+        super().__init__(message)
+
+
 class InvalidNetworkInterfaceTypeString(Exception):
     """Exception which is raised if the network interface type string is invalid."""
 
@@ -62,9 +91,102 @@ def find_interface_class(interface_type: str) -> "NetworkInterface":
 class NetworkInterface:
     """Network interface base representation class."""
 
-    def __init__(self, path: str, has_eeprom: bool = False) -> None:
+    # eeprom magic of the controller for the ethtool backend, None if not supported
+    eeprom_magic = None
+
+    def __init__(
+        self,
+        path: str,
+        has_eeprom: bool = False,
+        inventory: "revpi_provisioning.inventory.HardwareInventory" = None,
+    ) -> None:
         self.path = path
         self.has_eeprom = has_eeprom
+        # hardware snapshot, which is usually shared with the other parts of the device
+        self.inventory = (
+            inventory if inventory is not None else revpi_provisioning.inventory.HardwareInventory()
+        )
+        # maximum time in seconds to wait for the interface to be enumerated
+        self.enumeration_timeout = DEFAULT_ENUMERATION_TIMEOUT
+        # time in seconds it took the interface to appear, None if it was present
+        self.enumeration_time = None
+        self.eeprom_backend = DEFAULT_EEPROM_BACKEND
+        # eeprom access of the ethtool backend, the ioctl is used if None
+        self.ethtool_transport = None
+        # mac address which has been written to the eeprom by set_mac_address, None if not
+        self.written_mac_address = None
+
+    @property
+    def bus(self) -> str:
+        """Bus the interface is connected to.
+
+        Interfaces on different buses can be programmed at the same time. The base
+        implementation returns a bus which is unique for each interface.
+        """
+        return f"{type(self).__name__}:{id(self)}"
+
+    def _find_interface_name(self, bus: str) -> str:
+        """Find the interface name and wait until the interface is enumerated.
+
+        Parameters
+        ----------
+        bus : str
+            bus in sysfs
+
+        Returns
+        -------
+        str
+            interface name (eg. eth0)
+        """
+        with phase("enumeration_wait", interface=self.path):
+            (name, waited) = self.inventory.wait_for_ethernet_device(
+                bus, self.path, self.enumeration_timeout
+            )
+
+        self.enumeration_time = waited if waited else None
+
+        return name
+
+    def _write_eeprom_ethtool(self, interface_name: str, mac_address: str) -> bool:
+        """Write mac address with the ethtool backend if it is selected and supported.
+
+        Parameters
+        ----------
+        interface_name : str
+            interface name (eg. eth0)
+        mac_address : str
+            mac address to write
+
+        Returns
+        -------
+        bool
+            False if the mac address has to be written with the eeprom tool instead
+
+        Raises
+        ------
+        NetworkEEPROMException
+            the eeprom access failed for another reason than missing driver support
+        """
+        if self.eeprom_backend != "ethtool" or self.eeprom_magic is None:
+            return False
+
+        from revpi_provisioning.network.ethtool import IoctlEthtoolTransport, write_mac_address
+
+        transport = self.ethtool_transport or IoctlEthtoolTransport()
+
+        try:
+            write_mac_address(transport, interface_name, self.eeprom_magic, mac_address)
+        except OSError as e:
+            # the eeprom could not be read, so nothing has been written yet
+            if e.errno in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENODEV):
+                # driver does not support eeprom access via ethtool, use the eeprom tool
+                return False
+
+            raise NetworkEEPROMException(
+                f"Failed to read EEPROM of network interface '{interface_name}': {e}"
+            ) from e
+
+        return True
 
     def set_mac_address(self, mac_address: str) -> None:
         """Set mac address for interface.
@@ -75,7 +197,14 @@ class NetworkInterface:
             mac address to set
         """
         if self.has_eeprom:
-            self._write_eeprom(mac_address)
+            with phase(
+                "mac_write",
+                interface=self.path,
+                interface_type=type(self).__name__,
+                mac_address=str(mac_address),
+            ):
+                self._write_eeprom(mac_address)
+            self.written_mac_address = mac_address
 
     def _write_eeprom(self, mac_address: str) -> None:
         """Abstract method which handles the writing to the eeprom."""
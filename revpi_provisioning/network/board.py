@@ -4,14 +4,21 @@
 
 """Network interfaces which are located on the SOM itself."""
 
+from revpi_provisioning.inventory import HardwareInventory
 from revpi_provisioning.network import NetworkInterface
 
 
 class BoardNetworkInterface(NetworkInterface):
     """Base class for onboard network interfaces."""
 
-    def __init__(self, device_path: str, has_eeprom: bool = False, eeprom_tool: str = None) -> None:
-        super().__init__(device_path, has_eeprom)
+    def __init__(
+        self,
+        device_path: str,
+        has_eeprom: bool = False,
+        eeprom_tool: str = None,
+        inventory: HardwareInventory = None,
+    ) -> None:
+        super().__init__(device_path, has_eeprom, inventory)
 
         self.eeprom_tool = eeprom_tool
 
@@ -19,8 +26,10 @@ class BoardNetworkInterface(NetworkInterface):
 class BCM2711NetworkInterface(BoardNetworkInterface):
     """BCM2711 network interface class (eg. Raspberry Pi CM4)."""
 
-    def __init__(self, path: str = "", has_eeprom: bool = False) -> None:
-        super().__init__(path, has_eeprom)
+    def __init__(
+        self, path: str = "", has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(path, has_eeprom, inventory=inventory)
 
     def _write_eeprom(self, mac_address: str) -> None:
         """Do nothing, when mac address is written (no eeprom support for BCM2711)."""
@@ -31,8 +40,10 @@ class BCM2711NetworkInterface(BoardNetworkInterface):
 class RP1NetworkInterface(BoardNetworkInterface):
     """RP1 network interface class (eg. Raspberry Pi 5)."""
 
-    def __init__(self, path: str = "", has_eeprom: bool = False) -> None:
-        super().__init__(path, has_eeprom)
+    def __init__(
+        self, path: str = "", has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(path, has_eeprom, inventory=inventory)
 
     def _write_eeprom(self, mac_address: str) -> None:
         """Do nothing, when mac address is written (no eeprom support for RP1 based interfaces)."""
@@ -0,0 +1,190 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Write mac addresses to network interface eeproms with the ethtool ioctl.
+
+The eeprom layout of the supported Microchip controllers (LAN95XX, LAN78XX, LAN743X)
+starts with a signature byte (0xa5) followed by the mac address::
+
+    offset 0: 0xa5
+    offset 1: mac address (6 bytes)
+
+The drivers only accept writes if the magic of the controller is passed.
+"""
+
+import ctypes
+import fcntl
+import socket
+import struct
+
+from revpi_provisioning.network import NetworkEEPROMException
+from revpi_provisioning.utils import MacAddress
+
+# linux/sockios.h
+SIOCETHTOOL = 0x8946
+# linux/ethtool.h
+ETHTOOL_GEEPROM = 0x0000000B
+ETHTOOL_SEEPROM = 0x0000000C
+IFNAMSIZ = 16
+
+# struct ethtool_eeprom without data: cmd, magic, offset, len
+_ETHTOOL_EEPROM = struct.Struct("=IIII")
+# struct ifreq: name and pointer to the ethtool command, padded to the size of the union
+_IFREQ = struct.Struct(f"{IFNAMSIZ}sP16x")
+
+# Magics which the drivers expect for eeprom writes
+LAN95XX_EEPROM_MAGIC = 0x9500
+LAN78XX_EEPROM_MAGIC = 0x78A5
+LAN743X_EEPROM_MAGIC = 0x74A5
+
+EEPROM_SIGNATURE = 0xA5
+SIGNATURE_OFFSET = 0
+MAC_ADDRESS_OFFSET = 1
+
+
+class EthtoolTransport:
+    """Access to the eeprom of a network interface."""
+
+    def read(self, interface_name: str, offset: int, length: int) -> bytes:
+        """Read from the eeprom.
+
+        Parameters
+        ----------
+        interface_name : str
+            name of the network interface (eg. eth0)
+        offset : int
+            offset in the eeprom
+        length : int
+            number of bytes to read
+
+        Returns
+        -------
+        bytes
+            eeprom content
+        """
+        raise NotImplementedError()
+
+    def write(self, interface_name: str, magic: int, offset: int, data: bytes) -> None:
+        """Write to the eeprom.
+
+        Parameters
+        ----------
+        interface_name : str
+            name of the network interface (eg. eth0)
+        magic : int
+            eeprom magic of the controller
+        offset : int
+            offset in the eeprom
+        data : bytes
+            data to write
+        """
+        raise NotImplementedError()
+
+
+class IoctlEthtoolTransport(EthtoolTransport):
+    """Access the eeprom with the ETHTOOL_GEEPROM / ETHTOOL_SEEPROM ioctls."""
+
+    def _ioctl(self, interface_name: str, cmd: int, magic: int, offset: int, data: bytes) -> bytes:
+        buffer = ctypes.create_string_buffer(
+            _ETHTOOL_EEPROM.pack(cmd, magic, offset, len(data)) + data
+        )
+        ifreq = _IFREQ.pack(interface_name.encode(), ctypes.addressof(buffer))
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            fcntl.ioctl(sock.fileno(), SIOCETHTOOL, ifreq)
+
+        # the kernel writes the eeprom content behind the header
+        return buffer.raw[_ETHTOOL_EEPROM.size : _ETHTOOL_EEPROM.size + len(data)]
+
+    def read(self, interface_name: str, offset: int, length: int) -> bytes:
+        """Read from the eeprom (see EthtoolTransport.read)."""
+        return self._ioctl(interface_name, ETHTOOL_GEEPROM, 0, offset, bytes(length))
+
+    def write(self, interface_name: str, magic: int, offset: int, data: bytes) -> None:
+        """Write to the eeprom (see EthtoolTransport.write)."""
+        self._ioctl(interface_name, ETHTOOL_SEEPROM, magic, offset, data)
+
+
+def mac_address_bytes(mac_address: str) -> bytes:
+    """Convert mac address to its 6 bytes.
+
+    Parameters
+    ----------
+    mac_address : str
+        mac address (see MacAddress)
+
+    Returns
+    -------
+    bytes
+        mac address bytes
+    """
+    return MacAddress(mac_address).packed
+
+
+def write_mac_address(
+    transport: EthtoolTransport, interface_name: str, magic: int, mac_address: str
+) -> int:
+    """Write signature and mac address to the eeprom of a network interface.
+
+    Only the ranges of bytes which differ from the current eeprom content are written.
+    The content is read back afterwards.
+
+    Parameters
+    ----------
+    transport : EthtoolTransport
+        eeprom access
+    interface_name : str
+        name of the network interface (eg. eth0)
+    magic : int
+        eeprom magic of the controller
+    mac_address : str
+        mac address to write
+
+    Returns
+    -------
+    int
+        number of written bytes
+
+    Raises
+    ------
+    OSError
+        the eeprom cannot be read, nothing has been written
+    NetworkEEPROMException
+        writing failed or the eeprom content does not match after writing
+    """
+    expected = bytes([EEPROM_SIGNATURE]) + mac_address_bytes(mac_address)
+    current = transport.read(interface_name, SIGNATURE_OFFSET, len(expected))
+
+    written = 0
+    index = 0
+    try:
+        while index < len(expected):
+            if current[index] == expected[index]:
+                index += 1
+                continue
+
+            # write the whole range of differing bytes at once
+            end = index
+            while end < len(expected) and current[end] != expected[end]:
+                end += 1
+
+            transport.write(interface_name, magic, SIGNATURE_OFFSET + index, expected[index:end])
+            written += end - index
+            index = end
+
+        verified = not written or (
+            transport.read(interface_name, SIGNATURE_OFFSET, len(expected)) == expected
+        )
+    except OSError as e:
+        raise NetworkEEPROMException(
+            f"Failed to write EEPROM of network interface '{interface_name}' after "
+            + f"{written} bytes: {e}"
+        ) from e
+
+    if not verified:
+        raise NetworkEEPROMException(
+            f"Failed to verify EEPROM of network interface '{interface_name}'"
+        )
+
+    return written
@@ -6,20 +6,31 @@
 
 import subprocess
 
+from revpi_provisioning.inventory import HardwareInventory
 from revpi_provisioning.network import NetworkEEPROMException, NetworkInterface
-from revpi_provisioning.network.utils import find_pci_ethernet_device_name
+from revpi_provisioning.network.ethtool import LAN743X_EEPROM_MAGIC
+from revpi_provisioning.tools import run_tool
 
 
 class PCIeNetworkInterface(NetworkInterface):
     """Base class for PCIe network interfaces."""
 
     def __init__(
-        self, pcie_device_path: str, has_eeprom: bool = False, eeprom_tool: str = None
+        self,
+        pcie_device_path: str,
+        has_eeprom: bool = False,
+        eeprom_tool: str = None,
+        inventory: HardwareInventory = None,
     ) -> None:
-        super().__init__(pcie_device_path, has_eeprom)
+        super().__init__(pcie_device_path, has_eeprom, inventory)
 
         self.eeprom_tool = eeprom_tool
 
+    @property
+    def bus(self) -> str:
+        """PCI bus the interface is connected to (eg. pci0000:01 for 0000:01:00.0)."""
+        return "pci" + self.path.rsplit(":", 1)[0]
+
     def _write_eeprom(self, mac_address: str) -> None:
         """Write mac address to eeprom.
 
@@ -28,13 +39,16 @@ class PCIeNetworkInterface(NetworkInterface):
         mac_address : str
             mac address to write
         """
-        interface_name = find_pci_ethernet_device_name(self.path)
+        interface_name = self._find_interface_name("pci")
+        if self._write_eeprom_ethtool(interface_name, mac_address):
+            return
+
         cmd = [self.eeprom_tool, interface_name, str(mac_address)]
 
         try:
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            log = e.stdout.decode()
+            run_tool(cmd)
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            log = (getattr(e, "stdout", None) or b"").decode(errors="replace")
             raise NetworkEEPROMException(
                 f"Failed to write EEPROM for network interface '{interface_name}': {e}\n{log}"
             ) from e
@@ -43,5 +57,9 @@ class PCIeNetworkInterface(NetworkInterface):
 class LAN743XNetworkInterface(PCIeNetworkInterface):
     """Microchip LAN743X network interface class."""
 
-    def __init__(self, pcie_device_path: str, has_eeprom: bool = False) -> None:
-        super().__init__(pcie_device_path, has_eeprom, "lan743x-set-mac")
+    eeprom_magic = LAN743X_EEPROM_MAGIC
+
+    def __init__(
+        self, pcie_device_path: str, has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(pcie_device_path, has_eeprom, "/usr/sbin/lan743x-set-mac", inventory)
@@ -4,11 +4,14 @@
 
 """Network interfaces which are connected via SPI."""
 
+from revpi_provisioning.inventory import HardwareInventory
 from revpi_provisioning.network import NetworkInterface
 
 
 class KSZ8851NetworkInterface(NetworkInterface):
     """Microchip KSZ8851 network interface class."""
 
-    def __init__(self, path: str, has_eeprom: bool = False) -> None:
-        super().__init__(path, has_eeprom)
+    def __init__(
+        self, path: str, has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(path, has_eeprom, inventory)
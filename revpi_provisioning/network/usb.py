@@ -6,28 +6,42 @@
 
 import subprocess
 
+from revpi_provisioning.inventory import HardwareInventory
 from revpi_provisioning.network import NetworkInterface, NetworkEEPROMException
-from revpi_provisioning.network.utils import find_usb_ethernet_device_name
+from revpi_provisioning.network.ethtool import LAN78XX_EEPROM_MAGIC, LAN95XX_EEPROM_MAGIC
+from revpi_provisioning.tools import run_tool
 
 
 class USBNetworkInterface(NetworkInterface):
     """Base class for USB network interfaces."""
 
     def __init__(
-        self, usb_device_path: str, has_eeprom: bool = False, eeprom_tool: str = None
+        self,
+        usb_device_path: str,
+        has_eeprom: bool = False,
+        eeprom_tool: str = None,
+        inventory: HardwareInventory = None,
     ) -> None:
-        super().__init__(usb_device_path, has_eeprom)
+        super().__init__(usb_device_path, has_eeprom, inventory)
 
         self.eeprom_tool = eeprom_tool
 
+    @property
+    def bus(self) -> str:
+        """USB bus the interface is connected to (eg. usb1 for device path 1-1.1:1.0)."""
+        return f"usb{self.path.split('-')[0]}"
+
     def _write_eeprom(self, mac_address: str) -> None:
-        interface_name = find_usb_ethernet_device_name(self.path)
+        interface_name = self._find_interface_name("usb")
+        if self._write_eeprom_ethtool(interface_name, mac_address):
+            return
+
         cmd = [self.eeprom_tool, interface_name, str(mac_address)]
 
         try:
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            log = e.stdout.decode()
+            run_tool(cmd)
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            log = (getattr(e, "stdout", None) or b"").decode(errors="replace")
             raise NetworkEEPROMException(
                 f"Failed to write EEPROM for network interface '{interface_name}': {e}\n{log}"
             ) from e
@@ -36,12 +50,20 @@ class USBNetworkInterface(NetworkInterface):
 class LAN95XXNetworkInterface(USBNetworkInterface):
     """Microchip LAN95XX network interface class."""
 
-    def __init__(self, usb_device_path: str, has_eeprom: bool = False) -> None:
-        super().__init__(usb_device_path, has_eeprom, "/usr/sbin/lan95xx-set-mac")
+    eeprom_magic = LAN95XX_EEPROM_MAGIC
+
+    def __init__(
+        self, usb_device_path: str, has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(usb_device_path, has_eeprom, "/usr/sbin/lan95xx-set-mac", inventory)
 
 
 class LAN78XXNetworkInterface(USBNetworkInterface):
     """Microchip LAN78XX network interface class."""
 
-    def __init__(self, usb_device_path: str, has_eeprom: bool = False) -> None:
-        super().__init__(usb_device_path, has_eeprom, "/usr/sbin/lan78xx-set-mac")
+    eeprom_magic = LAN78XX_EEPROM_MAGIC
+
+    def __init__(
+        self, usb_device_path: str, has_eeprom: bool = False, inventory: HardwareInventory = None
+    ) -> None:
+        super().__init__(usb_device_path, has_eeprom, "/usr/sbin/lan78xx-set-mac", inventory)
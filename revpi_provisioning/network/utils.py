@@ -5,6 +5,19 @@
 """Network related utilities."""
 
 import glob
+import select
+import socket
+import time
+
+SYSFS_BUS = "/sys/bus"
+
+# Maximum time in seconds to wait for a network interface to be enumerated
+DEFAULT_ENUMERATION_TIMEOUT = 10.0
+# Bounds of the poll interval in seconds while waiting for a network interface
+ENUMERATION_POLL_INTERVAL_MIN = 0.01
+ENUMERATION_POLL_INTERVAL_MAX = 0.5
+# Netlink protocol of the kernel uevents (linux/netlink.h)
+NETLINK_KOBJECT_UEVENT = 15
 
 
 class NetworkInterfaceNotFoundException(Exception):
@@ -65,7 +78,7 @@ def find_ethernet_device_name(bus: str, device_path: str) -> str:
     NetworkInterfaceNotFoundException
         indicates that the network interface cannot be found
     """
-    path = f"/sys/bus/{bus}/devices/{device_path}/net/*"
+    path = f"{SYSFS_BUS}/{bus}/devices/{device_path}/net/*"
     names = glob.glob(path)
 
     if len(names) == 0:
@@ -74,3 +87,87 @@ def find_ethernet_device_name(bus: str, device_path: str) -> str:
     name = names[0].split("/")[-1]
 
     return name
+
+
+class UeventMonitor:
+    """Wait for kernel uevents of added network interfaces.
+
+    The uevents are received over netlink. If the netlink socket can not be opened
+    (e.g. missing permissions or not on Linux), wait() just sleeps, so the caller
+    falls back to polling.
+    """
+
+    def __init__(self) -> None:
+        self._socket = None
+
+        try:
+            self._socket = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT
+            )
+            # multicast group 1 receives the uevents of the kernel
+            self._socket.bind((0, 1))
+            self._socket.setblocking(False)
+        except (AttributeError, OSError):
+            if self._socket is not None:
+                self._socket.close()
+            self._socket = None
+
+    def __enter__(self) -> "UeventMonitor":
+        """Return the monitor."""
+        return self
+
+    def __exit__(self, exc_type: type, exc_value: Exception, traceback: object) -> None:
+        """Close the netlink socket."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the netlink socket."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    @staticmethod
+    def _is_net_add(message: bytes) -> bool:
+        # header "ACTION@DEVPATH" followed by KEY=VALUE pairs, separated by null bytes
+        fields = message.split(b"\0")[1:]
+        return b"ACTION=add" in fields and b"SUBSYSTEM=net" in fields
+
+    def wait(self, timeout: float) -> bool:
+        """Wait until a network interface was added or the timeout expired.
+
+        Parameters
+        ----------
+        timeout : float
+            maximum time to wait in seconds
+
+        Returns
+        -------
+        bool
+            True if a network interface was added
+        """
+        if self._socket is None:
+            time.sleep(timeout)
+            return False
+
+        deadline = time.monotonic() + timeout
+        while True:
+            (readable, _, _) = select.select([self._socket], [], [], timeout)
+            if not readable:
+                return False
+
+            added = False
+            try:
+                while True:
+                    added |= self._is_net_add(self._socket.recv(8192))
+            except BlockingIOError:
+                pass
+            except OSError:
+                # receive buffer overflowed, events were lost
+                added = True
+
+            if added:
+                return True
+
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return False
@@ -0,0 +1,298 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Profiling and tracing hooks which are called around the provisioning phases.
+
+The hooks are enabled with ``--profile HOOK[:FILE]`` of the CLI commands or with the
+environment variable REVPI_EOL_PROFILE (comma separated ``HOOK[:FILE]``):
+
+- ``profile``: cProfile of the code which runs in the phases, written as pstats file
+  (see ``python3 -m pstats FILE``)
+- ``tracemalloc``: traced memory at start and end and the peak of each phase as JSON
+- ``spans``: wall clock spans of the phases with their threads as Chrome trace events
+  (chrome://tracing, Perfetto)
+
+Without FILE the result is written to STDERR. Custom hooks are derived from
+revpi_provisioning.timing.PhaseHook and activated with revpi_provisioning.timing.hooks.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Iterator
+
+from revpi_provisioning.timing import PhaseHook, hooks
+
+PROFILE_ENV = "REVPI_EOL_PROFILE"
+# Number of functions in the cProfile summary on STDERR
+PROFILE_PRINT_LIMIT = 30
+
+
+class ProfilingException(Exception):
+    """Exception which is raised if a profiling hook is invalid."""
+
+    pass
+
+
+class OutputHook(PhaseHook):
+    """Base class of the hooks which write their result after the job."""
+
+    def __init__(self, output: str = "-") -> None:
+        """Create hook.
+
+        Parameters
+        ----------
+        output : str, optional
+            file the result is written to or "-" for STDERR, by default "-"
+        """
+        self.output = output
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Write the result.
+
+        Raises
+        ------
+        OSError
+            the result cannot be written
+        """
+        raise NotImplementedError()
+
+    def _write_json(self, data: object) -> None:
+        if self.output == "-":
+            json.dump(data, sys.stderr)
+            sys.stderr.write("\n")
+            return
+
+        with open(self.output, "w") as fh:
+            json.dump(data, fh, indent=2)
+            fh.write("\n")
+
+
+class ProfileHook(OutputHook):
+    """Profile the phases with cProfile.
+
+    Each thread has a profiler of its own which runs while the thread is in a phase.
+    Since Python 3.12 only one profiler can be active at a time, phases which overlap
+    with a profiled phase of another thread are not profiled then.
+    """
+
+    def __init__(self, output: str = "-") -> None:
+        super().__init__(output)
+        self._local = threading.local()
+        self._profilers = []
+
+    def before(self, name: str, attributes: dict) -> None:
+        """Start the profiler of the thread in its outermost phase."""
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        local.depth = depth + 1
+        if depth:
+            return
+
+        if not hasattr(local, "profiler"):
+            import cProfile
+
+            local.profiler = cProfile.Profile()
+            with self._lock:
+                self._profilers.append(local.profiler)
+
+        try:
+            local.profiler.enable()
+            local.enabled = True
+        except ValueError:
+            # another profiler is active
+            local.enabled = False
+
+    def after(self, name: str, attributes: dict, ok: bool, context: None) -> None:
+        """Stop the profiler of the thread at the end of its outermost phase."""
+        local = self._local
+        local.depth -= 1
+        if not local.depth and local.enabled:
+            local.profiler.disable()
+
+    def close(self) -> None:
+        """Write the statistics of all threads."""
+        if not self._profilers:
+            return
+
+        import pstats
+
+        stats = pstats.Stats(*self._profilers, stream=sys.stderr)
+        if self.output == "-":
+            stats.sort_stats("cumulative").print_stats(PROFILE_PRINT_LIMIT)
+        else:
+            stats.dump_stats(self.output)
+
+
+class TracemallocHook(OutputHook):
+    """Track the memory which is allocated in the phases with tracemalloc.
+
+    tracemalloc traces all threads, so the peak of a phase includes the allocations of
+    phases which run at the same time.
+    """
+
+    def __init__(self, output: str = "-") -> None:
+        super().__init__(output)
+        self.phases = []
+        # entries of the running phases, their peaks are updated before the peak is reset
+        self._running = []
+        self._started = False
+
+    def before(self, name: str, attributes: dict) -> dict:
+        """Reset the peak of the traced memory."""
+        import tracemalloc
+
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+
+            (current, peak) = tracemalloc.get_traced_memory()
+            for entry in self._running:
+                entry["peak"] = max(entry["peak"], peak)
+            tracemalloc.reset_peak()
+
+            entry = {"name": name, **attributes, "start_size": current, "peak": current}
+            self._running.append(entry)
+
+        return entry
+
+    def after(self, name: str, attributes: dict, ok: bool, context: dict) -> None:
+        """Record the traced memory and the peak of the phase."""
+        import tracemalloc
+
+        with self._lock:
+            (current, peak) = tracemalloc.get_traced_memory()
+            self._running.remove(context)
+
+            context["peak"] = max(context["peak"], peak)
+            context.update(
+                ok=ok, end_size=current, peak_increase=context["peak"] - context["start_size"]
+            )
+            self.phases.append(context)
+
+    def close(self) -> None:
+        """Stop tracemalloc if it was started by the hook and write the phases."""
+        if self._started:
+            import tracemalloc
+
+            tracemalloc.stop()
+
+        self._write_json({"phases": self.phases})
+
+
+class SpanHook(OutputHook):
+    """Record the wall clock spans of the phases as Chrome trace events."""
+
+    def __init__(self, output: str = "-") -> None:
+        super().__init__(output)
+        self.events = []
+        self._start = time.perf_counter()
+
+    def before(self, name: str, attributes: dict) -> float:
+        """Return the start time of the phase."""
+        return time.perf_counter()
+
+    def after(self, name: str, attributes: dict, ok: bool, context: float) -> None:
+        """Record the span of the phase."""
+        end = time.perf_counter()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (context - self._start) * 1e6,
+            "dur": (end - context) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {**attributes, "ok": ok},
+        }
+
+        with self._lock:
+            self.events.append(event)
+
+    def close(self) -> None:
+        """Write the trace events."""
+        self._write_json({"traceEvents": self.events, "displayTimeUnit": "ms"})
+
+
+PROFILING_HOOKS = {
+    "profile": ProfileHook,
+    "tracemalloc": TracemallocHook,
+    "spans": SpanHook,
+}
+
+
+def create_hooks(specs: list) -> list:
+    """Create the hooks of specifications.
+
+    Parameters
+    ----------
+    specs : list
+        hook specifications in the form HOOK[:FILE] (see PROFILING_HOOKS)
+
+    Returns
+    -------
+    list
+        OutputHook instances
+
+    Raises
+    ------
+    ProfilingException
+        a specification names an unknown hook
+    """
+    created = []
+
+    for spec in specs:
+        (name, _, output) = spec.partition(":")
+        if name not in PROFILING_HOOKS:
+            raise ProfilingException(
+                f"Unknown profiling hook '{name}' (choose from {', '.join(PROFILING_HOOKS)})"
+            )
+
+        created.append(PROFILING_HOOKS[name](output or "-"))
+
+    return created
+
+
+@contextlib.contextmanager
+def profiling(specs: list = ()) -> Iterator[list]:
+    """Call the hooks of specs and of PROFILE_ENV around the phases of the block.
+
+    The results are written after the block. Errors while writing them are reported on
+    STDERR, they do not change the result of the job.
+
+    Parameters
+    ----------
+    specs : list, optional
+        hook specifications in the form HOOK[:FILE]
+
+    Yields
+    ------
+    list
+        the active hooks
+
+    Raises
+    ------
+    ProfilingException
+        a specification names an unknown hook
+    """
+    env_specs = [spec.strip() for spec in os.environ.get(PROFILE_ENV, "").split(",")]
+    created = create_hooks(list(specs) + [spec for spec in env_specs if spec])
+
+    if not created:
+        yield created
+        return
+
+    try:
+        with hooks(*created):
+            yield created
+    finally:
+        for hook in created:
+            try:
+                hook.close()
+            except OSError as e:
+                print(f"Could not write result of profiling hook: {e}", file=sys.stderr)
@@ -5,39 +5,101 @@
 """RevPi abstraction stuff."""
 
 from __future__ import annotations
-from typing import Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
 
-import yaml
+from revpi_provisioning.hat import DEFAULT_GPIO_CHIP, DEFAULT_OVERLAY, HatEEPROM
+from revpi_provisioning.inventory import HardwareInventory
+from revpi_provisioning.network import (
+    NetworkEEPROMAggregateException,
+    NetworkInterface,
+    find_interface_class,
+)
+from revpi_provisioning.scheduler import Step, run_steps
+from revpi_provisioning.utils import MacRange
 
-from revpi_provisioning.hat import HatEEPROM
-from revpi_provisioning.network import NetworkInterface
-from revpi_provisioning.utils import MacAddress
+# Maximum number of buses on which mac addresses are written concurrently
+MAC_WORKERS = 4
+# Deadlines in seconds of the provisioning steps (see RevPi.provision)
+HAT_EEPROM_DEADLINE = 60.0
+MAC_ADDRESSES_DEADLINE = 120.0
 
 
 class RevPi:
     """RevPi device representation class."""
 
-    def __init__(self, product_id: int, product_revision: int) -> None:
+    def __init__(
+        self, product_id: int, product_revision: int, inventory: HardwareInventory = None
+    ) -> None:
         self.product_id: int = product_id
         self.product_revision: int = product_revision
+        # hardware snapshot shared by the HAT eeprom and the network interfaces
+        self.inventory: HardwareInventory = (
+            inventory if inventory is not None else HardwareInventory()
+        )
         self.hat_eeprom: HatEEPROM = None
         self.network_interfaces: list[NetworkInterface] = []
 
-    def write_hat_eeprom(self, eeprom_image: Union[str, bytes]) -> None:
+    def write_hat_eeprom(
+        self,
+        eeprom_image: Union[str, bytes],
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        digest: Optional[str] = None,
+    ) -> int:
         """Write HAT eeprom from given image path or payload.
 
         Parameters
         ----------
         eeprom_image : Union[str, bytes]
             either a path to the image or the content as bytes payload
+        progress : Callable[[int, int], None], optional
+            called with the written bytes and the image length (see HatEEPROM.write)
+        cancelled : threading.Event, optional
+            stops the write once it is set (see HatEEPROM.write)
+        digest : str, optional
+            sha256 of the image (hex) if it is known already
+
+        Returns
+        -------
+        int
+            number of eeprom pages which were already up to date and have been skipped
         """
         if self.hat_eeprom is not None:
-            self.hat_eeprom.write(eeprom_image)
+            return self.hat_eeprom.write(
+                eeprom_image,
+                product_id=self.product_id,
+                progress=progress,
+                cancelled=cancelled,
+                digest=digest,
+            )
+
+        return 0
 
-    def clear_hat_eeprom(self) -> None:
-        """Clear HAT eeprom contents."""
+    def clear_hat_eeprom(self) -> int:
+        """Clear HAT eeprom contents.
+
+        Returns
+        -------
+        int
+            number of eeprom pages which were already cleared and have been skipped
+        """
         if self.hat_eeprom is not None:
-            self.hat_eeprom.clear_content()
+            return self.hat_eeprom.clear_content()
+
+        return 0
+
+    def verify_hat_eeprom(self, eeprom_image: Union[str, bytes]) -> None:
+        """Verify HAT eeprom contents against given image path or payload.
+
+        Parameters
+        ----------
+        eeprom_image : Union[str, bytes]
+            either a path to the image or the content as bytes payload
+        """
+        if self.hat_eeprom is not None:
+            self.hat_eeprom.verify(eeprom_image)
 
     def dump_hat_eeprom(self, output_file: str) -> None:
         """Dump HAT eeprom contents to given file name.
@@ -50,30 +112,184 @@ class RevPi:
         if self.hat_eeprom is not None:
             self.hat_eeprom.dump(output_file)
 
-    def write_mac_addresses(self, first_mac_address: str) -> list[str]:
+    def write_mac_addresses(
+        self, first_mac_address: str, parallel: bool = False, max_workers: int = MAC_WORKERS
+    ) -> list[str]:
         """Write mac addresses to all interfaces with support for this.
 
+        The mac addresses are assigned in the order of the network interfaces. In parallel
+        mode interfaces on different buses are programmed at the same time and the errors
+        of all interfaces are collected. If writing fails, the addresses which have been
+        written nevertheless are kept in NetworkInterface.written_mac_address.
+
         Parameters
         ----------
         first_mac_address : str
             first mac address of the device
+        parallel : bool, optional
+            program interfaces on different buses concurrently, by default False
+        max_workers : int, optional
+            maximum number of buses which are programmed concurrently, by default MAC_WORKERS
 
         Returns
         -------
         list[str]
             list of assigned mac addresses
-        """
-        mac_address = MacAddress(first_mac_address)
-        mac_addresses = []
 
+        Raises
+        ------
+        NetworkEEPROMAggregateException
+            writing the mac address failed for at least one interface (parallel mode only)
+        """
+        mac_addresses = list(MacRange(first_mac_address, len(self.network_interfaces)))
         for interface in self.network_interfaces:
-            interface.set_mac_address(mac_address)
-            mac_addresses.append(mac_address)
+            interface.written_mac_address = None
+
+        if not parallel:
+            for interface, mac_address in zip(self.network_interfaces, mac_addresses, strict=True):
+                interface.set_mac_address(mac_address)
+
+            return mac_addresses
 
-            mac_address = mac_address + 1
+        # interfaces on the same bus are programmed one after another
+        buses = {}
+        for interface, mac_address in zip(self.network_interfaces, mac_addresses, strict=True):
+            buses.setdefault(interface.bus, []).append((interface, mac_address))
+
+        def program_bus(assignments: list) -> list:
+            errors = []
+            for interface, mac_address in assignments:
+                try:
+                    interface.set_mac_address(mac_address)
+                except Exception as exc:
+                    errors.append((interface, exc))
+
+            return errors
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(program_bus, buses.values())
+            failed = {id(interface): exc for errors in results for interface, exc in errors}
+
+        if failed:
+            raise NetworkEEPROMAggregateException(
+                [
+                    (interface, failed[id(interface)])
+                    for interface in self.network_interfaces
+                    if id(interface) in failed
+                ]
+            )
 
         return mac_addresses
 
+    def provision(
+        self,
+        eeprom_image: Union[str, bytes],
+        first_mac_address: str,
+        parallel: bool = False,
+        write_progress: Optional[Callable[[int, int], None]] = None,
+        image_digest: Optional[str] = None,
+    ) -> dict:
+        """Write HAT eeprom and mac addresses at the same time.
+
+        The HAT eeprom (I2C) and the network interfaces (USB / PCIe) are programmed
+        concurrently. All steps run to completion, even if another step fails. A step
+        which exceeds its deadline (HAT_EEPROM_DEADLINE, MAC_ADDRESSES_DEADLINE) fails
+        with a StepTimeoutException, a HAT eeprom write is stopped after the current
+        block and the write protection is enabled again.
+
+        Parameters
+        ----------
+        eeprom_image : Union[str, bytes]
+            either a path to the image or the content as bytes payload
+        first_mac_address : str
+            first mac address of the device
+        parallel : bool, optional
+            write mac addresses of interfaces on different buses concurrently, by default False
+        write_progress : Callable[[int, int], None], optional
+            progress of the HAT eeprom write (see write_hat_eeprom)
+        image_digest : str, optional
+            sha256 of the image (hex) if it is known already
+
+        Returns
+        -------
+        dict
+            results by step name: number of skipped HAT eeprom pages ("hat_eeprom") and
+            assigned mac addresses ("mac_addresses")
+
+        Raises
+        ------
+        ProvisioningException
+            at least one step failed, the exceptions of all failed steps are attached
+        """
+        hat_cancelled = threading.Event()
+        steps = [
+            Step(
+                "hat_eeprom",
+                lambda: self.write_hat_eeprom(
+                    eeprom_image, write_progress, hat_cancelled, image_digest
+                ),
+                timeout=HAT_EEPROM_DEADLINE,
+                cancel=hat_cancelled.set,
+            ),
+            Step(
+                "mac_addresses",
+                lambda: self.write_mac_addresses(first_mac_address, parallel=parallel),
+                timeout=MAC_ADDRESSES_DEADLINE,
+            ),
+        ]
+
+        return run_steps(steps)
+
+    @staticmethod
+    def from_config(
+        product_id: str,
+        product_revision: str,
+        configuration: dict,
+        inventory: HardwareInventory = None,
+    ) -> RevPi:
+        """Create RevPi instance from a loaded device configuration.
+
+        Parameters
+        ----------
+        product_id : str
+            product id of the device
+        product_revision : str
+            product revision of the device
+        configuration : dict
+            device configuration (see revpi_provisioning.config.load_config)
+        inventory : HardwareInventory, optional
+            hardware snapshot of the device, a new one is created if None
+
+        Returns
+        -------
+        RevPi
+            RevPi instance
+        """
+        instance = RevPi(product_id, product_revision, inventory)
+
+        # add HAT EEPROM if specified in config file
+        if "hat_eeprom" in configuration:
+            instance.hat_eeprom = HatEEPROM(
+                configuration["hat_eeprom"]["wp_gpio"],
+                configuration["hat_eeprom"].get("wp_gpiochip", DEFAULT_GPIO_CHIP),
+                overlay=configuration["hat_eeprom"].get("overlay", DEFAULT_OVERLAY),
+                inventory=instance.inventory,
+            )
+
+        for interface_config in configuration.get("network_interfaces", []):
+            # determine current interface class by type lookup
+            interface_class = find_interface_class(interface_config["type"])
+
+            instance.network_interfaces.append(
+                interface_class(
+                    interface_config["path"],
+                    interface_config.get("eeprom", False),
+                    inventory=instance.inventory,
+                )
+            )
+
+        return instance
+
     @staticmethod
     def from_yaml(catalog_file: str) -> RevPi:
         """Create RevPi instance from yaml config file.
@@ -88,6 +304,8 @@ class RevPi:
         RevPi
             RevPi instance
         """
+        import yaml
+
         with open(catalog_file, "r") as stream:
             try:
                 data = yaml.safe_load(stream)
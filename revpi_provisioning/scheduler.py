@@ -0,0 +1,209 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Run provisioning steps concurrently according to their dependencies.
+
+The steps are scheduled by an asyncio event loop. Coroutine functions run in the loop,
+blocking functions in worker threads. Each step may have a deadline: a step which does
+not finish in time is cancelled and reported with a StepTimeoutException, the steps
+which require it are skipped. If the whole run is cancelled, the running steps are
+cancelled as well. A blocking function cannot be interrupted in its thread, so a step
+may provide a cancel function which makes it stop early (e.g. the HAT eeprom write).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+# Time in seconds a cancelled step gets to clean up before it is abandoned
+CANCEL_GRACE_PERIOD = 5.0
+
+
+class StepSkippedException(Exception):
+    """Exception which is recorded for steps whose requirements failed."""
+
+    def __init__(self, step: str, requirement: str) -> None:
+        super().__init__(f"Step '{step}' skipped, because '{requirement}' failed")
+
+
+class StepTimeoutException(Exception):
+    """Exception which is recorded for steps which did not finish within their deadline."""
+
+    def __init__(self, step: str, timeout: float) -> None:
+        self.step = step
+        self.timeout = timeout
+
+        super().__init__(f"Step '{step}' did not finish within {timeout:.1f} s")
+
+
+class ProvisioningException(Exception):
+    """Exception which is raised if one or more provisioning steps failed."""
+
+    def __init__(self, errors: dict) -> None:
+        """Create ProvisioningException instance.
+
+        Parameters
+        ----------
+        errors : dict
+            exceptions of the failed steps by step name in step order
+        """
+        self.errors = errors
+
+        super().__init__(
+            "\n".join(f"{step}: {exc}" for step, exc in errors.items())
+            or "No provisioning step failed"
+        )
+
+
+class Step:
+    """Provisioning step with the names of the steps it requires."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        requires: tuple = (),
+        timeout: Optional[float] = None,
+        cancel: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        # deadline in seconds after the start of the step, None for no deadline
+        self.timeout = timeout
+        # called if the step is cancelled while it is running
+        self.cancel = cancel
+
+
+async def _run_step(step: Step, executor: ThreadPoolExecutor) -> object:
+    """Run a step until it finished or its deadline expired."""
+    import asyncio
+
+    if asyncio.iscoroutinefunction(step.func):
+        work = asyncio.ensure_future(step.func())
+    else:
+        future = executor.submit(step.func)
+        work = asyncio.wrap_future(future)
+
+    try:
+        (done, _) = await asyncio.wait({work}, timeout=step.timeout)
+    finally:
+        if not work.done():
+            # deadline expired or the run was cancelled
+            work.cancel()
+            if step.cancel is not None:
+                step.cancel()
+
+            stopped = work if isinstance(work, asyncio.Task) else asyncio.wrap_future(future)
+            await asyncio.wait({stopped}, timeout=CANCEL_GRACE_PERIOD)
+
+    if not done:
+        raise StepTimeoutException(step.name, step.timeout)
+
+    return work.result()
+
+
+async def run_steps_async(steps: list, max_workers: int = None) -> dict:
+    """Run steps concurrently as soon as the steps they require have finished.
+
+    Steps whose requirements failed are not run and are reported with a
+    StepSkippedException.
+
+    Parameters
+    ----------
+    steps : list
+        steps in the order in which errors are reported
+    max_workers : int, optional
+        maximum number of blocking steps which run at the same time, by default one
+        per step
+
+    Returns
+    -------
+    dict
+        return values of the steps by step name
+
+    Raises
+    ------
+    ProvisioningException
+        at least one step failed
+    """
+    # not imported at module level to keep the start time of the CLI commands low
+    import asyncio
+
+    names = [step.name for step in steps]
+    for step in steps:
+        for requirement in step.requires:
+            if requirement not in names:
+                raise ValueError(f"Step '{step.name}' requires unknown step '{requirement}'")
+
+    results = {}
+    errors = {}
+    pending = list(steps)
+    running = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or max(len(steps), 1))
+    try:
+        while pending or running:
+            for step in list(pending):
+                failed = [name for name in step.requires if name in errors]
+                if failed:
+                    errors[step.name] = StepSkippedException(step.name, failed[0])
+                    pending.remove(step)
+                elif all(name in results for name in step.requires):
+                    running[asyncio.ensure_future(_run_step(step, executor))] = step
+                    pending.remove(step)
+
+            if not running:
+                if pending:
+                    # remaining steps depend on each other
+                    raise ValueError(
+                        "Circular step requirements: " + ", ".join(step.name for step in pending)
+                    )
+                break
+
+            (done, _) = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step = running.pop(task)
+                try:
+                    results[step.name] = task.result()
+                except Exception as exc:
+                    errors[step.name] = exc
+    finally:
+        # only left if the run was cancelled, the steps get the chance to clean up
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.wait(running)
+        # do not wait for threads of abandoned steps
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if errors:
+        raise ProvisioningException({name: errors[name] for name in names if name in errors})
+
+    return results
+
+
+def run_steps(steps: list, max_workers: int = None) -> dict:
+    """Run steps in an event loop of their own (see run_steps_async).
+
+    Parameters
+    ----------
+    steps : list
+        steps in the order in which errors are reported
+    max_workers : int, optional
+        maximum number of blocking steps which run at the same time, by default one
+        per step
+
+    Returns
+    -------
+    dict
+        return values of the steps by step name
+
+    Raises
+    ------
+    ProvisioningException
+        at least one step failed
+    """
+    import asyncio
+
+    return asyncio.run(run_steps_async(steps, max_workers))
@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""HAT eeprom images which are built per device from a template.
+
+A template is a HAT eeprom image with the atoms which are the same for all devices of
+a product. The per-device fields (serial number, mac address and optional custom data)
+are appended as custom data atoms, in this order. Only the crcs of the appended atoms
+are calculated, the atoms of the template are copied as they are.
+
+The template files are read through the ImageCache, each template is compiled once.
+"""
+
+from typing import Optional
+
+from revpi_provisioning.eep import (
+    ATOM_CUSTOM_DATA,
+    ATOM_HEADER,
+    CRC,
+    FORMAT_VERSION,
+    HEADER,
+    SIGNATURE,
+    crc16,
+    parse_image,
+)
+from revpi_provisioning.imagecache import ImageCache
+from revpi_provisioning.utils import MacAddress
+
+
+class ImageTemplate:
+    """Compiled template of a HAT eeprom image."""
+
+    def __init__(self, image: bytes) -> None:
+        """Compile template.
+
+        Parameters
+        ----------
+        image : bytes
+            HAT eeprom image, bytes after the length in the header are dropped
+
+        Raises
+        ------
+        EEPImageException
+            the template is not a valid HAT eeprom image
+        """
+        parsed = parse_image(image)
+
+        self.atoms = bytes(parsed.buffer[HEADER.size : parsed.length])
+        self.atom_count = len(parsed.atoms)
+        self.vendor_info = parsed.vendor_info
+
+    def build(
+        self, serial: Optional[str], mac_address: Optional[str], custom_data: list = ()
+    ) -> bytearray:
+        """Build the image of a device.
+
+        Parameters
+        ----------
+        serial : str, optional
+            serial number, no atom is added if None
+        mac_address : str, optional
+            first mac address (stored as aa:bb:cc:dd:ee:ff), no atom is added if None
+        custom_data : list, optional
+            additional custom data as bytes or str
+
+        Returns
+        -------
+        bytearray
+            image
+        """
+        fields = []
+        if serial is not None:
+            fields.append(serial.encode("ascii"))
+        if mac_address is not None:
+            fields.append(MacAddress(mac_address).format_colon.encode("ascii"))
+        fields.extend(
+            data.encode("ascii") if isinstance(data, str) else data for data in custom_data
+        )
+
+        length = HEADER.size + len(self.atoms)
+        length += sum(ATOM_HEADER.size + len(data) + CRC.size for data in fields)
+
+        image = bytearray(length)
+        HEADER.pack_into(
+            image, 0, SIGNATURE, FORMAT_VERSION, 0, self.atom_count + len(fields), length
+        )
+        offset = HEADER.size
+        image[offset : offset + len(self.atoms)] = self.atoms
+        offset += len(self.atoms)
+
+        view = memoryview(image)
+        for count, data in enumerate(fields, self.atom_count):
+            atom_start = offset
+            ATOM_HEADER.pack_into(image, offset, ATOM_CUSTOM_DATA, count, len(data) + CRC.size)
+            offset += ATOM_HEADER.size
+            image[offset : offset + len(data)] = data
+            offset += len(data)
+            CRC.pack_into(image, offset, crc16(view[atom_start:offset]))
+            offset += CRC.size
+
+        return image
+
+
+class TemplateCache:
+    """Compiled templates by content hash."""
+
+    def __init__(self, images: Optional[ImageCache] = None) -> None:
+        """Create TemplateCache instance.
+
+        Parameters
+        ----------
+        images : ImageCache, optional
+            cache the template files are read from, by default a new ImageCache
+        """
+        self.images = images if images is not None else ImageCache()
+        # compiled templates by content hash
+        self._templates = {}
+
+    def load(self, path: str) -> ImageTemplate:
+        """Return the compiled template of a file.
+
+        Parameters
+        ----------
+        path : str
+            path to the template
+
+        Returns
+        -------
+        ImageTemplate
+            compiled template
+
+        Raises
+        ------
+        OSError
+            the template cannot be read
+        EEPImageException
+            the template is not a valid HAT eeprom image
+        """
+        (content, digest) = self.images.load(path)
+
+        if digest not in self._templates:
+            self._templates[digest] = ImageTemplate(content)
+
+        return self._templates[digest]
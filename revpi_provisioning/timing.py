@@ -0,0 +1,243 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Record the duration of provisioning phases.
+
+The provisioning code marks its phases with ``phase()``::
+
+    with phase("hat_write"):
+        ...
+
+Each active PhaseHook is called before and after each phase (see ``hooks()``). The
+TimingRecorder is such a hook, further ones are in revpi_provisioning.profiling. If no
+hook is active, ``phase()`` returns a shared context manager which does nothing.
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+from typing import Iterator, Optional
+
+
+class PhaseHook:
+    """Base class of the hooks which are called around each phase.
+
+    Phases may run concurrently in several threads, so hooks have to be thread safe.
+    """
+
+    def before(self, name: str, attributes: dict) -> object:
+        """Call at the start of a phase.
+
+        Parameters
+        ----------
+        name : str
+            name of the phase
+        attributes : dict
+            additional attributes of the phase, e.g. the network interface
+
+        Returns
+        -------
+        object
+            context which is passed to after
+        """
+        return None
+
+    def after(self, name: str, attributes: dict, ok: bool, context: object) -> None:
+        """Call at the end of a phase.
+
+        Parameters
+        ----------
+        name : str
+            name of the phase
+        attributes : dict
+            additional attributes of the phase, e.g. the network interface
+        ok : bool
+            False if the phase raised an exception
+        context : object
+            return value of before
+        """
+        pass
+
+
+class TimingRecorder(PhaseHook):
+    """Collect the phases of one job with their monotonic start and end times."""
+
+    def __init__(self) -> None:
+        self.start = time.monotonic()
+        self.phases = []
+        # phases may be recorded from several threads (e.g. parallel mac writes)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, ok: bool, attributes: dict) -> None:
+        """Add a finished phase.
+
+        Parameters
+        ----------
+        name : str
+            name of the phase
+        start : float
+            monotonic start time in seconds
+        end : float
+            monotonic end time in seconds
+        ok : bool
+            False if the phase raised an exception
+        attributes : dict
+            additional attributes of the phase, e.g. the network interface
+        """
+        entry = {"name": name, "start": start, "end": end, "duration": end - start, "ok": ok}
+        entry.update(attributes)
+
+        with self._lock:
+            self.phases.append(entry)
+
+    def before(self, name: str, attributes: dict) -> float:
+        """Return the start time of the phase (see PhaseHook.before)."""
+        return time.monotonic()
+
+    def after(self, name: str, attributes: dict, ok: bool, context: float) -> None:
+        """Add the phase (see PhaseHook.after)."""
+        self.add(name, context, time.monotonic(), ok, attributes)
+
+    def report(self, product: Optional[str], rc: int) -> dict:
+        """Return the timing report of the job.
+
+        Parameters
+        ----------
+        product : str, optional
+            product number the job ran for
+        rc : int
+            exit code of the job
+
+        Returns
+        -------
+        dict
+            timing report with the phases ordered by their start time
+        """
+        end = time.monotonic()
+
+        with self._lock:
+            phases = sorted(self.phases, key=lambda entry: entry["start"])
+
+        return {
+            "product": product,
+            "rc": rc,
+            "start": self.start,
+            "end": end,
+            "duration": end - self.start,
+            "phases": phases,
+        }
+
+
+class _Phase:
+    """Context manager which calls the hooks around a phase."""
+
+    __slots__ = ("_hooks", "_name", "_attributes", "_contexts")
+
+    def __init__(self, hooks: tuple, name: str, attributes: dict) -> None:
+        self._hooks = hooks
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self) -> None:
+        self._contexts = [hook.before(self._name, self._attributes) for hook in self._hooks]
+
+    def __exit__(self, exc_type: type, exc_value: Exception, traceback: object) -> None:
+        ok = exc_type is None
+        # in reverse order, so the hooks are nested
+        for hook, context in zip(reversed(self._hooks), reversed(self._contexts), strict=True):
+            hook.after(self._name, self._attributes, ok, context)
+
+
+# Active hooks, replaced as a whole so phase() can read it without a lock
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+_NO_PHASE = contextlib.nullcontext()
+
+
+def phase(name: str, **attributes: object) -> contextlib.AbstractContextManager:
+    """Return context manager which calls the active hooks around a phase.
+
+    Parameters
+    ----------
+    name : str
+        name of the phase
+    **attributes : object
+        additional attributes of the phase which are added to the report
+
+    Returns
+    -------
+    contextlib.AbstractContextManager
+        context manager which marks its block as phase
+    """
+    active = _hooks
+    if not active:
+        return _NO_PHASE
+
+    return _Phase(active, name, attributes)
+
+
+@contextlib.contextmanager
+def hooks(*added: PhaseHook) -> Iterator[None]:
+    """Call hooks around the phases of the block (in addition to the active ones).
+
+    Parameters
+    ----------
+    *added : PhaseHook
+        hooks to activate
+    """
+    global _hooks
+
+    with _hooks_lock:
+        _hooks = _hooks + added
+    try:
+        yield
+    finally:
+        with _hooks_lock:
+            _hooks = tuple(hook for hook in _hooks if hook not in added)
+
+
+@contextlib.contextmanager
+def recording(recorder: Optional[TimingRecorder]) -> Iterator[Optional[TimingRecorder]]:
+    """Record the phases of the block in recorder.
+
+    Parameters
+    ----------
+    recorder : TimingRecorder, optional
+        recorder to use, nothing is recorded if None
+
+    Yields
+    ------
+    TimingRecorder
+        the recorder
+    """
+    if recorder is None:
+        yield None
+        return
+
+    with hooks(recorder):
+        yield recorder
+
+
+def write_report(report: dict, output: str = "-") -> None:
+    """Write timing report as JSON.
+
+    Parameters
+    ----------
+    report : dict
+        timing report (see TimingRecorder.report)
+    output : str, optional
+        output file or "-" for STDOUT, by default "-"
+    """
+    if output == "-":
+        json.dump(report, sys.stdout)
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+        return
+
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+        fh.write("\n")
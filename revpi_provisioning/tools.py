@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Run external tools (dtoverlay, *-set-mac) with a deadline.
+
+The tools are run with asyncio subprocesses. If a tool does not exit within its
+timeout or the calling task is cancelled, the tool is killed, so a hung tool cannot
+stall a station. Synchronous code uses ``run_tool``, coroutines ``run_tool_async``.
+"""
+
+import subprocess
+from typing import Optional
+
+# Maximum time in seconds an external tool may run
+TOOL_TIMEOUT = 30.0
+
+
+class ToolException(subprocess.CalledProcessError):
+    """Exception which is raised if a tool exits with a non-zero exit code.
+
+    Unlike subprocess.CalledProcessError the message contains the error output.
+    """
+
+    def __str__(self) -> str:
+        """Return the message with the error output of the tool."""
+        message = super().__str__()
+        stderr = (self.stderr or b"").decode("utf-8", "replace").strip()
+
+        return f"{message.rstrip('.')}: {stderr}" if stderr else message
+
+
+async def run_tool_async(cmd: list, timeout: Optional[float] = None) -> bytes:
+    """Run tool and return its standard output.
+
+    Parameters
+    ----------
+    cmd : list
+        program and arguments
+    timeout : float, optional
+        maximum run time in seconds, by default TOOL_TIMEOUT
+
+    Returns
+    -------
+    bytes
+        standard output of the tool
+
+    Raises
+    ------
+    FileNotFoundError
+        the program does not exist
+    ToolException
+        the tool exited with a non-zero exit code, the error output is attached
+    subprocess.TimeoutExpired
+        the tool did not exit within the timeout and was killed
+    """
+    # asyncio is imported on first use, it is expensive for the start time of the CLI
+    import asyncio
+
+    timeout = TOOL_TIMEOUT if timeout is None else timeout
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+
+    try:
+        (output, errors) = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        raise subprocess.TimeoutExpired(cmd, timeout, output=b"", stderr=b"") from None
+    except asyncio.CancelledError:
+        await _kill(process)
+        raise
+
+    if process.returncode != 0:
+        raise ToolException(process.returncode, cmd, output=output, stderr=errors)
+
+    return output
+
+
+async def _kill(process: "asyncio.subprocess.Process") -> None:  # noqa: F821
+    """Kill process and reap it."""
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+def run_tool(cmd: list, timeout: Optional[float] = None) -> bytes:
+    """Run tool from synchronous code (see run_tool_async).
+
+    The tool is run in an event loop of its own, so this must not be called from a
+    coroutine. Provisioning steps run in worker threads and may call it.
+
+    Parameters
+    ----------
+    cmd : list
+        program and arguments
+    timeout : float, optional
+        maximum run time in seconds, by default TOOL_TIMEOUT
+
+    Returns
+    -------
+    bytes
+        standard output of the tool
+    """
+    import asyncio
+
+    return asyncio.run(run_tool_async(cmd, timeout))
@@ -5,6 +5,7 @@
 """Utilities for device provisioning."""
 
 import re
+from typing import Iterator, Union
 
 
 class InvalidMacAddressFormat(Exception):
@@ -29,71 +30,130 @@ class InvalidProductNumberException(Exception):
         super().__init__(f"Could not parse product number: {product_number}")
 
 
+# Number of bits of a mac address
+MAC_ADDRESS_BITS = 48
+# Formats of MacAddress.format: delimiter and number of hex digits per group
+MAC_ADDRESS_FORMATS = {"plain": ("", 12), "colon": (":", 2), "dash": ("-", 2)}
+
+
 class MacAddress:
-    """MAC address representation class with some helper methods."""
+    """MAC address representation class with some helper methods.
+
+    The mac address is stored as integer, arithmetic does not parse strings.
+    """
+
+    __slots__ = ("_value",)
 
-    def __init__(self, mac: str) -> None:
+    def __init__(self, mac: Union[str, int, "MacAddress"]) -> None:
         """Create MacAddress instance.
 
         Parameters
         ----------
-        mac : str
-            mac address
+        mac : Union[str, int, MacAddress]
+            mac address as string (with or without ":" / "-" delimiters), integer or
+            MacAddress
 
         Raises
         ------
         InvalidMacAddressFormat
             Exception if mac address format is invalid
         """
-        mac = mac.lower()
-        mac = mac.replace(":", "")
-        mac = mac.replace("-", "")
+        if isinstance(mac, MacAddress):
+            value = mac._value
+        elif isinstance(mac, int):
+            value = mac
+        else:
+            digits = mac.lower().replace(":", "").replace("-", "")
+
+            if not re.fullmatch(r"[a-f0-9]{12}", digits):
+                raise InvalidMacAddressFormat(mac)
+
+            value = int(digits, 16)
+
+        if value < 0 or value >> MAC_ADDRESS_BITS:
+            raise InvalidMacAddressFormat(str(mac))
+
+        self._value = value
+
+    @classmethod
+    def _from_int(cls, value: int) -> "MacAddress":
+        """Create instance from an integer without any checks but the range."""
+        if value < 0 or value >> MAC_ADDRESS_BITS:
+            raise InvalidMacAddressFormat(f"mac address out of range: {value:#x}")
 
-        if not re.match(r"[a-f0-9]{12}", mac):
-            raise InvalidMacAddressFormat(mac)
+        instance = cls.__new__(cls)
+        instance._value = value
 
-        self.__mac = int(mac, 16)
+        return instance
 
     def __str__(self) -> str:
-        """Return a string representation of the mac address."""
-        return self.__format_hexstring(self.__mac)
+        """Return a string representation of the mac address (12 hex digits)."""
+        return f"{self._value:012x}"
 
     def __repr__(self) -> str:
         """Return the representation of this instance."""
         return str(self)
 
+    def __int__(self) -> int:
+        """Return the mac address as integer."""
+        return self._value
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with another mac address."""
+        if not isinstance(other, MacAddress):
+            return NotImplemented
+
+        return self._value == other._value
+
+    def __lt__(self, other: "MacAddress") -> bool:
+        """Order mac addresses by their value."""
+        if not isinstance(other, MacAddress):
+            return NotImplemented
+
+        return self._value < other._value
+
+    def __le__(self, other: "MacAddress") -> bool:
+        """Order mac addresses by their value."""
+        if not isinstance(other, MacAddress):
+            return NotImplemented
+
+        return self._value <= other._value
+
+    def __hash__(self) -> int:
+        """Return hash of the mac address."""
+        return hash(self._value)
+
     def __add__(self, other: int) -> "MacAddress":
         """Increment mac address with + operator."""
-        new_mac = self.__mac + other
-
-        return __class__(self.__format_hexstring(new_mac))
+        return self._from_int(self._value + other)
 
     def __sub__(self, other: int) -> "MacAddress":
         """Decrement mac address with - operator."""
-        new_mac = self.__mac - other
+        return self._from_int(self._value - other)
 
-        return __class__(self.__format_hexstring(new_mac))
-
-    def __format_hexstring(self, value: int) -> str:
-        """Format value as hexstring."""
-        return f"{value:x}"
-
-    def __format_with_delimiter(self, delimiter: chr, group_length: int) -> str:
-        """Format mac address with delimiter.
+    def format(self, style: str = "plain") -> str:
+        """Format mac address.
 
         Parameters
         ----------
-        delimiter : chr
-            delimiter character
-        group_length : int
-            length of each group
+        style : str, optional
+            "plain" (aabbccddeeff), "colon" (aa:bb:cc:dd:ee:ff) or "dash"
+            (aa-bb-cc-dd-ee-ff), by default "plain"
 
         Returns
         -------
         str
-            mac address formated with delimiters
+            formated mac address
         """
-        return delimiter.join(map("".join, zip(*[iter(str(self))] * group_length, strict=True)))
+        (delimiter, group_length) = MAC_ADDRESS_FORMATS[style]
+        digits = f"{self._value:012x}"
+
+        if not delimiter:
+            return digits
+
+        return delimiter.join(
+            digits[index : index + group_length] for index in range(0, 12, group_length)
+        )
 
     @property
     def format_colon(self) -> str:
@@ -104,7 +164,7 @@ class MacAddress:
         str
             formated mac address
         """
-        return self.__format_with_delimiter(":", 2)
+        return self.format("colon")
 
     @property
     def format_dash(self) -> str:
@@ -115,17 +175,154 @@ class MacAddress:
         str
             formated mac address
         """
-        return self.__format_with_delimiter("-", 4)
+        return self.format("dash")
+
+    @property
+    def packed(self) -> bytes:
+        """Return the 6 bytes of the mac address."""
+        return self._value.to_bytes(6, "big")
 
     @property
     def oui(self) -> str:
         """Return oui part of mac address."""
-        return str(self)[:6]
+        return f"{self._value >> 24:06x}"
 
     @property
     def nic(self) -> str:
         """Return nic part of mac address."""
-        return str(self)[6:]
+        return f"{self._value & 0xFFFFFF:06x}"
+
+
+class MacRange:
+    """Block of consecutive mac addresses."""
+
+    __slots__ = ("_start", "_count")
+
+    def __init__(self, first: Union[str, int, MacAddress], count: int) -> None:
+        """Create MacRange instance.
+
+        Parameters
+        ----------
+        first : Union[str, int, MacAddress]
+            first mac address of the block
+        count : int
+            number of mac addresses
+
+        Raises
+        ------
+        InvalidMacAddressFormat
+            the first mac address is invalid or the block exceeds the mac address space
+        """
+        if count < 0:
+            raise ValueError(f"Invalid number of mac addresses: {count}")
+
+        self._start = int(MacAddress(first))
+        self._count = count
+
+        if count and (self._start + count - 1) >> MAC_ADDRESS_BITS:
+            raise InvalidMacAddressFormat(f"mac address range exceeds {'ff' * 6}")
+
+    @property
+    def first(self) -> MacAddress:
+        """First mac address of the block."""
+        return MacAddress._from_int(self._start)
+
+    @property
+    def last(self) -> MacAddress:
+        """Last mac address of the block."""
+        if not self._count:
+            raise ValueError("Empty mac address range has no last mac address")
+
+        return MacAddress._from_int(self._start + self._count - 1)
+
+    def __len__(self) -> int:
+        """Return the number of mac addresses."""
+        return self._count
+
+    def __iter__(self) -> Iterator[MacAddress]:
+        """Iterate over the mac addresses of the block."""
+        for value in range(self._start, self._start + self._count):
+            yield MacAddress._from_int(value)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[MacAddress, "MacRange"]:
+        """Return a mac address or a consecutive sub block (slices with step 1 only)."""
+        if isinstance(index, slice):
+            (start, stop, step) = index.indices(self._count)
+            if step != 1:
+                raise ValueError("Mac address ranges can only be sliced with step 1")
+
+            return MacRange(self._start + start, max(stop - start, 0))
+
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("mac address range index out of range")
+
+        return MacAddress._from_int(self._start + index)
+
+    def __contains__(self, mac: Union[str, int, MacAddress]) -> bool:
+        """Check if a mac address is part of the block."""
+        return self._start <= int(MacAddress(mac)) < self._start + self._count
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with another mac address range."""
+        if not isinstance(other, MacRange):
+            return NotImplemented
+
+        return (self._start, self._count) == (other._start, other._count)
+
+    def __hash__(self) -> int:
+        """Return hash of the mac address range."""
+        return hash((self._start, self._count))
+
+    def __repr__(self) -> str:
+        """Return the representation of this instance."""
+        return f"MacRange({MacAddress._from_int(self._start)!s}, {self._count})"
+
+    def overlaps(self, other: "MacRange") -> bool:
+        """Check if two blocks share at least one mac address.
+
+        Parameters
+        ----------
+        other : MacRange
+            other block
+
+        Returns
+        -------
+        bool
+            True if the blocks overlap
+        """
+        return (
+            self._count > 0
+            and other._count > 0
+            and self._start < other._start + other._count
+            and other._start < self._start + self._count
+        )
+
+    def format(self, style: str = "plain") -> list:
+        """Format all mac addresses of the block.
+
+        Parameters
+        ----------
+        style : str, optional
+            see MacAddress.format, by default "plain"
+
+        Returns
+        -------
+        list
+            formated mac addresses
+        """
+        (delimiter, group_length) = MAC_ADDRESS_FORMATS[style]
+        values = range(self._start, self._start + self._count)
+
+        if not delimiter:
+            return [f"{value:012x}" for value in values]
+
+        groups = range(0, 12, group_length)
+        return [
+            delimiter.join(digits[index : index + group_length] for index in groups)
+            for digits in (f"{value:012x}" for value in values)
+        ]
 
 
 def extract_product(product_number: str) -> tuple:
@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Validate many device configuration files at once.
+
+The files are validated in parallel by worker processes, each of them builds the
+schema once. The results are cached by the SHA-256 checksum of the content of all
+files load_config reads for a file (see _cache_key), so unchanged files are not
+validated again. The cache is invalidated if the schema (revpi_provisioning.config) or
+the network interface types change.
+"""
+
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+import revpi_provisioning.config
+from revpi_provisioning.config import EOLConfigException, load_config
+from revpi_provisioning.network import NETWORK_INTERFACE_TYPES
+
+DEFAULT_VALIDATION_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "revpi-eol-provisioner",
+    "validation.json",
+)
+VALIDATION_CACHE_VERSION = 2
+# Maximum number of cached results
+VALIDATION_CACHE_SIZE = 4096
+# Number of files which are validated in the calling process instead of worker processes
+MIN_PARALLEL_FILES = 16
+
+
+class ValidationResult:
+    """Result of the validation of one device configuration file."""
+
+    def __init__(self, path: str, error: Optional[str], cached: bool = False) -> None:
+        self.path = path
+        # error message, None if the file is valid
+        self.error = error
+        # result was taken from the cache
+        self.cached = cached
+
+    @property
+    def valid(self) -> bool:
+        """File is a valid device configuration."""
+        return self.error is None
+
+
+def expand_paths(patterns: list) -> list:
+    """Expand directories and glob patterns to device configuration files.
+
+    A directory stands for all yaml files in it. Patterns which match nothing are
+    kept as they are, so they are reported as missing files.
+
+    Parameters
+    ----------
+    patterns : list
+        files, directories or glob patterns
+
+    Returns
+    -------
+    list
+        files in the order of the patterns without duplicates
+    """
+    paths = []
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.yaml")))
+        elif os.path.exists(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+
+        paths.extend(match for match in matches if match not in paths)
+
+    return paths
+
+
+def _schema_fingerprint() -> str:
+    """Return a checksum of everything the validation result depends on besides the file."""
+    checksum = hashlib.sha256(f"{VALIDATION_CACHE_VERSION}\n".encode())
+    with open(revpi_provisioning.config.__file__, "rb") as fh:
+        checksum.update(fh.read())
+    checksum.update(",".join(sorted(NETWORK_INTERFACE_TYPES)).encode())
+
+    return checksum.hexdigest()
+
+
+def _cache_key(path: str) -> str:
+    """Return the checksum of a device configuration file and of its fallback file.
+
+    load_config also reads the file without revision (PRNNNNNNRNN.yaml -> PRNNNNNN.yaml),
+    so its content and existence are part of the key.
+
+    Raises
+    ------
+    OSError
+        the file cannot be read
+    """
+    checksum = hashlib.sha256()
+    with open(path, "rb") as fh:
+        checksum.update(hashlib.sha256(fh.read()).digest())
+
+    try:
+        with open(f"{path[:-8]}.yaml", "rb") as fh:
+            checksum.update(hashlib.sha256(fh.read()).digest())
+    except FileNotFoundError:
+        checksum.update(b"-")
+
+    return checksum.hexdigest()
+
+
+def _validate_file(path: str) -> Optional[str]:
+    """Validate file, return the error message or None if it is valid."""
+    try:
+        load_config(path, absolute_path=True)
+    except EOLConfigException as ce:
+        return str(ce)
+    except (OSError, UnicodeDecodeError) as e:
+        return f"Could not read device configuration file: {e}"
+
+    return None
+
+
+def _read_cache(cache_file: str, fingerprint: str) -> dict:
+    try:
+        with open(cache_file) as fh:
+            cache = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("schema") != fingerprint:
+        return {}
+
+    return cache.get("results", {})
+
+
+def _write_cache(cache_file: str, fingerprint: str, results: dict) -> None:
+    """Write cache atomically, the cache is only an optimization, so errors are ignored."""
+    # results are kept in insertion order, the oldest ones are dropped first
+    results = dict(list(results.items())[-VALIDATION_CACHE_SIZE:])
+
+    try:
+        directory = os.path.dirname(cache_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, prefix=".validation.")
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"schema": fingerprint, "results": results}, fh)
+        os.replace(tmp_path, cache_file)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+
+
+def validate_files(
+    patterns: list, workers: Optional[int] = None, cache_file: Optional[str] = None
+) -> list:
+    """Validate device configuration files.
+
+    Parameters
+    ----------
+    patterns : list
+        files, directories or glob patterns (see expand_paths)
+    workers : int, optional
+        number of worker processes, by default one per cpu
+    cache_file : str, optional
+        file with the cached results, no cache if None
+
+    Returns
+    -------
+    list
+        ValidationResult of each file in the order of expand_paths
+    """
+    paths = expand_paths(patterns)
+    fingerprint = _schema_fingerprint() if cache_file is not None else None
+    cache = _read_cache(cache_file, fingerprint) if cache_file is not None else {}
+
+    results = {}
+    checksums = {}
+    for path in paths:
+        try:
+            checksums[path] = _cache_key(path)
+        except OSError:
+            # not cached, load_config reports the missing file
+            continue
+
+        if checksums[path] in cache:
+            # move to the end, so it is dropped last
+            cache[checksums[path]] = cache.pop(checksums[path])
+            results[path] = ValidationResult(path, cache[checksums[path]], cached=True)
+
+    todo = [path for path in paths if path not in results]
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(todo) >= MIN_PARALLEL_FILES:
+        # imports multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = -(-len(todo) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(_validate_file, todo, chunksize=chunksize))
+    else:
+        errors = [_validate_file(path) for path in todo]
+
+    for path, error in zip(todo, errors, strict=True):
+        results[path] = ValidationResult(path, error)
+        if path in checksums:
+            cache[checksums[path]] = error
+
+    if cache_file is not None:
+        _write_cache(cache_file, fingerprint, cache)
+
+    return [results[path] for path in paths]
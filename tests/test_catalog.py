@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the precompiled device configuration catalog."""
+
+import os
+import shutil
+
+import pytest
+
+import revpi_provisioning.catalog
+from revpi_provisioning.catalog import (
+    DEVICES_DIR,
+    build_catalog,
+    lookup_config,
+    read_catalog,
+    write_catalog,
+)
+
+
+def test_catalog_up_to_date() -> None:
+    """Test that the shipped catalog matches the yaml device configurations."""
+    if read_catalog() != build_catalog():
+        pytest.fail(
+            "Catalog is out of date, rebuild it with: python3 -m revpi_provisioning.catalog"
+        )
+
+
+@pytest.mark.parametrize(
+    "product, config_name",
+    [
+        # the configuration without revision takes precedence like in load_config
+        ("PR100359R00", "PR100359"),
+        ("PR100359R01", "PR100359"),
+        ("PR100385R00", "PR100385"),
+        ("FE0365R00", "FE0365R00"),
+    ],
+)
+def test_lookup(tmp_path: object, product: str, config_name: str) -> None:
+    """Test that products are resolved like by the yaml configuration path."""
+    devices_dir = str(tmp_path)
+    for name in ("PR100359", "PR100359R00", "PR100385", "FE0365R00"):
+        shutil.copy(os.path.join(DEVICES_DIR, f"{name}.yaml"), devices_dir)
+
+    catalog = build_catalog(devices_dir)
+    write_catalog(catalog, devices_dir)
+
+    assert lookup_config(product, devices_dir) == catalog["devices"][config_name]["config"]
+
+
+def test_lookup_stale(tmp_path: object) -> None:
+    """Test that changed or added yaml files are not served from the catalog."""
+    devices_dir = str(tmp_path)
+    shutil.copy(os.path.join(DEVICES_DIR, "PR100385.yaml"), devices_dir)
+    write_catalog(build_catalog(devices_dir), devices_dir)
+
+    with open(os.path.join(devices_dir, "PR100385.yaml"), "a") as fh:
+        fh.write("\n")
+    assert lookup_config("PR100385R00", devices_dir) is None
+
+    shutil.copy(os.path.join(DEVICES_DIR, "PR100359.yaml"), devices_dir)
+    assert lookup_config("PR100359R00", devices_dir) is None
+
+
+def test_lookup_hashes_once(tmp_path: object, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a yaml file is only hashed again if its modification time or size changes."""
+    devices_dir = str(tmp_path)
+    shutil.copy(os.path.join(DEVICES_DIR, "PR100385.yaml"), devices_dir)
+    write_catalog(build_catalog(devices_dir), devices_dir)
+
+    hashed = []
+    sha256_file = revpi_provisioning.catalog._sha256_file
+    monkeypatch.setattr(
+        revpi_provisioning.catalog,
+        "_sha256_file",
+        lambda path: hashed.append(path) or sha256_file(path),
+    )
+
+    for _ in range(3):
+        assert lookup_config("PR100385R00", devices_dir) is not None
+        assert lookup_config("PR100385R01", devices_dir) is not None
+    assert len(hashed) == 1
+
+    # same content with another modification time is hashed and accepted again
+    os.utime(os.path.join(devices_dir, "PR100385.yaml"), ns=(0, 0))
+    assert lookup_config("PR100385R00", devices_dir) is not None
+    assert len(hashed) == 2
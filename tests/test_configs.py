@@ -4,6 +4,7 @@
 
 """Test the yaml device configuration files."""
 
+import functools
 import glob
 import os
 import re
@@ -17,6 +18,23 @@ from revpi_provisioning.config import EOLConfigException, load_config
 revpi_device_configs = sorted(glob.glob("revpi_provisioning/devices/*.yaml"))
 
 
+@functools.lru_cache(maxsize=None)
+def load(config: str) -> dict:
+    """Load and validate a configuration once for all tests.
+
+    Parameters
+    ----------
+    config : str
+        yaml configuration file
+
+    Returns
+    -------
+    dict
+        configuration
+    """
+    return load_config(config, absolute_path=True)
+
+
 def is_integer(value: object) -> bool:
     """Check if provided value is an integer.
 
@@ -103,7 +121,7 @@ class TestConfig:
             yaml configuration file
         """
         try:
-            load_config(config, absolute_path=True)
+            load(config)
         except EOLConfigException as ce:
             pytest.fail(f"Failed to validate device configuration file: {ce}", 1)
 
@@ -116,7 +134,7 @@ class TestConfig:
             yaml configuration file
         """
         try:
-            config = load_config(config, absolute_path=True)
+            config = load(config)
 
             if "network_interfaces" not in config:
                 pytest.fail("No network interfaces defined")
@@ -135,7 +153,7 @@ class TestConfig:
             yaml configuration file
         """
         try:
-            config = load_config(config, absolute_path=True)
+            config = load(config)
 
             if "hat_eeprom" not in config:
                 return
@@ -0,0 +1,23 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the job handling of the provisioning daemon."""
+
+from revpi_provisioning.daemon import JOBS, ProvisioningServer
+from revpi_provisioning.jobs import no_progress
+
+
+def test_run_job_reports_unexpected_errors(tmp_path: object) -> None:
+    """Test that a malformed job is reported as result instead of raising."""
+    server = ProvisioningServer(str(tmp_path / "provisioner.sock"))
+
+    try:
+        result = server.run_job(
+            JOBS["pipeline"], {"product": "PR100385R00", "operations": 42}, no_progress
+        )
+    finally:
+        server.server_close()
+
+    assert result["rc"] == 1
+    assert result["error"].startswith("Job failed: TypeError")
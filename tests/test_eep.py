@@ -0,0 +1,82 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the HAT eeprom image parser."""
+
+import pytest
+
+from revpi_provisioning.eep import (
+    ATOM_CUSTOM_DATA,
+    ATOM_VENDOR_INFO,
+    EEPImageException,
+    VendorInfo,
+    build_image,
+    crc16,
+    parse_image,
+)
+from revpi_provisioning.hat import HatEEPROM, HatEEPROMWriteException
+
+
+def product_image(product_id: int = 383, size: int = 0) -> bytes:
+    """Build an image with a vendor info atom and custom data of size bytes."""
+    vendor_info = VendorInfo(bytes(16), product_id, 0, "KUNBUS GmbH", "RevPi Connect 4")
+
+    return build_image([(ATOM_VENDOR_INFO, vendor_info.pack()), (ATOM_CUSTOM_DATA, b"\x5a" * size)])
+
+
+def test_crc16() -> None:
+    """Test the crc against the check value of CRC-16/ARC."""
+    assert crc16(b"123456789") == 0xBB3D
+
+
+def test_parse_image() -> None:
+    """Test that the atoms refer to the image buffer."""
+    image = bytearray(product_image(size=4) + b"\xff" * 20)
+    parsed = parse_image(image)
+
+    assert parsed.length == len(image) - 20
+    assert [atom.type for atom in parsed.atoms] == [ATOM_VENDOR_INFO, ATOM_CUSTOM_DATA]
+    assert parsed.vendor_info.product == "RevPi Connect 4"
+    assert parsed.atoms[1].data.obj is image
+    parsed.check_product("100383")
+
+    with pytest.raises(EEPImageException, match="not for product 100382"):
+        parsed.check_product("100382")
+
+
+@pytest.mark.parametrize(
+    "corrupt, message",
+    [
+        (lambda image: image[:-1], "truncated"),
+        (lambda image: b"R-Pj" + image[4:], "signature"),
+        (lambda image: image[:-3] + b"\x00" + image[-2:], "CRC mismatch of atom 1"),
+    ],
+)
+def test_invalid_image(corrupt: object, message: str) -> None:
+    """Test that truncated and corrupted images are rejected."""
+    with pytest.raises(EEPImageException, match=message):
+        parse_image(corrupt(product_image(size=4)))
+
+
+def test_write_rejects_image_before_write_protection(
+    tmp_path: object, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that invalid images are rejected before the write protection is disabled."""
+    eeprom = tmp_path / "eeprom"
+    eeprom.write_bytes(b"\xff" * 256)
+
+    hat_eeprom = HatEEPROM(2, base_eeprom=str(eeprom))
+    states = []
+    monkeypatch.setattr(hat_eeprom, "_load_dtoverlay", lambda: None)
+    monkeypatch.setattr(hat_eeprom, "_write_protect", states.append)
+
+    with pytest.raises(HatEEPROMWriteException, match="too big"):
+        hat_eeprom.write(product_image(size=256), product_id="100383")
+    with pytest.raises(HatEEPROMWriteException, match="not for product"):
+        hat_eeprom.write(product_image(), product_id="100384")
+    assert states == []
+
+    hat_eeprom.write(product_image(), product_id="100383")
+    assert states == [False, True]
+    assert eeprom.read_bytes().startswith(product_image())
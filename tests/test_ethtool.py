@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the ethtool eeprom backend with a fake eeprom transport."""
+
+import errno
+
+import pytest
+
+import revpi_provisioning.network.usb
+
+from revpi_provisioning.network import NetworkEEPROMException
+from revpi_provisioning.network.ethtool import (
+    LAN78XX_EEPROM_MAGIC,
+    EthtoolTransport,
+    write_mac_address,
+)
+from revpi_provisioning.network.usb import LAN78XXNetworkInterface
+
+
+class FakeTransport(EthtoolTransport):
+    """Eeprom in memory which records all writes."""
+
+    def __init__(self, content: bytes, magic: int = LAN78XX_EEPROM_MAGIC) -> None:
+        self.content = bytearray(content)
+        self.magic = magic
+        self.writes = []
+
+    def read(self, interface_name: str, offset: int, length: int) -> bytes:
+        """Read from the eeprom."""
+        return bytes(self.content[offset : offset + length])
+
+    def write(self, interface_name: str, magic: int, offset: int, data: bytes) -> None:
+        """Write to the eeprom, if the magic is right."""
+        if magic != self.magic:
+            raise OSError(errno.EINVAL, "Invalid argument")
+
+        self.writes.append((offset, bytes(data)))
+        self.content[offset : offset + len(data)] = data
+
+
+class UnsupportedTransport(FakeTransport):
+    """Eeprom of a driver without ethtool eeprom support."""
+
+    def read(self, interface_name: str, offset: int, length: int) -> bytes:
+        """Fail like a driver without get_eeprom."""
+        raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+
+def test_write_changed_bytes_only() -> None:
+    """Test that only the ranges of changed bytes are written."""
+    transport = FakeTransport(bytes.fromhex("a5c83ea7000001") + b"\xff" * 9)
+
+    written = write_mac_address(transport, "eth0", LAN78XX_EEPROM_MAGIC, "c8:3e:a7:01:00:02")
+
+    assert written == 2
+    assert transport.writes == [(4, b"\x01"), (6, b"\x02")]
+    assert transport.content[:7] == bytes.fromhex("a5c83ea7010002")
+
+    assert write_mac_address(transport, "eth0", LAN78XX_EEPROM_MAGIC, "c83ea7010002") == 0
+
+
+def test_write_verification() -> None:
+    """Test that a write which does not end up in the eeprom is reported."""
+
+    class ReadOnlyTransport(FakeTransport):
+        def write(self, interface_name: str, magic: int, offset: int, data: bytes) -> None:
+            pass
+
+    with pytest.raises(NetworkEEPROMException):
+        write_mac_address(
+            ReadOnlyTransport(b"\xff" * 16), "eth0", LAN78XX_EEPROM_MAGIC, "c83ea7000001"
+        )
+
+
+def test_fallback_to_eeprom_tool(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the eeprom tool is used if the driver rejects the ethtool access."""
+    commands = []
+    monkeypatch.setattr(revpi_provisioning.network.usb, "run_tool", commands.append)
+
+    interface = LAN78XXNetworkInterface("1-1.1:1.0", True)
+    interface.eeprom_backend = "ethtool"
+    interface.ethtool_transport = UnsupportedTransport(b"\xff" * 16)
+    monkeypatch.setattr(interface, "_find_interface_name", lambda bus: "eth0")
+
+    interface.set_mac_address("c83ea7000001")
+    assert commands == [["/usr/sbin/lan78xx-set-mac", "eth0", "c83ea7000001"]]
+
+    interface.ethtool_transport = FakeTransport(b"\xff" * 16)
+    interface.set_mac_address("c83ea7000002")
+    assert len(commands) == 1
+    assert interface.ethtool_transport.content[:7] == bytes.fromhex("a5c83ea7000002")
+
+
+def test_partial_write_is_not_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a failed write is reported instead of falling back to the eeprom tool."""
+    commands = []
+    monkeypatch.setattr(revpi_provisioning.network.usb, "run_tool", commands.append)
+
+    interface = LAN78XXNetworkInterface("1-1.1:1.0", True)
+    interface.eeprom_backend = "ethtool"
+    # the magic is rejected by the driver with EINVAL on the first write
+    interface.ethtool_transport = FakeTransport(bytes.fromhex("a5c83ea70000ff") + b"\xff" * 9, 0)
+    monkeypatch.setattr(interface, "_find_interface_name", lambda bus: "eth0")
+
+    with pytest.raises(NetworkEEPROMException, match="after 0 bytes"):
+        interface.set_mac_address("c83ea7000100")
+
+    class FailingTransport(FakeTransport):
+        def write(self, interface_name: str, magic: int, offset: int, data: bytes) -> None:
+            if self.writes:
+                raise OSError(errno.EIO, "Input/output error")
+            super().write(interface_name, magic, offset, data)
+
+    # two ranges differ, the second write fails
+    interface.ethtool_transport = FailingTransport(bytes.fromhex("a5c83ea70000ff") + b"\xff" * 9)
+    with pytest.raises(NetworkEEPROMException, match="after 1 bytes"):
+        interface.set_mac_address("c83ea7010001")
+
+    assert commands == []
+    assert interface.written_mac_address is None
@@ -0,0 +1,342 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the HAT eeprom handling against a fake sysfs eeprom node."""
+
+import os
+import threading
+
+import pytest
+
+from revpi_provisioning.hat import (
+    ConfigfsOverlayManager,
+    DtoverlayOverlayManager,
+    HatEEPROM,
+    HatEEPROMWriteException,
+    find_overlay_manager,
+)
+from revpi_provisioning.timing import TimingRecorder, recording
+
+EEPROM_SIZE = 4096
+
+
+@pytest.fixture
+def eeprom(tmp_path: object) -> str:
+    """Create a fake at24 eeprom node filled with 0xff.
+
+    Parameters
+    ----------
+    tmp_path : object
+        temporary directory of the test
+
+    Returns
+    -------
+    str
+        path to the fake eeprom node
+    """
+    device = tmp_path / "1-0050"
+    device.mkdir()
+
+    eeprom_path = device / "eeprom"
+    eeprom_path.write_bytes(b"\xff" * EEPROM_SIZE)
+
+    return str(eeprom_path)
+
+
+@pytest.fixture
+def pwrites(monkeypatch: pytest.MonkeyPatch) -> list:
+    """Record offsets of all pwrite calls.
+
+    Parameters
+    ----------
+    monkeypatch : pytest.MonkeyPatch
+        pytest monkeypatch fixture
+
+    Returns
+    -------
+    list
+        offsets of the pwrite calls
+    """
+    offsets = []
+    pwrite = os.pwrite
+
+    def recording_pwrite(fd: int, data: bytes, offset: int) -> int:
+        offsets.append(offset)
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", recording_pwrite)
+
+    return offsets
+
+
+def test_page_size_from_device_tree(eeprom: str) -> None:
+    """Test that the page size of the device tree node is preferred."""
+    of_node = os.path.join(os.path.dirname(eeprom), "of_node")
+    os.mkdir(of_node)
+    with open(os.path.join(of_node, "pagesize"), "wb") as fh:
+        fh.write((64).to_bytes(4, "big"))
+
+    assert HatEEPROM(2, base_eeprom=eeprom).page_size == 64
+
+
+def test_page_size_from_eeprom_size(eeprom: str) -> None:
+    """Test the page size fallback for eeproms without device tree property."""
+    assert HatEEPROM(2, base_eeprom=eeprom).page_size == 32
+
+
+def test_delta_write_skips_unchanged_pages(eeprom: str, pwrites: list) -> None:
+    """Test that only pages which differ are written."""
+    image = bytearray(b"\xff" * 256)
+    image[40] = 0x00
+    image[200] = 0x00
+
+    skipped_pages = HatEEPROM(2, base_eeprom=eeprom)._write_image(bytes(image))
+
+    assert pwrites == [32, 192]
+    assert skipped_pages == 6
+
+    with open(eeprom, "rb") as fh:
+        assert fh.read(len(image)) == image
+
+
+def test_full_write(eeprom: str, pwrites: list) -> None:
+    """Test that all pages are written if delta writes are disabled."""
+    skipped_pages = HatEEPROM(2, base_eeprom=eeprom, delta_write=False)._write_image(b"\xff" * 100)
+
+    assert pwrites == [0, 32, 64, 96]
+    assert skipped_pages == 0
+
+
+def test_verify_image(eeprom: str) -> None:
+    """Test that a matching image is verified successfully."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=eeprom)
+
+    hat_eeprom._write_image(bytes(range(200)))
+    hat_eeprom._verify_image(bytes(range(200)))
+
+
+def test_verify_image_reports_first_mismatch(eeprom: str) -> None:
+    """Test that the verification stops at the first differing page."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=eeprom)
+    image = bytearray(b"\x00" * 200)
+
+    hat_eeprom._write_image(bytes(image))
+    image[70] = 0x12
+    image[150] = 0x34
+
+    with pytest.raises(HatEEPROMWriteException, match=r"offset 0x0040.*0x0046: 0x00 != 0x12$"):
+        hat_eeprom._verify_image(bytes(image))
+
+
+def test_resume_interrupted_write(
+    eeprom: str, tmp_path: object, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a retry of the same image continues at the last verified block."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=eeprom, checkpoint=str(tmp_path / "checkpoint"))
+    image = bytes(range(256)) * 3
+    pwrite = os.pwrite
+
+    def failing_pwrite(fd: int, data: bytes, offset: int) -> int:
+        if offset >= 512:
+            raise OSError(5, "Input/output error")
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", failing_pwrite)
+    with pytest.raises(HatEEPROMWriteException, match="Input/output error"):
+        hat_eeprom._write_image(image)
+
+    (reads, writes) = ([], [])
+    pread = os.pread
+
+    def counting_pread(fd: int, length: int, offset: int) -> bytes:
+        reads.append((offset, length))
+        return pread(fd, length, offset)
+
+    def counting_pwrite(fd: int, data: bytes, offset: int) -> int:
+        writes.append((offset, len(data)))
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", counting_pwrite)
+    monkeypatch.setattr(os, "pread", counting_pread)
+    progress = []
+    skipped_pages = hat_eeprom._write_image(image, progress=lambda *args: progress.append(args))
+
+    # blocks of 8 pages with 32 bytes each, the verified blocks are not touched again
+    assert progress == [(512, 768), (768, 768)]
+    assert skipped_pages == 0
+    assert min(offset for (offset, _) in writes) == 512
+    assert sum(length for (_, length) in writes) == 256
+    # last verified page, pre-read and read back of the remaining block
+    assert reads == [(480, 32), (512, 256), (512, 256)]
+    assert not (tmp_path / "checkpoint").exists()
+    hat_eeprom._verify_image(image)
+
+
+def test_checkpoint_of_replaced_device(
+    eeprom: str, tmp_path: object, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the write starts over on another device."""
+    hat_eeprom = HatEEPROM(
+        2, base_eeprom=eeprom, delta_write=False, checkpoint=str(tmp_path / "checkpoint")
+    )
+    image = bytes(range(256)) * 3
+    pwrite = os.pwrite
+
+    def failing_pwrite(fd: int, data: bytes, offset: int) -> int:
+        if offset >= 512:
+            raise OSError(5, "Input/output error")
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", failing_pwrite)
+    with pytest.raises(HatEEPROMWriteException):
+        hat_eeprom._write_image(image)
+    assert (tmp_path / "checkpoint").exists()
+
+    # blank device at the same eeprom path
+    monkeypatch.setattr(os, "pwrite", pwrite)
+    with open(eeprom, "wb") as fh:
+        fh.write(b"\xff" * EEPROM_SIZE)
+
+    assert hat_eeprom._write_image(image) == 0
+    hat_eeprom._verify_image(image)
+    assert not (tmp_path / "checkpoint").exists()
+
+
+def test_read_amplification(eeprom: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that only the compared and the written pages are read."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=eeprom)
+    monkeypatch.setattr(hat_eeprom, "_load_dtoverlay", lambda: None)
+    monkeypatch.setattr(hat_eeprom, "_check_image", lambda data, product_id: None)
+    monkeypatch.setattr(hat_eeprom, "_write_protect", lambda state: None)
+    image = bytes(range(256)) * 4
+    read = []
+    pread = os.pread
+
+    def counting_pread(fd: int, length: int, offset: int) -> bytes:
+        data = pread(fd, length, offset)
+        read.append(len(data))
+        return data
+
+    monkeypatch.setattr(os, "pread", counting_pread)
+
+    # compared once and each written page read back once
+    with recording(TimingRecorder()) as recorder:
+        hat_eeprom.write(image)
+    assert sum(read) == 2 * len(image)
+    assert [entry["name"] for entry in recorder.phases].count("hat_verify") == 4
+
+    read.clear()
+    hat_eeprom.write(image)
+    assert sum(read) == len(image)
+
+
+def test_cancelled_write_restores_write_protection(
+    eeprom: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a cancelled write stops after the current block and enables write protection."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=eeprom)
+    states = []
+    cancelled = threading.Event()
+    monkeypatch.setattr(hat_eeprom, "_load_dtoverlay", lambda: None)
+    monkeypatch.setattr(hat_eeprom, "_check_image", lambda data, product_id: None)
+    monkeypatch.setattr(hat_eeprom, "_write_protect", states.append)
+
+    with pytest.raises(HatEEPROMWriteException, match="cancelled at offset 256"):
+        hat_eeprom.write(
+            bytes(range(256)) * 3,
+            progress=lambda offset, length: offset and cancelled.set(),
+            cancelled=cancelled,
+        )
+
+    assert states == [False, True]
+
+
+@pytest.fixture
+def configfs(tmp_path: object) -> ConfigfsOverlayManager:
+    """Create a fake configfs overlay tree with one applied overlay.
+
+    Parameters
+    ----------
+    tmp_path : object
+        temporary directory of the test
+
+    Returns
+    -------
+    ConfigfsOverlayManager
+        overlay manager for the fake tree
+    """
+    root = tmp_path / "overlays"
+    (root / "0_w1-gpio").mkdir(parents=True)
+    (root / "0_w1-gpio" / "status").write_text("applied\n")
+
+    overlay_dir = tmp_path / "boot"
+    overlay_dir.mkdir()
+    (overlay_dir / "revpi-hat-eeprom.dtbo").write_bytes(b"\xd0\x0d\xfe\xed")
+
+    return ConfigfsOverlayManager(str(root), [str(tmp_path / "missing"), str(overlay_dir)])
+
+
+def test_configfs_load_overlay(configfs: ConfigfsOverlayManager) -> None:
+    """Test loading an overlay through configfs."""
+    assert configfs.loaded_overlays() == ["w1-gpio"]
+
+    configfs.load("revpi-hat-eeprom")
+
+    with open(os.path.join(configfs.root, "1_revpi-hat-eeprom", "dtbo"), "rb") as fh:
+        assert fh.read() == b"\xd0\x0d\xfe\xed"
+    assert configfs.loaded_overlays() == ["w1-gpio", "revpi-hat-eeprom"]
+
+
+def test_configfs_missing_overlay(configfs: ConfigfsOverlayManager) -> None:
+    """Test that loading an unknown overlay fails."""
+    with pytest.raises(HatEEPROMWriteException, match="not found"):
+        configfs.load("unknown")
+
+
+def test_configfs_failed_overlay(
+    configfs: ConfigfsOverlayManager, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that an overlay which is not applied is reported, even if it cannot be removed."""
+
+    def rmdir(path: str) -> None:
+        raise OSError(16, "Device or resource busy")
+
+    monkeypatch.setattr(configfs, "_status", lambda directory: "failed")
+    monkeypatch.setattr(os, "rmdir", rmdir)
+
+    with pytest.raises(HatEEPROMWriteException, match="status failed"):
+        configfs.load("revpi-hat-eeprom")
+
+
+def test_find_overlay_manager(configfs: ConfigfsOverlayManager) -> None:
+    """Test that dtoverlay is used for overlays outside of the configfs search path."""
+    manager = find_overlay_manager(configfs.root, "revpi-hat-eeprom", configfs.overlay_dirs)
+    assert isinstance(manager, ConfigfsOverlayManager)
+
+    manager = find_overlay_manager(configfs.root, "unknown", configfs.overlay_dirs)
+    assert isinstance(manager, DtoverlayOverlayManager)
+
+
+def test_dtoverlay_loaded_overlays(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test parsing the overlay list of dtoverlay."""
+    output = b"Overlays (in load order):\n0:  w1-gpio\n1:  revpi-hat-eeprom:addr=0x50\n"
+    monkeypatch.setattr("revpi_provisioning.hat.run_tool", lambda cmd: output)
+
+    assert DtoverlayOverlayManager().loaded_overlays() == [
+        "w1-gpio",
+        "revpi-hat-eeprom:addr=0x50",
+    ]
+
+
+def test_wait_for_eeprom(eeprom: str) -> None:
+    """Test that an existing eeprom node is ready immediately."""
+    assert HatEEPROM(2, base_eeprom=eeprom)._wait_for_eeprom(timeout=1.0) < 1.0
+
+
+def test_wait_for_eeprom_timeout(tmp_path: object) -> None:
+    """Test that waiting for a missing eeprom node fails after the timeout."""
+    hat_eeprom = HatEEPROM(2, base_eeprom=str(tmp_path / "?-0050" / "eeprom"))
+
+    with pytest.raises(HatEEPROMWriteException, match="did not appear within 0.1 s"):
+        hat_eeprom._wait_for_eeprom(timeout=0.1)
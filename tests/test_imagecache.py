@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the local image cache."""
+
+import hashlib
+import os
+
+from revpi_provisioning.imagecache import ImageCache
+
+
+def test_unchanged_source_is_not_read(tmp_path: object) -> None:
+    """Test that an image with unchanged size and modification time is taken from the cache."""
+    source = tmp_path / "share" / "hat.eep"
+    source.parent.mkdir()
+    source.write_bytes(b"image 1")
+    cache_dir = tmp_path / "cache"
+
+    (content, digest) = ImageCache(str(cache_dir)).load(str(source))
+    assert (content, digest) == (b"image 1", hashlib.sha256(b"image 1").hexdigest())
+    assert (cache_dir / f"{digest}.eep").read_bytes() == b"image 1"
+
+    # same size and modification time: the source is not read again
+    stat = source.stat()
+    source.write_bytes(b"image 2")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert ImageCache(str(cache_dir)).read(str(source)) == b"image 1"
+
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert ImageCache(str(cache_dir)).read(str(source)) == b"image 2"
+
+
+def test_lru_eviction(tmp_path: object) -> None:
+    """Test that the least recently used images are evicted first."""
+    sources = []
+    for index in range(3):
+        sources.append(tmp_path / f"{index}.eep")
+        sources[-1].write_bytes(bytes([index]) * 100)
+
+    cache = ImageCache(str(tmp_path / "cache"), max_size=250)
+    for source in (sources[0], sources[1], sources[0], sources[2]):
+        ImageCache(cache.directory, max_size=250).load(str(source))
+
+    assert [entry["sources"] for entry in cache.entries()] == [
+        [str(sources[2])],
+        [str(sources[0])],
+    ]
+
+    (tmp_path / "cache" / "orphan.eep").write_bytes(b"")
+    removed = cache.prune(max_size=100)
+    assert removed == [hashlib.sha256(bytes([0]) * 100).hexdigest()]
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        [f"{hashlib.sha256(bytes([2]) * 100).hexdigest()}.eep", "index.json", "index.json.lock"]
+    )
+
+
+def test_verify(tmp_path: object) -> None:
+    """Test that damaged copies are removed and read from the source again."""
+    source = tmp_path / "hat.eep"
+    source.write_bytes(b"image")
+    cache = ImageCache(str(tmp_path / "cache"))
+    (_, digest) = cache.load(str(source))
+
+    (tmp_path / "cache" / f"{digest}.eep").write_bytes(b"damag")
+    assert cache.verify() == [digest]
+    assert cache.entries() == []
+    assert ImageCache(cache.directory).read(str(source)) == b"image"
@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the cold start import cost of the console scripts.
+
+The import time budget only covers the modules of this package, the standard library
+and third party modules are kept out by the lazy import checks. The best of some runs
+is taken, so the budget holds on loaded machines.
+"""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Maximum summed self import time of the revpi_provisioning modules of a console script
+# in microseconds, about three times the time of a development machine
+PACKAGE_IMPORT_TIME_BUDGET_US = 75_000
+# Number of runs of which the fastest one is compared with the budget
+IMPORT_TIME_RUNS = 5
+# Heavy modules which must only be imported by the code paths which need them
+LAZY_MODULES = ["asyncio", "gpiod", "multiprocessing", "schema", "yaml"]
+# Modules which console scripts must not import at all, because they do not use them
+UNUSED_MODULES = {"revpi_provisioning.cli.image_cache": ["revpi_provisioning.jobs"]}
+
+
+def console_script_modules() -> list:
+    """Read the modules of the console scripts from pyproject.toml.
+
+    Returns
+    -------
+    list
+        module names of the console scripts
+    """
+    with open("pyproject.toml", "r") as fh:
+        pyproject = fh.read()
+
+    scripts = pyproject.split("[project.scripts]")[1].split("\n[")[0]
+
+    return sorted(set(re.findall(r'^\S+\s*=\s*"([\w.]+):\w+"', scripts, re.MULTILINE)))
+
+
+def package_import_time(module: str) -> int:
+    """Measure the self import time of the package modules in a fresh interpreter.
+
+    Parameters
+    ----------
+    module : str
+        module name
+
+    Returns
+    -------
+    int
+        summed self import time of the revpi_provisioning modules in microseconds
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    total = 0
+    for line in process.stderr.splitlines():
+        (self_time, _, name) = line.partition(":")[2].split("|")
+        if name.strip().startswith("revpi_provisioning"):
+            total += int(self_time)
+
+    return total
+
+
+@pytest.mark.parametrize("module", console_script_modules())
+def test_import_time(module: str) -> None:
+    """Test that importing a console script stays within the import time budget."""
+    best = min(package_import_time(module) for _ in range(IMPORT_TIME_RUNS))
+
+    if best > PACKAGE_IMPORT_TIME_BUDGET_US:
+        pytest.fail(
+            f"Importing the package modules of {module} took {best} us "
+            + f"(budget: {PACKAGE_IMPORT_TIME_BUDGET_US} us)"
+        )
+
+
+@pytest.mark.parametrize("module", console_script_modules())
+def test_lazy_imports(module: str) -> None:
+    """Test that heavy modules are not imported on startup."""
+    lazy = LAZY_MODULES + UNUSED_MODULES.get(module, [])
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(m for m in {lazy} if m in sys.modules))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    assert process.stdout.split() == []
@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the hardware inventory against a fake sysfs tree."""
+
+import glob
+import threading
+
+import pytest
+
+import revpi_provisioning.inventory as inventory
+import revpi_provisioning.network.utils as network_utils
+from revpi_provisioning.hat import HatEEPROM
+from revpi_provisioning.inventory import NET_DEVICES, HardwareInventory
+from revpi_provisioning.network.usb import LAN95XXNetworkInterface
+from revpi_provisioning.network.utils import NetworkInterfaceNotFoundException
+
+
+@pytest.fixture
+def sysfs(tmp_path: object, monkeypatch: pytest.MonkeyPatch) -> object:
+    """Create a fake sysfs bus tree with two usb net devices and an eeprom node."""
+    bus = tmp_path / "bus"
+    for device, name in (("1-1.1:1.0", "eth0"), ("1-1.4:1.0", "eth1")):
+        (bus / "usb" / "devices" / device / "net" / name).mkdir(parents=True)
+
+    eeprom = bus / "i2c" / "devices" / "1-0050"
+    eeprom.mkdir(parents=True)
+    (eeprom / "eeprom").write_bytes(b"\xff" * 256)
+
+    monkeypatch.setattr(network_utils, "SYSFS_BUS", str(bus))
+
+    return bus
+
+
+@pytest.fixture
+def globs(monkeypatch: pytest.MonkeyPatch) -> list:
+    """Record the patterns of all glob calls of the inventory."""
+    patterns = []
+    original = glob.glob
+
+    def recording_glob(pattern: str) -> list:
+        patterns.append(pattern)
+        return original(pattern)
+
+    monkeypatch.setattr(inventory.glob, "glob", recording_glob)
+
+    return patterns
+
+
+def test_net_devices_are_scanned_once(sysfs: object, globs: list) -> None:
+    """Test that interfaces on the same bus share one scan until it is invalidated."""
+    hardware = HardwareInventory()
+    interfaces = [
+        LAN95XXNetworkInterface("1-1.1:1.0", True, inventory=hardware),
+        LAN95XXNetworkInterface("1-1.4:1.0", True, inventory=hardware),
+    ]
+
+    assert [hardware.ethernet_device_name("usb", i.path) for i in interfaces] == ["eth0", "eth1"]
+    assert len(globs) == 1
+
+    with pytest.raises(NetworkInterfaceNotFoundException):
+        hardware.ethernet_device_name("usb", "2-3:1.0")
+
+    # interface appears, e.g. after rebinding the driver
+    (sysfs / "usb" / "devices" / "2-3:1.0" / "net" / "eth2").mkdir(parents=True)
+    hardware.invalidate(NET_DEVICES)
+
+    assert hardware.ethernet_device_name("usb", "2-3:1.0") == "eth2"
+    assert len(globs) == 2
+
+
+def test_hat_eeprom_node(sysfs: object, globs: list) -> None:
+    """Test that the HAT eeprom node is looked up once with its size."""
+    pattern = str(sysfs / "i2c" / "devices" / "?-0050" / "eeprom")
+    hat_eeprom = HatEEPROM(2, base_eeprom=pattern)
+
+    assert hat_eeprom.base_eeprom.endswith("1-0050/eeprom")
+    assert hat_eeprom.eeprom_node.size == 256
+    # page size for 256 byte eeproms (see AT24_PAGE_SIZES)
+    assert hat_eeprom.page_size == 16
+    assert globs == [pattern]
+
+
+def test_wait_for_ethernet_device(sysfs: object) -> None:
+    """Test that the inventory waits for an interface which is enumerated late."""
+    hardware = HardwareInventory()
+    timer = threading.Timer(
+        0.05, lambda: (sysfs / "usb" / "devices" / "2-3:1.0" / "net" / "eth2").mkdir(parents=True)
+    )
+    timer.start()
+
+    try:
+        (name, waited) = hardware.wait_for_ethernet_device("usb", "2-3:1.0", timeout=5.0)
+    finally:
+        timer.cancel()
+
+    assert name == "eth2"
+    assert 0.05 <= waited < 5.0
+
+    with pytest.raises(NetworkInterfaceNotFoundException, match="not enumerated within"):
+        hardware.wait_for_ethernet_device("usb", "2-4:1.0", timeout=0.05)
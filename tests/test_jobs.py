@@ -0,0 +1,98 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the provisioning jobs with a fake device."""
+
+import pytest
+
+from revpi_provisioning.jobs import JobException, Session, provision
+from revpi_provisioning.ledger import MacAddressConflictException, MacLedger
+from revpi_provisioning.network import NetworkEEPROMException, NetworkInterface
+from revpi_provisioning.revpi import RevPi
+from revpi_provisioning.utils import MacAddress, MacRange
+
+PRODUCT = "PR100385R00"
+
+
+class FakeNetworkInterface(NetworkInterface):
+    """Network interface which fails to write its eeprom if requested."""
+
+    def __init__(self, path: str, fail: bool = False) -> None:
+        super().__init__(path, has_eeprom=True)
+
+        self.fail = fail
+
+    def _write_eeprom(self, mac_address: str) -> None:
+        if self.fail:
+            raise NetworkEEPROMException(f"failed to write {mac_address}")
+
+
+def _session(revpi: RevPi) -> Session:
+    session = Session()
+    session._configurations[PRODUCT] = {"network_interfaces": []}
+    session._revpis[PRODUCT] = revpi
+
+    return session
+
+
+def test_unknown_hat_error_marks_written_mac_addresses(tmp_path: object) -> None:
+    """Test that an unexpected HAT error is mapped to rc 3 and the ledger is updated."""
+
+    def fail(*args: object, **kwargs: object) -> int:
+        raise OSError("gpio busy")
+
+    revpi = RevPi("100385", "00")
+    revpi.network_interfaces = [FakeNetworkInterface("1-1.1:1.0"), FakeNetworkInterface("1-1.4")]
+    revpi.write_hat_eeprom = fail
+
+    with pytest.raises(JobException) as exc_info:
+        provision(_session(revpi), PRODUCT, "c8:3e:a7:00:00:01", None, mac_ledger=str(tmp_path))
+
+    assert exc_info.value.rc == 3
+    assert "gpio busy" in str(exc_info.value)
+    with pytest.raises(MacAddressConflictException) as conflict_info:
+        MacLedger(str(tmp_path)).check(MacRange("c8:3e:a7:00:00:01", 2))
+    assert len(conflict_info.value.addresses) == 2
+
+
+def test_partial_mac_failure_marks_written_mac_addresses(tmp_path: object) -> None:
+    """Test that only the mac addresses which have been written are added to the ledger."""
+    revpi = RevPi("100385", "00")
+    revpi.network_interfaces = [
+        FakeNetworkInterface("1-1.1:1.0"),
+        FakeNetworkInterface("1-1.4", fail=True),
+        FakeNetworkInterface("0001:03:00.0"),
+    ]
+
+    with pytest.raises(JobException) as exc_info:
+        provision(
+            _session(revpi),
+            PRODUCT,
+            "c8:3e:a7:00:00:01",
+            None,
+            parallel=True,
+            mac_ledger=str(tmp_path),
+        )
+
+    assert exc_info.value.rc == 4
+    with pytest.raises(MacAddressConflictException) as conflict_info:
+        MacLedger(str(tmp_path)).check(MacRange("c8:3e:a7:00:00:01", 3))
+    assert conflict_info.value.addresses == [
+        MacAddress("c83ea7000001"),
+        MacAddress("c83ea7000003"),
+    ]
+
+
+def test_preloaded_configuration_without_revision(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a preloaded file without revision serves all revisions of the product."""
+    session = Session()
+    assert session.preload() > 0
+
+    def fail(name: str) -> dict:
+        raise AssertionError(f"{name} was loaded again")
+
+    monkeypatch.setattr("revpi_provisioning.jobs.load_config", fail)
+
+    assert session.configuration("PR100385R01") is session._preloaded["PR100385"]
+    assert session.configuration("PR100333R01") is session._preloaded["PR100333R01"]
@@ -0,0 +1,46 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the mac address ledger."""
+
+import os
+
+import pytest
+
+from revpi_provisioning.ledger import BITMAP_SIZE, MacAddressConflictException, MacLedger
+from revpi_provisioning.utils import MacAddress, MacRange
+
+
+def test_check_and_mark(tmp_path: object) -> None:
+    """Test that marked addresses are refused and others are accepted."""
+    ledger = MacLedger(str(tmp_path / "ledger"))
+    ledger.check(MacRange("c8:3e:a7:00:00:fe", 4))
+    ledger.mark(MacRange("c8:3e:a7:00:00:fe", 4))
+
+    assert os.path.getsize(tmp_path / "ledger" / "c83ea7.bitmap") == BITMAP_SIZE
+
+    with pytest.raises(MacAddressConflictException) as exc_info:
+        ledger.check(MacRange("c8:3e:a7:00:01:01", 2))
+    assert exc_info.value.addresses == [MacAddress("c83ea7000101")]
+
+    ledger.check(MacRange("c8:3e:a7:00:01:02", 2))
+    ledger.check(MacRange("c8:3e:a8:00:00:fe", 4))
+
+    with pytest.raises(MacAddressConflictException):
+        ledger.mark(MacRange("c8:3e:a7:00:00:fd", 2))
+    ledger.check(MacRange("c8:3e:a7:00:00:fc", 1))
+    with pytest.raises(MacAddressConflictException):
+        ledger.check(MacRange("c8:3e:a7:00:00:fd", 1))
+
+
+def test_range_across_ouis(tmp_path: object) -> None:
+    """Test that a range which crosses an OUI boundary is stored in both bitmaps."""
+    ledger = MacLedger(str(tmp_path))
+    ledger.mark(MacRange("c8:3e:a7:ff:ff:ff", 2))
+
+    assert sorted(os.listdir(tmp_path)) == ["c83ea7.bitmap", "c83ea8.bitmap"]
+    assert ledger.used(MacRange("c8:3e:a7:ff:ff:fe", 4)) == [
+        MacAddress("c83ea7ffffff"),
+        MacAddress("c83ea8000000"),
+    ]
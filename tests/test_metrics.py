@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the metrics file for the textfile collector."""
+
+import os
+
+from revpi_provisioning.metrics import Metrics, update_metrics_file
+
+
+def timing_report(rc: int, duration: float) -> dict:
+    """Build a timing report with a HAT write and a mac write."""
+    return {
+        "product": "PR100359R00",
+        "rc": rc,
+        "start": 0.0,
+        "end": duration,
+        "duration": duration,
+        "phases": [
+            {"name": "hat_write", "start": 0.0, "end": 0.2, "duration": 0.2, "ok": True},
+            {"name": "hat_verify", "start": 0.05, "end": 0.1, "duration": 0.05, "ok": True},
+            {"name": "hat_verify", "start": 0.15, "end": 0.2, "duration": 0.05, "ok": True},
+            {
+                "name": "mac_write",
+                "start": 0.2,
+                "end": 0.3,
+                "duration": 0.1,
+                "ok": rc == 0,
+                "interface": "1-1.1:1.0",
+                "interface_type": "LAN95XXNetworkInterface",
+            },
+        ],
+    }
+
+
+def read_samples(path: str) -> dict:
+    """Parse the metrics file into samples."""
+    metrics = Metrics()
+    with open(path, "r") as fh:
+        metrics.parse(fh.read())
+
+    return {(name, labels): value for (name, labels), value in metrics.samples.items()}
+
+
+def test_update_metrics_file(tmp_path: str) -> None:
+    """Test that the metrics file is updated incrementally from its content."""
+    path = str(tmp_path / "revpi_eol.prom")
+
+    update_metrics_file(path, "provision", timing_report(0, 0.4))
+    update_metrics_file(path, "provision", timing_report(4, 3.0))
+
+    samples = read_samples(path)
+    command = (("command", "provision"),)
+
+    assert samples[("revpi_eol_runs_total", command)] == 2
+    assert samples[("revpi_eol_run_duration_seconds_count", command)] == 2
+    assert samples[("revpi_eol_run_duration_seconds_sum", command)] == 3.4
+    assert samples[("revpi_eol_run_duration_seconds_bucket", command + (("le", "0.5"),))] == 1
+    assert samples[("revpi_eol_run_duration_seconds_bucket", command + (("le", "+Inf"),))] == 2
+    assert (
+        samples[
+            (
+                "revpi_eol_failures_total",
+                (("command", "provision"), ("product", "PR100359R00"), ("rc", "4")),
+            )
+        ]
+        == 1
+    )
+    assert samples[("revpi_eol_step_duration_seconds_count", (("step", "hat_write"),))] == 2
+    # the verification of the blocks is observed once per run
+    assert samples[("revpi_eol_step_duration_seconds_count", (("step", "hat_verify"),))] == 2
+    assert samples[("revpi_eol_step_duration_seconds_sum", (("step", "hat_verify"),))] == 0.2
+
+    # failed mac writes are not observed
+    assert (
+        samples[("revpi_eol_mac_write_duration_seconds_count", (("interface_type", "lan95xx"),))]
+        == 1
+    )
+
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ["revpi_eol.prom", "revpi_eol.prom.lock"]
+
+
+def test_render_histogram_bucket_order() -> None:
+    """Test that buckets are ordered by their bound and the file has type information."""
+    metrics = Metrics()
+    metrics.observe("revpi_eol_step_duration_seconds", {"step": "hat_verify"}, 0.03)
+
+    lines = metrics.render().splitlines()
+    bounds = [line.split('le="')[1].split('"')[0] for line in lines if "_bucket" in line]
+
+    assert lines[1] == "# TYPE revpi_eol_step_duration_seconds histogram"
+    assert bounds[:3] == ["0.01", "0.025", "0.05"]
+    assert bounds[-1] == "+Inf"
+    assert 'revpi_eol_step_duration_seconds_bucket{step="hat_verify",le="0.05"} 1' in lines
+    assert 'revpi_eol_step_duration_seconds_bucket{step="hat_verify",le="0.025"} 0' in lines
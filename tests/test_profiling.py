@@ -0,0 +1,51 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the built-in profiling hooks."""
+
+import json
+import pstats
+import threading
+
+import pytest
+
+from revpi_provisioning.profiling import PROFILE_ENV, ProfilingException, profiling
+from revpi_provisioning.timing import phase
+
+
+def test_profiling_hooks(tmp_path: object, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the hooks of the CLI and of the environment write their results."""
+    monkeypatch.setenv(PROFILE_ENV, f"tracemalloc:{tmp_path / 'memory.json'}")
+
+    def write_mac(interface: str) -> None:
+        with phase("mac_write", interface=interface):
+            sum(range(1000))
+
+    with profiling([f"spans:{tmp_path / 'trace.json'}", f"profile:{tmp_path / 'profile'}"]):
+        with phase("hat_write"):
+            buffer = bytearray(1024 * 1024)
+            del buffer
+        thread = threading.Thread(target=write_mac, args=("1-1.1:1.0",))
+        thread.start()
+        thread.join()
+
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert [event["name"] for event in trace["traceEvents"]] == ["hat_write", "mac_write"]
+    assert trace["traceEvents"][1]["args"] == {"interface": "1-1.1:1.0", "ok": True}
+    assert trace["traceEvents"][0]["tid"] != trace["traceEvents"][1]["tid"]
+
+    memory = json.loads((tmp_path / "memory.json").read_text())["phases"]
+    assert memory[0]["name"] == "hat_write"
+    assert memory[0]["peak_increase"] >= 1024 * 1024
+
+    functions = {function for (_, _, function) in pstats.Stats(str(tmp_path / "profile")).stats}
+    assert "write_mac" not in functions
+    assert "<built-in method builtins.sum>" in functions
+
+
+def test_unknown_hook() -> None:
+    """Test that unknown hooks are rejected."""
+    with pytest.raises(ProfilingException, match="Unknown profiling hook 'perf'"):
+        with profiling(["perf"]):
+            pass
@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the RevPi device abstraction with fake network interfaces."""
+
+import pytest
+
+from revpi_provisioning.network import (
+    NetworkEEPROMAggregateException,
+    NetworkEEPROMException,
+    NetworkInterface,
+)
+from revpi_provisioning.revpi import RevPi
+
+
+class FakeNetworkInterface(NetworkInterface):
+    """Network interface which records the written mac address."""
+
+    def __init__(self, path: str, bus: str, fail: bool = False) -> None:
+        super().__init__(path, has_eeprom=True)
+
+        self._bus = bus
+        self.fail = fail
+        self.mac_address = None
+
+    @property
+    def bus(self) -> str:
+        """Return the configured bus."""
+        return self._bus
+
+    def _write_eeprom(self, mac_address: str) -> None:
+        if self.fail:
+            raise NetworkEEPROMException(f"failed to write {mac_address}")
+
+        self.mac_address = str(mac_address)
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_write_mac_addresses(parallel: bool) -> None:
+    """Test that mac addresses are assigned in interface order."""
+    revpi = RevPi("100385", "00")
+    revpi.network_interfaces = [
+        FakeNetworkInterface("1-1.1:1.0", "usb1"),
+        FakeNetworkInterface("0001:03:00.0", "pci0001:03"),
+        FakeNetworkInterface("1-1.4:1.0", "usb1"),
+    ]
+
+    mac_addresses = revpi.write_mac_addresses("c8:3e:a7:00:00:fe", parallel=parallel)
+
+    assert [str(mac) for mac in mac_addresses] == ["c83ea70000fe", "c83ea70000ff", "c83ea7000100"]
+    assert [interface.mac_address for interface in revpi.network_interfaces] == [
+        "c83ea70000fe",
+        "c83ea70000ff",
+        "c83ea7000100",
+    ]
+
+
+def test_write_mac_addresses_collects_errors() -> None:
+    """Test that the errors of all interfaces are reported in parallel mode."""
+    revpi = RevPi("100385", "00")
+    revpi.network_interfaces = [
+        FakeNetworkInterface("1-1.1:1.0", "usb1", fail=True),
+        FakeNetworkInterface("1-1.4:1.0", "usb1"),
+        FakeNetworkInterface("0001:03:00.0", "pci0001:03", fail=True),
+    ]
+
+    with pytest.raises(NetworkEEPROMAggregateException) as exc_info:
+        revpi.write_mac_addresses("c8:3e:a7:00:00:01", parallel=True)
+
+    assert [interface.path for interface, _ in exc_info.value.errors] == [
+        "1-1.1:1.0",
+        "0001:03:00.0",
+    ]
+    assert revpi.network_interfaces[1].mac_address == "c83ea7000002"
+
+
+def test_written_mac_addresses_after_failure() -> None:
+    """Test that the interfaces keep the mac addresses which have been written."""
+    revpi = RevPi("100385", "00")
+    revpi.network_interfaces = [
+        FakeNetworkInterface("1-1.1:1.0", "usb1"),
+        FakeNetworkInterface("1-1.4:1.0", "usb1", fail=True),
+        FakeNetworkInterface("1-1.5:1.0", "usb1"),
+    ]
+
+    with pytest.raises(NetworkEEPROMException):
+        revpi.write_mac_addresses("c8:3e:a7:00:00:01")
+
+    assert [str(interface.written_mac_address) for interface in revpi.network_interfaces] == [
+        "c83ea7000001",
+        "None",
+        "None",
+    ]
@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the provisioning step scheduler."""
+
+import threading
+
+import pytest
+
+from revpi_provisioning.scheduler import (
+    ProvisioningException,
+    Step,
+    StepSkippedException,
+    StepTimeoutException,
+    run_steps,
+)
+
+
+def test_independent_steps_run_concurrently() -> None:
+    """Test that steps without requirements run at the same time."""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def step() -> str:
+        # both steps have to reach the barrier, otherwise it times out
+        barrier.wait()
+        return "done"
+
+    results = run_steps([Step("a", step), Step("b", step)])
+
+    assert results == {"a": "done", "b": "done"}
+
+
+def test_requirements() -> None:
+    """Test that steps run after the steps they require."""
+    order = []
+
+    run_steps(
+        [
+            Step("verify", lambda: order.append("verify"), requires=["write"]),
+            Step("write", lambda: order.append("write")),
+        ]
+    )
+
+    assert order == ["write", "verify"]
+
+
+def test_failed_requirement() -> None:
+    """Test that all errors are reported and dependent steps are skipped."""
+
+    def fail() -> None:
+        raise RuntimeError("write failed")
+
+    with pytest.raises(ProvisioningException) as exc_info:
+        run_steps(
+            [
+                Step("write", fail),
+                Step("verify", lambda: None, requires=["write"]),
+                Step("mac", lambda: "ok"),
+            ]
+        )
+
+    errors = exc_info.value.errors
+    assert list(errors) == ["write", "verify"]
+    assert isinstance(errors["verify"], StepSkippedException)
+
+
+def test_deadline() -> None:
+    """Test that a step which exceeds its deadline is cancelled and reported."""
+    cancelled = threading.Event()
+
+    with pytest.raises(ProvisioningException) as exc_info:
+        run_steps(
+            [
+                Step("write", lambda: cancelled.wait(5), timeout=0.1, cancel=cancelled.set),
+                Step("verify", lambda: None, requires=["write"]),
+                Step("mac", lambda: "ok"),
+            ]
+        )
+
+    errors = exc_info.value.errors
+    assert cancelled.is_set()
+    assert isinstance(errors["write"], StepTimeoutException)
+    assert isinstance(errors["verify"], StepSkippedException)
+    assert "mac" not in errors
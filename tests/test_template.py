@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test building HAT eeprom images from templates."""
+
+import hashlib
+import os
+
+from revpi_provisioning.eep import (
+    ATOM_CUSTOM_DATA,
+    ATOM_VENDOR_INFO,
+    VendorInfo,
+    build_image,
+    parse_image,
+)
+from revpi_provisioning.imagecache import ImageCache
+from revpi_provisioning.template import ImageTemplate, TemplateCache
+
+
+def template(product: str = "RevPi Connect 4") -> bytes:
+    """Build a template with a vendor info atom."""
+    vendor_info = VendorInfo(bytes(16), 383, 0, "KUNBUS GmbH", product)
+
+    return build_image([(ATOM_VENDOR_INFO, vendor_info.pack())])
+
+
+TEMPLATE = template()
+
+
+def test_build_image() -> None:
+    """Test that the device fields are appended as valid custom data atoms."""
+    image = ImageTemplate(TEMPLATE + b"\xff" * 16).build(
+        "0001234", "c83ea70000fe", ["edition 1", b"\x01\x02"]
+    )
+    parsed = parse_image(image)
+
+    assert parsed.length == len(image)
+    assert bytes(image[: len(TEMPLATE)])[12:] == TEMPLATE[12:]
+    assert [atom.type for atom in parsed.atoms] == [ATOM_VENDOR_INFO] + [ATOM_CUSTOM_DATA] * 4
+    assert [bytes(atom.data) for atom in parsed.atoms[1:]] == [
+        b"0001234",
+        b"c8:3e:a7:00:00:fe",
+        b"edition 1",
+        b"\x01\x02",
+    ]
+    parsed.check_product("100383")
+
+
+def test_template_cache(tmp_path: object) -> None:
+    """Test that a template is compiled once per content."""
+    source = tmp_path / "PR100383R00.eep"
+    source.write_bytes(TEMPLATE)
+    templates = TemplateCache(ImageCache(str(tmp_path / "cache")))
+
+    loaded = templates.load(str(source))
+    assert loaded.vendor_info.product == "RevPi Connect 4"
+    assert (
+        templates.load(str(tmp_path / "cache" / f"{hashlib.sha256(TEMPLATE).hexdigest()}.eep"))
+        is loaded
+    )
+
+    source.write_bytes(template("RevPi Connect X"))
+    os.utime(source, ns=(0, 1))
+    assert templates.load(str(source)).vendor_info.product == "RevPi Connect X"
@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the recording of provisioning phases."""
+
+import json
+
+import pytest
+
+from revpi_provisioning.network import NetworkInterface
+from revpi_provisioning.timing import (
+    PhaseHook,
+    TimingRecorder,
+    hooks,
+    phase,
+    recording,
+    write_report,
+)
+
+
+class FakeNetworkInterface(NetworkInterface):
+    """Network interface without eeprom access."""
+
+    def _write_eeprom(self, mac_address: str) -> None:
+        pass
+
+
+def test_phase_without_recorder() -> None:
+    """Test that phases are not recorded if no recorder is active."""
+    recorder = TimingRecorder()
+
+    with phase("hat_write"):
+        pass
+
+    assert recorder.phases == []
+
+
+def test_report(tmp_path: str) -> None:
+    """Test that phases and failed phases end up in the report."""
+    recorder = TimingRecorder()
+
+    with recording(recorder):
+        FakeNetworkInterface("1-1.1:1.0", has_eeprom=True).set_mac_address("c83ea7000001")
+
+        with pytest.raises(RuntimeError), phase("hat_write"):
+            raise RuntimeError("write failed")
+
+    with phase("hat_verify"):
+        # recorder is no longer active
+        pass
+
+    write_report(recorder.report("PR100359R00", 3), str(tmp_path / "timings.json"))
+    with open(tmp_path / "timings.json") as fh:
+        report = json.load(fh)
+
+    assert (report["product"], report["rc"]) == ("PR100359R00", 3)
+    assert [entry["name"] for entry in report["phases"]] == ["mac_write", "hat_write"]
+
+    (mac_write, hat_write) = report["phases"]
+    assert mac_write["interface"] == "1-1.1:1.0"
+    assert mac_write["ok"] and not hat_write["ok"]
+    assert report["start"] <= mac_write["start"] <= mac_write["end"] <= report["end"]
+    assert mac_write["duration"] == mac_write["end"] - mac_write["start"]
+
+
+def test_hooks() -> None:
+    """Test that nested hooks are called around each phase."""
+    calls = []
+
+    class Hook(PhaseHook):
+        def __init__(self, tag: str) -> None:
+            self.tag = tag
+
+        def before(self, name: str, attributes: dict) -> str:
+            calls.append((self.tag, "before", name, attributes))
+            return self.tag
+
+        def after(self, name: str, attributes: dict, ok: bool, context: str) -> None:
+            calls.append((context, "after", name, ok))
+
+    with hooks(Hook("a"), Hook("b")):
+        with phase("overlay_load", overlay="revpi-hat-eeprom"):
+            pass
+
+    assert calls == [
+        ("a", "before", "overlay_load", {"overlay": "revpi-hat-eeprom"}),
+        ("b", "before", "overlay_load", {"overlay": "revpi-hat-eeprom"}),
+        ("b", "after", "overlay_load", True),
+        ("a", "after", "overlay_load", True),
+    ]
+    # no hooks are active anymore
+    assert phase("hat_write") is phase("hat_verify")
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test running external tools with a deadline."""
+
+import subprocess
+import time
+
+import pytest
+
+from revpi_provisioning.tools import run_tool
+
+
+def test_run_tool() -> None:
+    """Test that stdout is returned and failures raise CalledProcessError with stderr."""
+    assert run_tool(["sh", "-c", "echo out; echo err: warning >&2"]) == b"out\n"
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        run_tool(["sh", "-c", "echo failed; echo no such overlay >&2; exit 3"])
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.stdout == b"failed\n"
+    assert str(exc_info.value).endswith("exit status 3: no such overlay")
+
+
+def test_run_tool_timeout() -> None:
+    """Test that a hung tool is killed after the timeout."""
+    start = time.monotonic()
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_tool(["sleep", "10"], timeout=0.2)
+
+    assert time.monotonic() - start < 5
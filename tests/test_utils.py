@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the mac address helpers."""
+
+import pytest
+
+from revpi_provisioning.utils import InvalidMacAddressFormat, MacAddress, MacRange
+
+
+@pytest.mark.parametrize("mac", ["00:1a:2b:03:04:05", "00-1A-2B-03-04-05", "001a2b030405"])
+def test_mac_address_formats(mac: str) -> None:
+    """Test that leading zeros are kept in all formats."""
+    mac_address = MacAddress(mac)
+
+    assert str(mac_address) == "001a2b030405"
+    assert mac_address.format_colon == "00:1a:2b:03:04:05"
+    assert mac_address.format_dash == "00-1a-2b-03-04-05"
+    assert (mac_address.oui, mac_address.nic) == ("001a2b", "030405")
+    assert mac_address.packed == bytes.fromhex("001a2b030405")
+
+
+@pytest.mark.parametrize("mac", ["c83ea700000", "c83ea70000011", "c8:3e:a7:00:00:0g"])
+def test_invalid_mac_address(mac: str) -> None:
+    """Test that mac addresses with a wrong number of digits are rejected."""
+    with pytest.raises(InvalidMacAddressFormat):
+        MacAddress(mac)
+
+
+def test_mac_address_arithmetic() -> None:
+    """Test increment and decrement across byte boundaries and the address space."""
+    assert MacAddress("c8:3e:a7:00:00:ff") + 1 == MacAddress("c83ea7000100")
+    assert MacAddress("c8:3e:a7:00:01:00") - 1 == MacAddress("c83ea70000ff")
+
+    with pytest.raises(InvalidMacAddressFormat):
+        MacAddress("ff:ff:ff:ff:ff:ff") + 1
+
+
+def test_mac_range() -> None:
+    """Test iteration, slicing, containment and overlap of mac address ranges."""
+    block = MacRange("c8:3e:a7:00:00:fe", 4)
+
+    assert [str(mac) for mac in block] == [
+        "c83ea70000fe",
+        "c83ea70000ff",
+        "c83ea7000100",
+        "c83ea7000101",
+    ]
+    assert block[-1] == block.last == MacAddress("c83ea7000101")
+    assert block[1:3] == MacRange("c83ea70000ff", 2)
+    assert "c8:3e:a7:00:01:00" in block
+    assert MacAddress("c83ea7000102") not in block
+
+    assert block.overlaps(MacRange("c83ea7000101", 10))
+    assert not block.overlaps(MacRange("c83ea7000102", 10))
+    assert not block.overlaps(MacRange("c83ea7000100", 0))
+
+    assert block[:2].format("colon") == ["c8:3e:a7:00:00:fe", "c8:3e:a7:00:00:ff"]
@@ -0,0 +1,69 @@
+# SPDX-FileCopyrightText: 2024 KUNBUS GmbH
+#
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Test the bulk validation of device configuration files."""
+
+import shutil
+
+import pytest
+
+import revpi_provisioning.validation
+from revpi_provisioning.validation import expand_paths, validate_files
+
+
+def test_validate_files(tmp_path: object) -> None:
+    """Test that all files are reported and invalid ones have an error."""
+    shutil.copy("revpi_provisioning/devices/PR100383.yaml", tmp_path / "PR100383.yaml")
+    (tmp_path / "PR100999R00.yaml").write_text("network_interfaces: []\nfoo: 1\n")
+
+    results = validate_files([str(tmp_path), str(tmp_path / "missing.yaml")])
+
+    assert [result.path for result in results] == [
+        str(tmp_path / "PR100383.yaml"),
+        str(tmp_path / "PR100999R00.yaml"),
+        str(tmp_path / "missing.yaml"),
+    ]
+    assert [result.valid for result in results] == [True, False, False]
+    assert "Schema error" in results[1].error
+    assert "does not exist" in results[2].error
+
+
+def test_result_cache(tmp_path: object, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that unchanged files are taken from the cache."""
+    cache_file = str(tmp_path / "cache" / "validation.json")
+    paths = expand_paths(["revpi_provisioning/devices/PR1003*.yaml"])
+    config = tmp_path / "PR100999R00.yaml"
+    config.write_text("network_interfaces: []\n")
+
+    results = validate_files(paths + [str(config)], workers=2, cache_file=cache_file)
+    assert all(result.valid and not result.cached for result in results)
+
+    config.write_text("network_interfaces: 1\n")
+    results = validate_files(paths + [str(config)], workers=2, cache_file=cache_file)
+    assert all(result.cached for result in results[:-1])
+    assert not results[-1].valid and not results[-1].cached
+
+    # the results depend on the schema
+    monkeypatch.setattr(
+        revpi_provisioning.validation,
+        "VALIDATION_CACHE_VERSION",
+        revpi_provisioning.validation.VALIDATION_CACHE_VERSION + 1,
+    )
+    assert not any(result.cached for result in validate_files(paths, cache_file=cache_file))
+
+
+def test_result_cache_fallback_file(tmp_path: object) -> None:
+    """Test that a change of the file without revision invalidates the cached result."""
+    cache_file = str(tmp_path / "validation.json")
+    config = tmp_path / "PR100999R00.yaml"
+    config.write_text("network_interfaces: []\n")
+
+    assert validate_files([str(config)], cache_file=cache_file)[0].valid
+
+    # load_config reads PR100999.yaml after PR100999R00.yaml
+    (tmp_path / "PR100999.yaml").write_text("network_interfaces: 1\n")
+    result = validate_files([str(config)], cache_file=cache_file)[0]
+    assert not result.valid and not result.cached
+
+    assert validate_files([str(config)], cache_file=cache_file)[0].cached